@@ -0,0 +1,74 @@
+# bench_assoc.py
+# One pearsonr/spearmanr call per (X item, Y item) pair vs the survey_assoc matrix
+# engine, on Likert data with scattered missing cells (pairwise-complete in both);
+# and one call per bootstrap/permutation resample vs the batched resampling engine.
+# Run from the repo root: python -m benchmarks.bench_assoc [--rows 20000] [--items 10 50]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from benchmarks.bench_descriptives import best_of, likert_frame
+from survey_assoc import frame_matrix, resample_association
+
+
+def loop_matrix(df: pd.DataFrame, rows, cols, method: str) -> np.ndarray:
+    fn = stats.pearsonr if method == "pearson" else stats.spearmanr
+    out = np.empty((len(rows), len(cols)))
+    for i, a in enumerate(rows):
+        for j, b in enumerate(cols):
+            pair = df[[a, b]].dropna()
+            out[i, j] = fn(pair[a], pair[b])[0]
+    return out
+
+
+def run(n_rows: int, item_counts, repeat: int) -> pd.DataFrame:
+    out = []
+    for k in item_counts:
+        # k X items against k Y items
+        df = likert_frame(n_rows, 2 * k)
+        rows, cols = df.columns[:k].tolist(), df.columns[k:].tolist()
+        for method in ("pearson", "spearman"):
+            t_loop = best_of(lambda: loop_matrix(df, rows, cols, method), repeat)
+            t_mat = best_of(lambda: frame_matrix(df, rows, cols, method), repeat)
+            out.append({"pairs": k * k, "rows": n_rows, "method": method, "loop_s": round(t_loop, 4),
+                        "matrix_s": round(t_mat, 4), "speedup": round(t_loop / t_mat, 1)})
+    return pd.DataFrame(out)
+
+
+def loop_resample(x, y, method: str, n_resamples: int, seed: int = 0):
+    fn = stats.pearsonr if method == "pearson" else stats.spearmanr
+    rng = np.random.default_rng(seed)
+    n = x.size
+    boot = [fn(x[i], y[i])[0] for i in (rng.integers(0, n, n) for _ in range(n_resamples))]
+    perm = [fn(x, y[rng.permutation(n)])[0] for _ in range(n_resamples)]
+    return boot, perm
+
+
+def run_resampling(pair_counts, n_resamples: int, repeat: int) -> pd.DataFrame:
+    out = []
+    for n in pair_counts:
+        # Likert composites: sums of four 1-5 items
+        df = likert_frame(n, 8, missing=0.0)
+        x, y = df.iloc[:, :4].sum(axis=1).to_numpy(), df.iloc[:, 4:].sum(axis=1).to_numpy()
+        for method in ("pearson", "spearman"):
+            t_loop = best_of(lambda: loop_resample(x, y, method, n_resamples), repeat)
+            t_batch = best_of(lambda: resample_association(x, y, method, n_resamples, workers=1), repeat)
+            out.append({"pairs": n, "resamples": n_resamples, "method": method, "loop_s": round(t_loop, 4),
+                        "batched_s": round(t_batch, 4), "speedup": round(t_loop / t_batch, 1)})
+    return pd.DataFrame(out)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time the item correlation matrix and the resampling engine against per-pair scipy calls.")
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--items", type=int, nargs="+", default=[10, 50])
+    ap.add_argument("--pairs", type=int, nargs="+", default=[300, 3000], help="pair counts for resampling")
+    ap.add_argument("--resamples", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.items, args.repeat).to_string(index=False))
+    print()
+    print(run_resampling(args.pairs, args.resamples, args.repeat).to_string(index=False))
@@ -0,0 +1,61 @@
+# bench_chi_square.py
+# Chi-square of binned X_total x Y_total: the former pd.qcut(...).astype(str) +
+# pd.crosstab path vs survey_contingency's integer codes and bincount, and every
+# demographic column against both binned composites in one batch.
+# Run from the repo root: python -m benchmarks.bench_chi_square [--rows 1000000]
+
+import argparse
+
+import pandas as pd
+from scipy import stats
+
+import survey_pipeline as pipeline
+from benchmarks.bench_descriptives import best_of
+from benchmarks.synthetic import item_columns, synthetic_survey
+
+DEMOGRAPHICS = ["gender", "age", "major"]
+
+
+def string_crosstab(pair: pd.DataFrame, nbins: int) -> float:
+    x_cat = pd.qcut(pair["X_total"], q=nbins, duplicates="drop").astype(str)
+    y_cat = pd.qcut(pair["Y_total"], q=nbins, duplicates="drop").astype(str)
+    return stats.chi2_contingency(pd.crosstab(x_cat, y_cat))[0]
+
+
+def string_batch(pair: pd.DataFrame, df: pd.DataFrame, nbins: int) -> list:
+    out = []
+    for c in DEMOGRAPHICS:
+        demo = df[c].reindex(pair.index).astype(str)
+        for comp in pipeline.COMPOSITES:
+            ct = pd.crosstab(demo, pd.qcut(pair[comp], q=nbins, duplicates="drop").astype(str))
+            out.append(stats.chi2_contingency(ct)[0])
+    return out
+
+
+def run(n_rows: int, n_items: int, nbins: int, repeat: int) -> pd.DataFrame:
+    df = synthetic_survey(n_rows, n_items)
+    x, y = item_columns(df)
+    data = pipeline.masked(pipeline.prepare(df, x, y), x + y + pipeline.COMPOSITES)
+    pair = pipeline.association_pair(data, pipeline.MISSING_METHODS[0])
+    assert abs(string_crosstab(pair, nbins) - pipeline.chi_square(pair, nbins)["chi2"]) < 1e-6
+    t_str = best_of(lambda: string_crosstab(pair, nbins), repeat)
+    t_codes = best_of(lambda: pipeline.chi_square(pair, nbins), repeat)
+    t_str_batch = best_of(lambda: string_batch(pair, df, nbins), repeat)
+    t_batch = best_of(lambda: pipeline.demographic_chi_square(pair, df, DEMOGRAPHICS, nbins), repeat)
+    rows = [{"tables": "X_cat x Y_cat", "path": "strings + crosstab", "seconds": t_str},
+            {"tables": "X_cat x Y_cat", "path": "codes + bincount", "seconds": t_codes},
+            {"tables": f"{len(DEMOGRAPHICS)} demographics x 2", "path": "strings + crosstab", "seconds": t_str_batch},
+            {"tables": f"{len(DEMOGRAPHICS)} demographics x 2", "path": "codes + bincount", "seconds": t_batch}]
+    out = pd.DataFrame(rows)
+    out["speedup"] = out.groupby("tables")["seconds"].transform("first") / out["seconds"]
+    return out.round(4)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time binned chi-square tables against the qcut + crosstab path.")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--items", type=int, default=8)
+    ap.add_argument("--bins", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    print(run(args.rows, args.items, args.bins, args.repeat).to_string(index=False))
@@ -0,0 +1,100 @@
+# bench_columnar.py
+# Memory of the analysis as the file grows: the in-memory path (read_csv + compact types,
+# prepare, descriptives, association pair, Spearman, chi-square with demographics) vs
+# out-of-core mode on the memory-mapped Arrow copy (survey_columnar). Each run is a fresh
+# process; "heap peak" is the largest traced allocation (tracemalloc, NumPy included) and
+# "anon RSS" the process's private resident memory at the end (Linux), leaving out the
+# mapped file's pages, which the OS can drop and re-read at any time.
+# Run from the repo root: python -m benchmarks.bench_columnar [--rows 250000 500000 1000000] [--items 20]
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import item_columns, synthetic_survey
+
+MB = 1024 ** 2
+DEMOGRAPHICS = ["gender", "age", "major"]
+
+
+def _anon_rss() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024 / MB
+    except OSError:
+        pass
+    return float("nan")
+
+
+def _in_memory(csv_path: str, x, y) -> None:
+    import survey_pipeline as pipeline
+    df = pipeline.compact_frame(pd.read_csv(csv_path))
+    work = pipeline.prepare(df, x, y, True)
+    data = pipeline.masked(work, x + y + pipeline.COMPOSITES)
+    pipeline.descriptives(data)
+    pair = pipeline.association_pair(data, pipeline.MISSING_METHODS[0])
+    pipeline.correlate(pair, "spearman")
+    pipeline.demographic_chi_square(pair, df, DEMOGRAPHICS)
+
+
+def _out_of_core(arrow_path: str, x, y) -> None:
+    import survey_pipeline as pipeline
+    from survey_columnar import MappedPair, MappedTable, column_stats, mapped_missing
+    table = MappedTable(arrow_path)
+    acc, work = column_stats(table, x + y, {"X_total": x, "Y_total": y})
+    acc, fills = mapped_missing(acc, work, "pairwise")
+    pair = MappedPair(work, fills)
+    pipeline.correlate(pair, "spearman")
+    pipeline.demographic_chi_square(pair, table, DEMOGRAPHICS)
+
+
+def _measure(args) -> dict:
+    fn, path, x, y = args
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(path, x, y)
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] / MB
+    tracemalloc.stop()
+    return {"seconds": seconds, "heap_peak_mb": peak, "anon_rss_mb": _anon_rss()}
+
+
+def run(sizes, n_items: int) -> pd.DataFrame:
+    from survey_columnar import convert_csv
+    rows = []
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as d:
+        for n in sizes:
+            df = synthetic_survey(n, n_items)
+            x, y = item_columns(df)
+            csv_path, arrow_path = os.path.join(d, f"{n}.csv"), os.path.join(d, f"{n}.arrow")
+            df.to_csv(csv_path, index=False)
+            del df
+            with open(csv_path, "rb") as f:
+                data = f.read()
+            t0 = time.perf_counter()
+            convert_csv(data, arrow_path)
+            convert_s = time.perf_counter() - t0
+            del data
+            for mode, fn, path in (("in memory", _in_memory, csv_path), ("out of core", _out_of_core, arrow_path)):
+                # one process per run, so nothing allocated by an earlier run is counted
+                with ctx.Pool(1) as pool:
+                    res = pool.apply(_measure, ((fn, path, x, y),))
+                rows.append({"rows": n, "mode": mode, **res,
+                             "convert_s": convert_s if mode == "out of core" else float("nan")})
+    return pd.DataFrame(rows).round(3)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Peak memory of the in-memory analysis vs the out-of-core mode as the file grows.")
+    ap.add_argument("--rows", type=int, nargs="+", default=[250_000, 500_000, 1_000_000])
+    ap.add_argument("--items", type=int, default=20)
+    args = ap.parse_args()
+    print(run(args.rows, args.items).to_string(index=False))
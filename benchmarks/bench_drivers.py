@@ -0,0 +1,57 @@
+# bench_drivers.py
+# Driver models (every target on the X items, overall and per segment): one np.linalg.lstsq
+# per segment x target on the filtered rows vs survey_drivers' cross-products (one pass)
+# plus a batched solve, and a refit with one predictor dropped from the cached cross-products.
+# Run from the repo root: python -m benchmarks.bench_drivers [--rows 1000000] [--items 40] [--segments 5 50]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_descriptives import best_of
+from benchmarks.synthetic import item_columns, synthetic_survey
+from survey_drivers import CrossProducts
+
+
+def loop_fits(M: np.ndarray, n_x: int, codes: np.ndarray, k: int):
+    ok = ~np.isnan(M).any(axis=1)
+    out = {}
+    for level in [None] + list(range(k)):
+        rows = ok if level is None else ok & (codes == level)
+        X = np.c_[np.ones(rows.sum()), M[rows, :n_x]]
+        for t in range(n_x, M.shape[1]):
+            out[level, t] = np.linalg.lstsq(X, M[rows, t], rcond=None)[0]
+    return out
+
+
+def run(n_rows: int, n_items: int, segment_counts, repeat: int) -> pd.DataFrame:
+    df = synthetic_survey(n_rows, n_items)
+    x, y = item_columns(df)
+    df["Y_total"] = df[y].sum(axis=1, skipna=False)
+    cols = x + ["Y_total"] + y
+    M = df[cols].to_numpy(dtype=float)
+    rows = []
+    for k in segment_counts:
+        labels = pd.Series(np.random.default_rng(k).integers(0, k, n_rows)).astype(str)
+        codes = pd.factorize(labels)[0]
+        t_loop = best_of(lambda: loop_fits(M, len(x), codes, k), repeat)
+        t_products = best_of(lambda: CrossProducts(cols).update(M, labels), repeat)
+        products = CrossProducts(cols).update(M, labels)
+        t_fit = best_of(lambda: products.fit(x, ["Y_total"] + y), repeat)
+        t_refit = best_of(lambda: products.fit(x[1:], ["Y_total"] + y), repeat)
+        rows.append({"rows": n_rows, "predictors": len(x), "targets": len(y) + 1, "segments": k,
+                     "lstsq_loop_s": round(t_loop, 3), "cross_products_s": round(t_products, 3),
+                     "batched_fit_s": round(t_fit, 4), "refit_s": round(t_refit, 4),
+                     "speedup": round(t_loop / (t_products + t_fit), 1)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time batched driver models from cross-products against one lstsq per model.")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--items", type=int, default=40)
+    ap.add_argument("--segments", type=int, nargs="+", default=[5, 50])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.items, args.segments, args.repeat).to_string(index=False))
@@ -0,0 +1,46 @@
+# bench_excel.py
+# Reading the analysed columns of a wide workbook: pd.read_excel of the whole sheet
+# (+ compact_frame) vs survey_excel's column-selective openpyxl pass, and a rerun from
+# the columnar Parquet copy.
+# Run from the repo root: python -m benchmarks.bench_excel [--rows 20000] [--items 60] [--select 12]
+
+import argparse
+import io
+import tempfile
+
+import pandas as pd
+
+from benchmarks.bench_descriptives import best_of
+from benchmarks.synthetic import synthetic_survey
+from survey_dtypes import compact_frame
+from survey_excel import load_xlsx_columns, read_xlsx_columns
+from survey_ingest import read_frame
+
+
+def run(n_rows: int, n_items: int, n_select: int, repeat: int) -> pd.DataFrame:
+    df = synthetic_survey(n_rows, n_items)
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    data = buf.getvalue()
+    cols = df.columns[: n_select - 2].tolist() + ["gender", "age"]
+    with tempfile.TemporaryDirectory() as d:
+        load_xlsx_columns(data, None, cols, parquet_dir=d)
+        t_parquet = best_of(lambda: load_xlsx_columns(data, None, cols, parquet_dir=d), repeat)
+    t_full = best_of(lambda: compact_frame(read_frame(data, "xlsx")), repeat)
+    t_cols = best_of(lambda: read_xlsx_columns(data, None, cols), repeat)
+    rows = [{"read": "read_excel, all columns", "seconds": t_full},
+            {"read": f"selective, {len(cols)} columns", "seconds": t_cols},
+            {"read": "rerun from Parquet copy", "seconds": t_parquet}]
+    out = pd.DataFrame(rows)
+    out["speedup"] = t_full / out["seconds"]
+    return out.round(3)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time column-selective workbook reads against pd.read_excel of the whole sheet.")
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--items", type=int, default=60)
+    ap.add_argument("--select", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.items, args.select, args.repeat).to_string(index=False))
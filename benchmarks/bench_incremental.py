@@ -0,0 +1,65 @@
+# bench_incremental.py
+# Updating an open survey after new responses arrive: re-reading the whole CSV and
+# recomputing the descriptives and Pearson r vs survey_incremental's AppendState, fed
+# either the new rows only or the whole grown file (only its tail is parsed).
+# Run from the repo root: python -m benchmarks.bench_incremental [--rows 500000] [--new 5000]
+
+import argparse
+import copy
+import io
+
+import pandas as pd
+from scipy import stats
+
+from benchmarks.bench_descriptives import best_of, likert_frame
+from survey_incremental import AppendState
+from survey_stats import describe_frame
+
+
+def full_recompute(data: bytes, items, x, y):
+    df = pd.read_csv(io.BytesIO(data))
+    df["X_total"] = df[x].sum(axis=1, skipna=False)
+    df["Y_total"] = df[y].sum(axis=1, skipna=False)
+    describe_frame(df, items + ["X_total", "Y_total"])
+    pair = df[["X_total", "Y_total"]].dropna()
+    return stats.pearsonr(pair["X_total"], pair["Y_total"])
+
+
+def run(n_rows: int, n_new: int, n_items: int, repeat: int) -> pd.DataFrame:
+    df = likert_frame(n_rows + n_new, n_items)
+    items = df.columns.tolist()
+    x, y = items[: n_items // 2], items[n_items // 2:]
+    composites = {"X_total": x, "Y_total": y}
+    old = df.iloc[:n_rows].to_csv(index=False).encode()
+    grown = df.to_csv(index=False).encode()
+    delta = df.iloc[n_rows:].to_csv(index=False).encode()
+    base = AppendState(items, composites)
+    base.add_upload(old, "survey.csv")
+
+    def append(data):
+        # a fresh copy each time, so every repeat folds the same rows into the same state
+        state = copy.deepcopy(base)
+        state.add_upload(data, "survey.csv")
+        return state
+
+    t_full = best_of(lambda: full_recompute(grown, items, x, y), repeat)
+    t_delta = best_of(lambda: append(delta), repeat)
+    t_tail = best_of(lambda: append(grown), repeat)
+    r_full = full_recompute(grown, items, x, y).statistic
+    r_append = append(grown).pair.r
+    rows = [{"update": "full recompute", "seconds": t_full, "r": r_full},
+            {"update": "append new rows", "seconds": t_delta, "r": append(delta).pair.r},
+            {"update": "append whole file", "seconds": t_tail, "r": r_append}]
+    out = pd.DataFrame(rows)
+    out["speedup"] = t_full / out["seconds"]
+    return out.round(4)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time appending new responses against re-reading the whole CSV.")
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--new", type=int, default=5_000)
+    ap.add_argument("--items", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.new, args.items, args.repeat).to_string(index=False))
@@ -0,0 +1,71 @@
+# bench_memory.py
+# Memory of a survey upload as parsed (float64 Likert items, object demographics) vs
+# survey_dtypes' compact types, and of the working table the old df.copy() + to_numeric
+# + fillna cleaning built vs survey_pipeline.prepare on the compact frame (which leaves
+# missing values to survey_missing's views).
+# Run from the repo root: python -m benchmarks.bench_memory [--rows 200000] [--items 40]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_descriptives import best_of, likert_frame
+from survey_dtypes import compact_frame, frame_nbytes
+import survey_pipeline as pipeline
+
+MB = 1024 ** 2
+
+
+def parsed_frame(n_rows: int, n_items: int, seed: int = 0) -> pd.DataFrame:
+    # what read_csv returns: float64 items (blanks present), text demographics
+    df = likert_frame(n_rows, n_items, seed=seed)
+    rng = np.random.default_rng(seed)
+    df["gender"] = rng.choice(["Female", "Male", "Other"], n_rows).astype(object)
+    df["age"] = rng.choice(["18-20", "21-23", "24-26", "27+"], n_rows).astype(object)
+    df["major"] = rng.choice([f"Major {i}" for i in range(30)], n_rows).astype(object)
+    return df
+
+
+def old_work(df: pd.DataFrame, x, y, missing: str) -> pd.DataFrame:
+    # the cleaning before compact dtypes: full copy, float64 items, frame-wide fillna
+    work = df.copy()
+    for c in x + y:
+        work[c] = pd.to_numeric(work[c], errors="coerce")
+    work["X_total"] = work[x].sum(axis=1, skipna=False)
+    work["Y_total"] = work[y].sum(axis=1, skipna=False)
+    if missing == "Fill with mean":
+        work = work.fillna(work.mean(numeric_only=True))
+    return work
+
+
+def run(n_rows: int, n_items: int, missing: str, repeat: int) -> pd.DataFrame:
+    df = parsed_frame(n_rows, n_items)
+    items = [c for c in df.columns if c.startswith("Q")]
+    x, y = items[: n_items // 2], items[n_items // 2:]
+    compact = compact_frame(df)
+    t_compact = best_of(lambda: compact_frame(df), repeat)
+    old = old_work(df, x, y, missing)
+    new = pipeline.prepare(compact, x, y, True)
+    t_old = best_of(lambda: old_work(df, x, y, missing), repeat)
+    # fills are views of the masked matrix now, so the working table is the same for every option
+    t_new = best_of(lambda: pipeline.prepare(compact, x, y, True), repeat)
+    rows = [
+        {"table": "upload", "before_mb": frame_nbytes(df) / MB, "after_mb": frame_nbytes(compact) / MB,
+         "before_s": 0.0, "after_s": t_compact},
+        {"table": f"work ({missing})", "before_mb": frame_nbytes(old) / MB, "after_mb": frame_nbytes(new) / MB,
+         "before_s": t_old, "after_s": t_new},
+    ]
+    out = pd.DataFrame(rows)
+    out["ratio"] = out["before_mb"] / out["after_mb"]
+    return out.round(3)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Memory of an upload and the working table, as parsed vs with compact types.")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--items", type=int, default=40)
+    ap.add_argument("--missing", choices=pipeline.MISSING_METHODS, default=pipeline.MISSING_METHODS[0])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.items, args.missing, args.repeat).to_string(index=False))
@@ -0,0 +1,236 @@
+# bench_pipeline.py
+# Time and peak memory of every pipeline stage on synthetic surveys (benchmarks.synthetic),
+# for each rows x items size: ingestion (CSV, XLSX), prepare (coercion, composites,
+# masks and the missing-value fill), descriptives, normality, correlation (Pearson,
+# Spearman and the item matrix), chi-square, chart rendering and PDF export.
+# Results go to a JSON file; --baseline compares against an earlier one and exits with
+# status 1 when a stage got slower by more than --tolerance.
+# Run from the repo root: python -m benchmarks.bench_pipeline [--rows 1000 100000 1000000]
+#     [--items 10 100 500] [--out bench_pipeline.json] [--baseline OLD.json]
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import scipy
+
+import survey_pipeline as pipeline
+from benchmarks.synthetic import item_columns, synthetic_survey
+from survey_batch import chart_pngs
+from survey_ingest import load_frame
+from survey_report import write_report
+
+STAGES = ["ingest_csv", "ingest_xlsx", "prepare", "descriptives", "normality",
+          "correlation", "chi_square", "charts", "pdf"]
+MB = 1024 ** 2
+
+
+def measure(fn: Callable[[], object], repeat: int, memory: bool):
+    """(result, best seconds of `repeat` runs, peak MB allocated by one more traced run or None).
+
+    Memory is traced in a separate run so tracemalloc's overhead stays out of the timings.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - t0)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / MB
+        finally:
+            tracemalloc.stop()
+    return value, min(times), peak
+
+
+def stage_functions(s: dict, missing: str) -> Dict[str, Callable[[], object]]:
+    """Each stage reads the outputs of the ones before it from `s` (filled in by run_size)."""
+    handling = pipeline.HANDLING[missing]
+
+    def prepare():
+        df_work = pipeline.prepare(s["df"], s["x"], s["y"])
+        data = pipeline.masked(df_work, s["x"] + s["y"] + pipeline.COMPOSITES)
+        data.matrix(handling)
+        return data
+
+    def descriptives():
+        desc = pipeline.descriptives(s["data"], missing)
+        desc.table
+        return desc
+
+    def normality():
+        pair = pipeline.association_pair(s["data"], missing)
+        return pair, pipeline.normality(pair)
+
+    def correlation():
+        pair = s["pair"]
+        return (pipeline.correlate(pair, "pearson"), pipeline.correlate(pair, "spearman"),
+                pipeline.item_matrix(s["desc"], s["x"], s["y"]))
+
+    def pdf():
+        assoc = dict(s["assoc"])
+        assoc["direction"], assoc["strength"] = pipeline.interpret(assoc["r"])
+        result = {"descriptives": s["desc"], "pair": s["pair"], "association": assoc}
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            write_report(path, pipeline.report_snapshot(result, s["pngs"]))
+            return os.path.getsize(path)
+        finally:
+            os.remove(path)
+
+    return {
+        "ingest_csv": lambda: load_frame(s["csv"], "survey.csv"),
+        "ingest_xlsx": lambda: load_frame(s["xlsx"], "survey.xlsx"),
+        "prepare": prepare,
+        "descriptives": descriptives,
+        "normality": normality,
+        "correlation": correlation,
+        "chi_square": lambda: pipeline.chi_square(s["pair"]),
+        # rendered inline as survey_batch does (the app fans out to a process pool)
+        "charts": lambda: chart_pngs(s["desc"]),
+        "pdf": pdf,
+    }
+
+
+def run_size(n_rows: int, n_items: int, stages: List[str], missing: str, repeat: int,
+             memory: bool, xlsx_max_cells: int, seed: int = 0) -> List[dict]:
+    raw = synthetic_survey(n_rows, n_items, seed=seed)
+    s = {"csv": raw.to_csv(index=False).encode()}
+    s["x"], s["y"] = item_columns(raw)
+    skipped = set()
+    if "ingest_xlsx" in stages:
+        if n_rows * raw.shape[1] <= xlsx_max_cells:
+            buf = io.BytesIO()
+            raw.to_excel(buf, index=False)
+            s["xlsx"] = buf.getvalue()
+        else:
+            skipped.add("ingest_xlsx")
+    del raw
+    fns = stage_functions(s, missing)
+    # stages up to the last selected one all run (each output feeds the next); only the
+    # selected ones are timed repeatedly, traced and reported
+    outputs = {"ingest_csv": "df", "prepare": "data", "descriptives": "desc", "charts": "pngs"}
+    last = max(STAGES.index(st) for st in stages)
+    rows = []
+    for stage in STAGES[: last + 1]:
+        if stage == "ingest_xlsx" and (stage not in stages or stage in skipped):
+            continue
+        wanted = stage in stages
+        value, seconds, peak = measure(fns[stage], repeat if wanted else 1, memory and wanted)
+        if stage in outputs:
+            s[outputs[stage]] = value
+        elif stage == "normality":
+            s["pair"] = value[0]
+        elif stage == "correlation":
+            s["assoc"] = value[0]
+        if wanted:
+            rows.append({"rows": n_rows, "items": n_items, "stage": stage,
+                         "seconds": round(seconds, 5), "peak_mb": None if peak is None else round(peak, 3)})
+            print(f"  {n_rows:>9,} rows {n_items:>4} items  {stage:<13} {seconds:9.4f} s"
+                  + ("" if peak is None else f"  {peak:9.1f} MB"), flush=True)
+    return rows
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__,
+            "scipy": scipy.__version__, "matplotlib": matplotlib.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run(row_counts, item_counts, stages: List[str], missing: str, repeat: int = 1, memory: bool = True,
+        max_cells: int = 50_000_000, xlsx_max_cells: int = 2_000_000) -> dict:
+    results, skipped = [], []
+    for n_rows in row_counts:
+        for n_items in item_counts:
+            if n_rows * n_items > max_cells:
+                skipped.append({"rows": n_rows, "items": n_items, "reason": f"more than {max_cells:,} cells"})
+                continue
+            results += run_size(n_rows, n_items, stages, missing, repeat, memory, xlsx_max_cells)
+            if "ingest_xlsx" in stages and n_rows * (n_items + 3) > xlsx_max_cells:
+                skipped.append({"rows": n_rows, "items": n_items, "stage": "ingest_xlsx",
+                                "reason": f"more than {xlsx_max_cells:,} cells for XLSX"})
+    return {"environment": environment(), "missing": missing, "repeat": repeat,
+            "results": results, "skipped": skipped}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25, min_seconds: float = 0.01) -> pd.DataFrame:
+    """Per stage and size: seconds and peak MB now vs the baseline, and a verdict.
+
+    A stage is "slower"/"faster" only when the ratio passes `tolerance` and the absolute
+    difference `min_seconds` (millisecond stages are mostly noise).
+    """
+    base = {(r["rows"], r["items"], r["stage"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        b = base.get((r["rows"], r["items"], r["stage"]))
+        row = {"rows": r["rows"], "items": r["items"], "stage": r["stage"], "seconds": r["seconds"],
+               "base_seconds": None, "ratio": None, "peak_mb": r["peak_mb"], "base_peak_mb": None, "verdict": "new"}
+        if b is not None:
+            ratio = r["seconds"] / b["seconds"] if b["seconds"] > 0 else np.inf
+            diff = r["seconds"] - b["seconds"]
+            verdict = "same"
+            if ratio > 1 + tolerance and diff > min_seconds:
+                verdict = "slower"
+            elif ratio < 1 / (1 + tolerance) and -diff > min_seconds:
+                verdict = "faster"
+            row.update(base_seconds=b["seconds"], ratio=round(ratio, 3), base_peak_mb=b.get("peak_mb"),
+                       verdict=verdict)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage.")
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    ap.add_argument("--items", type=int, nargs="+", default=[10, 100, 500])
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    ap.add_argument("--missing", choices=pipeline.MISSING_METHODS, default="Fill with mean",
+                    help="missing-value option for the prepare stage (default exercises the fill)")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--no-memory", action="store_true", help="skip the traced run per stage")
+    ap.add_argument("--max-cells", type=int, default=50_000_000,
+                    help="skip sizes with more rows x items than this")
+    ap.add_argument("--xlsx-max-cells", type=int, default=2_000_000,
+                    help="skip XLSX ingestion above this many cells (writing the input is slow)")
+    ap.add_argument("--out", default="bench_pipeline.json")
+    ap.add_argument("--baseline", help="earlier --out file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args(argv)
+
+    current = run(args.rows, args.items, args.stages, args.missing, args.repeat, not args.no_memory,
+                  args.max_cells, args.xlsx_max_cells)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"wrote {args.out}")
+    for s in current["skipped"]:
+        print(f"  skipped {s['rows']:,} rows x {s['items']} items {s.get('stage', '')}: {s['reason']}")
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    table = compare(current, baseline, args.tolerance)
+    print(table.to_string(index=False))
+    slower = table[table["verdict"] == "slower"]
+    if len(slower):
+        print(f"{len(slower)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
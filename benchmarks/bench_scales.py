@@ -0,0 +1,72 @@
+# bench_scales.py
+# Composites and reliability for many constructs: one pandas row sum per scale and a
+# per-item refit of alpha / item-total r vs survey_scales' single weight-matrix product
+# and one covariance matrix per scale.
+# Run from the repo root: python -m benchmarks.bench_scales [--rows 200000] [--scales 10] [--items 8]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_descriptives import best_of, likert_frame
+from survey_scales import Scale, reliability_table, scale_scores
+
+
+def cronbach_alpha(X: np.ndarray) -> float:
+    k = X.shape[1]
+    return k / (k - 1) * (1 - X.var(axis=0, ddof=1).sum() / X.sum(axis=1).var(ddof=1))
+
+
+def per_scale_sums(df: pd.DataFrame, scales) -> pd.DataFrame:
+    out = {}
+    for s in scales:
+        part = df[s.items].copy()
+        for c in s.reverse:
+            part[c] = 6 - part[c]
+        out[s.name] = part.sum(axis=1, skipna=False)
+    return pd.DataFrame(out)
+
+
+def per_item_refit(df: pd.DataFrame, scales) -> list:
+    out = []
+    for s in scales:
+        part = df[s.items].dropna()
+        for c in s.reverse:
+            part[c] = 6 - part[c]
+        X = part.to_numpy()
+        rows = []
+        for i in range(X.shape[1]):
+            rest = np.delete(X, i, axis=1)
+            rows.append((cronbach_alpha(rest), np.corrcoef(X[:, i], rest.sum(axis=1))[0, 1]))
+        out.append((cronbach_alpha(X), rows))
+    return out
+
+
+def run(n_rows: int, n_scales: int, n_items: int, repeat: int) -> pd.DataFrame:
+    df = likert_frame(n_rows, n_scales * n_items)
+    cols = df.columns.tolist()
+    scales = [Scale(f"S{j + 1}", cols[j * n_items:(j + 1) * n_items], reverse=cols[j * n_items:j * n_items + 1], bounds=(1, 5))
+              for j in range(n_scales)]
+    M = df.to_numpy(dtype=float)
+    assert np.allclose(scale_scores(M, cols, scales), per_scale_sums(df, scales).to_numpy(), equal_nan=True)
+    naive = per_item_refit(df, scales)
+    fast = reliability_table(M, cols, scales)
+    assert np.allclose([a for a, _ in naive], fast.summary["alpha"])
+    rows = [{"step": "composites", "path": "row sum per scale", "seconds": best_of(lambda: per_scale_sums(df, scales), repeat)},
+            {"step": "composites", "path": "one weight-matrix product", "seconds": best_of(lambda: scale_scores(M, cols, scales), repeat)},
+            {"step": "reliability", "path": "refit per item", "seconds": best_of(lambda: per_item_refit(df, scales), repeat)},
+            {"step": "reliability", "path": "one covariance per scale", "seconds": best_of(lambda: reliability_table(M, cols, scales), repeat)}]
+    out = pd.DataFrame(rows)
+    out["speedup"] = out.groupby("step")["seconds"].transform("first") / out["seconds"]
+    return out.round(4)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time composites and reliability for many scales against per-scale pandas.")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--scales", type=int, default=10)
+    ap.add_argument("--items", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    print(run(args.rows, args.scales, args.items, args.repeat).to_string(index=False))
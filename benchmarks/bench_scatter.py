@@ -0,0 +1,54 @@
+# bench_scatter.py
+# Drawing the X_total vs Y_total scatter with one marker per respondent vs the density
+# plot (survey_charts.density_grid + heatmap) used above DENSITY_MIN_ROWS pairs.
+# Run from the repo root: python -m benchmarks.bench_scatter [--rows 100000 1000000]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import survey_pipeline as pipeline
+from benchmarks.bench_descriptives import best_of
+from survey_charts import density_grid
+
+
+def totals_pair(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    # two correlated 4-item Likert totals (4..20)
+    rng = np.random.default_rng(seed)
+    x = rng.integers(4, 21, n_rows).astype(float)
+    y = np.clip(x + rng.integers(-5, 6, n_rows), 4, 20).astype(float)
+    return pd.DataFrame({"X_total": x, "Y_total": y})
+
+
+def run(row_counts, repeat: int) -> pd.DataFrame:
+    rows = []
+    for n in row_counts:
+        pair = totals_pair(n)
+        assoc = pipeline.correlate(pair, "pearson")
+        t_markers = best_of(lambda: _markers_png(pair, assoc), repeat)
+        t_grid = best_of(lambda: density_grid(pair["X_total"], pair["Y_total"]), repeat)
+        grid = density_grid(pair["X_total"], pair["Y_total"])
+        t_density = best_of(lambda: pipeline.scatter_png(pair, assoc, grid=grid), repeat)
+        rows.append({"rows": n, "markers_s": round(t_markers, 3), "grid_s": round(t_grid, 4),
+                     "density_png_s": round(t_density, 3),
+                     "speedup": round(t_markers / (t_grid + t_density), 1)})
+    return pd.DataFrame(rows)
+
+
+def _markers_png(pair: pd.DataFrame, assoc: dict) -> bytes:
+    # the plot before density mode: force the marker path whatever the size
+    threshold = pipeline.DENSITY_MIN_ROWS
+    pipeline.DENSITY_MIN_ROWS = len(pair) + 1
+    try:
+        return pipeline.scatter_png(pair, assoc)
+    finally:
+        pipeline.DENSITY_MIN_ROWS = threshold
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time drawing the scatter with one marker per respondent vs the density plot.")
+    ap.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.repeat).to_string(index=False))
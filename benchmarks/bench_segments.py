@@ -0,0 +1,54 @@
+# bench_segments.py
+# Re-filtering the frame per segment (mean/sd per column, pearsonr, kruskal, f_oneway)
+# vs survey_segments' single bincount pass over the level codes.
+# Run from the repo root: python -m benchmarks.bench_segments [--rows 1000000] [--segments 5 50]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from benchmarks.bench_descriptives import best_of, likert_frame
+from survey_segments import segment_frame
+
+
+def survey_frame(n_rows: int, n_segments: int, seed: int = 0) -> pd.DataFrame:
+    df = likert_frame(n_rows, 8, seed=seed)
+    df["X_total"] = df.iloc[:, :4].sum(axis=1, skipna=False)
+    df["Y_total"] = df.iloc[:, 4:8].sum(axis=1, skipna=False)
+    df["segment"] = np.random.default_rng(seed).integers(0, n_segments, n_rows).astype(str)
+    return df
+
+
+def loop_segments(df: pd.DataFrame, cols):
+    out = {}
+    for level, sub in ((lv, df[df["segment"] == lv]) for lv in df["segment"].unique()):
+        pair = sub[["X_total", "Y_total"]].dropna()
+        out[level] = (sub[cols].mean(), sub[cols].std(), stats.pearsonr(pair["X_total"], pair["Y_total"]))
+    for c in cols:
+        groups = [g.dropna().to_numpy() for _, g in df.groupby("segment")[c]]
+        stats.kruskal(*groups)
+        stats.f_oneway(*groups)
+    return out
+
+
+def run(n_rows: int, segment_counts, repeat: int) -> pd.DataFrame:
+    rows = []
+    for k in segment_counts:
+        df = survey_frame(n_rows, k)
+        cols = [c for c in df.columns if c != "segment"]
+        t_loop = best_of(lambda: loop_segments(df, cols), repeat)
+        t_seg = best_of(lambda: segment_frame(df, "segment", cols), repeat)
+        rows.append({"segments": k, "rows": n_rows, "loop_s": round(t_loop, 3),
+                     "grouped_s": round(t_seg, 3), "speedup": round(t_loop / t_seg, 1)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Time segment comparisons in one bincount pass against re-filtering per segment.")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--segments", type=int, nargs="+", default=[5, 50])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    print(run(args.rows, args.segments, args.repeat).to_string(index=False))
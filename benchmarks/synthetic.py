@@ -0,0 +1,67 @@
+# synthetic.py
+# Seeded synthetic Likert surveys for the benchmarks. Two latent constructs X and Y
+# with a chosen correlation; every item is its construct plus noise, cut into 1..levels
+# at the normal quantiles (roughly uniform answers). Demographics are text columns,
+# and a share of item answers is left blank.
+# Run from the repo root to write a file: python -m benchmarks.synthetic OUT.csv [--rows 100000] [--items 20]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+GENDERS = ["Female", "Male", "Other"]
+AGES = ["18-20", "21-23", "24-26", "27+"]
+MAJORS = [f"Major {i}" for i in range(30)]
+
+
+def synthetic_survey(n_rows: int, n_items: int = 8, missing: float = 0.05, correlation: float = 0.5,
+                     loading: float = 0.7, levels: int = 5, seed: int = 0) -> pd.DataFrame:
+    """X1..Xk and Y1..Ym Likert items (k = n_items // 2), then gender, age and major.
+
+    `correlation` is between the latent constructs and `loading` between each item and
+    its construct, so X_total vs Y_total correlates somewhat below `correlation`.
+    `missing` is the share of item cells left blank (float columns, as parsed from CSV).
+    """
+    rng = np.random.default_rng(seed)
+    n_x = max(1, n_items // 2)
+    n_y = max(1, n_items - n_x)
+    latent_x = rng.standard_normal(n_rows)
+    latent_y = correlation * latent_x + np.sqrt(1 - correlation ** 2) * rng.standard_normal(n_rows)
+    cuts = stats.norm.ppf(np.arange(1, levels) / levels)
+    noise = np.sqrt(1 - loading ** 2)
+    cols = {}
+    for prefix, latent, k in (("X", latent_x, n_x), ("Y", latent_y, n_y)):
+        for i in range(k):
+            answer = np.digitize(loading * latent + noise * rng.standard_normal(n_rows), cuts) + 1.0
+            if missing > 0:
+                answer[rng.random(n_rows) < missing] = np.nan
+            cols[f"{prefix}{i + 1}"] = answer
+    df = pd.DataFrame(cols)
+    df["gender"] = np.array(GENDERS, dtype=object)[rng.integers(0, len(GENDERS), n_rows)]
+    df["age"] = np.array(AGES, dtype=object)[rng.integers(0, len(AGES), n_rows)]
+    df["major"] = np.array(MAJORS, dtype=object)[rng.integers(0, len(MAJORS), n_rows)]
+    return df
+
+
+def item_columns(df: pd.DataFrame):
+    """(X items, Y items) of a synthetic survey."""
+    return ([c for c in df.columns if c.startswith("X")], [c for c in df.columns if c.startswith("Y")])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write a synthetic survey CSV or XLSX.")
+    ap.add_argument("out", help=".csv or .xlsx path")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--items", type=int, default=8)
+    ap.add_argument("--missing", type=float, default=0.05)
+    ap.add_argument("--correlation", type=float, default=0.5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    df = synthetic_survey(args.rows, args.items, args.missing, args.correlation, seed=args.seed)
+    if args.out.lower().endswith(".xlsx"):
+        df.to_excel(args.out, index=False)
+    else:
+        df.to_csv(args.out, index=False)
+    print(f"wrote {args.out}: {len(df):,} rows, {args.items} items")
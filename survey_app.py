@@ -6,12 +6,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from scipy import stats
-import io, base64, os
+import base64, os, tempfile, uuid
 from typing import List
 
+from survey_cache import LRUCache, ResultCache
+from survey_charts import DENSITY_MIN_ROWS, ChartRenderer, heatmap_png, hist_box_spec
+from survey_columnar import AVAILABLE as COLUMNAR_AVAILABLE, MappedPair, column_stats, mapped_missing, open_columnar
+from survey_drivers import OVERALL, VIF_WARN
+from survey_dtypes import frame_nbytes
+from survey_excel import load_xlsx_columns, peek_xlsx
+from survey_incremental import NOT_MERGEABLE, append_upload, state_path
+from survey_ingest import content_hash, file_kind, load_frame
+from survey_perf import NULL_PROFILER, Profiler, configure_log, log_event
+from survey_report import start_report
+from survey_scales import parse_scales, scale_items
+import survey_pipeline as pipeline
+from survey_streaming import apply_missing, peek_csv, stream_csv
+
 # ---------- Config ----------
 st.set_page_config(page_title="Survey Analyzer", layout="wide")
 
@@ -25,6 +36,14 @@ if "lang" not in st.session_state:
     st.session_state.lang = "en"  # default English
 if "missing_method" not in st.session_state:
     st.session_state.missing_method = "Drop rows (default)"
+if "streaming" not in st.session_state:
+    st.session_state.streaming = False
+if "incremental" not in st.session_state:
+    st.session_state.incremental = False
+if "excel_fast" not in st.session_state:
+    st.session_state.excel_fast = True
+if "columnar" not in st.session_state:
+    st.session_state.columnar = False
 
 # ---------- Utilities ----------
 def read_image_base64(path):
@@ -35,6 +54,157 @@ def read_image_base64(path):
 
 BG_BASE64 = read_image_base64(BG_IMAGE_PATH)
 
+def session_memo(name, key, fn, source="computed"):
+    # keep the last result per stage in session state; recompute only when its inputs change
+    memo = st.session_state.setdefault("_memo", {})
+    hit = memo.get(name)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    with profiler().stage(name, source=source):
+        value = fn()
+    memo[name] = (key, value)
+    return value
+
+def shared_memo(name, key, fn):
+    # as session_memo, but a session miss first asks the process-wide result cache, where
+    # another session may already have computed this stage for the same file and settings;
+    # `key` must identify the data by content (file_key), never by session
+    def compute():
+        profiler().mark(source="computed")
+        return fn()
+    return session_memo(name, key, lambda: get_result_cache().get_or_compute(name, key, compute), source="result cache")
+
+# Append mode keeps each open survey's running statistics in SURVEY_STATE_DIR.
+STATE_DIR = os.environ.get("SURVEY_STATE_DIR", ".survey_state")
+
+# Parsed uploads are cached across reruns (and sessions) keyed by content hash.
+# SURVEY_CACHE_MB bounds the in-memory cache; SURVEY_PARQUET_DIR (optional) keeps a
+# Parquet copy of every parsed upload on disk so a fresh process also skips parsing.
+FRAME_CACHE_MB = int(os.environ.get("SURVEY_CACHE_MB", "512"))
+PARQUET_DIR = os.environ.get("SURVEY_PARQUET_DIR") or None
+
+# Fast Excel mode can also keep the columns read from each workbook sheet as Parquet on disk
+# (SURVEY_EXCEL_DIR, else SURVEY_PARQUET_DIR); with neither set they stay in the memory cache only.
+EXCEL_DIR = os.environ.get("SURVEY_EXCEL_DIR") or PARQUET_DIR
+
+# Out-of-core mode converts each CSV upload once into a memory-mapped Arrow file here,
+# next to the composite columns computed from it (SURVEY_COLUMNAR_DIR, else the temp directory);
+# the least recently used files go once the folder passes SURVEY_COLUMNAR_MAX_MB (4 GB).
+COLUMNAR_DIR = os.environ.get("SURVEY_COLUMNAR_DIR") or os.path.join(tempfile.gettempdir(), "survey_columnar")
+
+@st.cache_resource
+def get_frame_cache():
+    return LRUCache(max_bytes=FRAME_CACHE_MB * 1024 * 1024)
+
+# Stage results (prepared table, descriptives, normality, correlations, figures, ...)
+# shared by all sessions. SURVEY_RESULT_CACHE_MB bounds it; results nobody has read for
+# SURVEY_RESULT_TTL_S seconds are dropped (0 keeps them until evicted by size).
+RESULT_CACHE_MB = int(os.environ.get("SURVEY_RESULT_CACHE_MB", "256"))
+RESULT_TTL_S = float(os.environ.get("SURVEY_RESULT_TTL_S", "3600"))
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(max_bytes=RESULT_CACHE_MB * 1024 * 1024, ttl=RESULT_TTL_S)
+
+@st.cache_resource
+def get_chart_renderer():
+    # PNG bytes of the card charts, shared by all sessions
+    return ChartRenderer(max_bytes=int(os.environ.get("SURVEY_CHART_CACHE_MB", "64")) * 1024 * 1024)
+
+# ---------- Admin: cache statistics ----------
+# Shown with ?admin=1 in the URL or SURVEY_ADMIN=1 in the environment. The caches are
+# process-wide, so the numbers cover every session and "Clear" affects everyone.
+ADMIN = os.environ.get("SURVEY_ADMIN") == "1"
+
+@st.fragment
+def admin_panel():
+    caches = {"files": get_frame_cache().stats(), "results": get_result_cache().stats(),
+              "charts": get_chart_renderer().cache.stats()}
+    rows = []
+    for name, s in caches.items():
+        lookups = s["hits"] + s["misses"]
+        rows.append({"cache": name, "entries": s["entries"], "MB": s["bytes"] / 1024**2,
+                     "budget MB": s["max_bytes"] / 1024**2, "hits": s["hits"], "misses": s["misses"],
+                     "hit rate": s["hits"] / lookups if lookups else np.nan,
+                     "evicted": s["evictions"], "expired": s.get("expirations", 0)})
+    st.dataframe(pd.DataFrame(rows).set_index("cache").round(3))
+    stages = caches["results"]["stages"]
+    if stages:
+        st.caption("Result cache by stage (seconds spent computing / saved by hits)")
+        table = pd.DataFrame.from_dict(stages, orient="index")[["entries", "hits", "misses", "compute_s", "saved_s"]]
+        st.dataframe(table.sort_values("saved_s", ascending=False).round(3))
+    st.caption(f"Results idle for {RESULT_TTL_S:.0f} s are dropped." if RESULT_TTL_S > 0 else "Results are kept until evicted by size.")
+    c1, c2 = st.columns(2)
+    if c1.button("Refresh"):
+        st.rerun(scope="fragment")
+    if c2.button("Clear results"):
+        get_result_cache().clear()
+        st.rerun(scope="fragment")
+
+# ---------- Performance instrumentation ----------
+# With SURVEY_PERF=1 in the environment (or ?perf=1 in the URL) every full rerun is timed
+# stage by stage (memoized stages, chart rendering, cards, association) and logged as one
+# JSON line to SURVEY_PERF_LOG (stderr when unset); the sidebar shows the last rerun as a
+# waterfall. Off, every stage runs under NULL_PROFILER. Fragment reruns are not profiled.
+PERF = os.environ.get("SURVEY_PERF") == "1"
+PERF_LOG = os.environ.get("SURVEY_PERF_LOG") or None
+
+def start_profiler():
+    prev = st.session_state.get("_perf")
+    if prev is not None and not prev.finished:
+        # the previous rerun ended early (st.stop, an exception or a newer rerun)
+        prev.finish(stopped=True)
+    if not (PERF or st.query_params.get("perf") == "1"):
+        st.session_state._perf = None
+        return NULL_PROFILER
+    configure_log(PERF_LOG)
+    session = st.session_state.setdefault("_perf_session", uuid.uuid4().hex[:12])
+    prof = Profiler(session=session, trace_memory=st.session_state.get("perf_trace", False))
+    st.session_state._perf = prof
+    return prof
+
+def profiler():
+    # the profiler of the full rerun in progress (NULL_PROFILER when off or in a fragment rerun)
+    prof = st.session_state.get("_perf")
+    return prof if prof is not None and not prof.finished else NULL_PROFILER
+
+def perf_panel(record):
+    lang = st.session_state.lang
+    stages = pd.DataFrame(record["stages"])
+    rss = f"; RSS {record['rss_mb']:.0f} MB" if record.get("rss_mb") is not None else ""
+    st.caption((f"Last rerun: {record['total_s'] * 1000:.0f} ms, {len(stages)} stages timed{rss}." if lang == "en" else
+                f"Rerun terakhir: {record['total_s'] * 1000:.0f} ms, {len(stages)} tahap diukur{rss}."))
+    if len(stages):
+        stages["label"] = [f"{i + 1:02d} " + "· " * d + s for i, (d, s) in enumerate(zip(stages["depth"], stages["stage"]))]
+        stages["start_ms"] = stages["start_s"] * 1000
+        stages["end_ms"] = (stages["start_s"] + stages["seconds"]) * 1000
+        stages["ms"] = stages["seconds"] * 1000
+        for c in ("source", "detail"):
+            stages[c] = stages[c].fillna("") if c in stages else ""
+        st.vega_lite_chart(stages[["label", "stage", "source", "detail", "start_ms", "end_ms", "ms"]], {
+            "mark": "bar",
+            "encoding": {
+                "y": {"field": "label", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "start_ms", "type": "quantitative", "title": "ms"},
+                "x2": {"field": "end_ms"},
+                "color": {"field": "source", "type": "nominal", "title": None},
+                "tooltip": [{"field": "stage"}, {"field": "ms", "format": ".1f"}, {"field": "source"}, {"field": "detail"}],
+            },
+        }, use_container_width=True)
+        cols = ["stage", "source", "detail", "ms", "rss_delta_mb"] + (["alloc_peak_mb"] if "alloc_peak_mb" in stages else [])
+        st.dataframe(stages[cols].round(3), hide_index=True)
+    st.checkbox("Trace allocations (slows the whole app) / Lacak alokasi memori", key="perf_trace",
+                help="Peak memory allocated in each stage (tracemalloc), from the next rerun on.")
+    if record.get("trace_busy"):
+        st.caption("Another session was tracing allocations, so this rerun was timed without them." if lang == "en" else
+                   "Sesi lain sedang melacak alokasi, jadi rerun ini diukur tanpa alokasi.")
+    job = st.session_state.get("report_job")
+    if job is not None and job.seconds is not None:
+        st.caption(f"Last PDF export: {job.pages} pages in {job.seconds:.2f} s" if lang == "en" else
+                   f"Ekspor PDF terakhir: {job.pages} halaman dalam {job.seconds:.2f} s")
+
+perf = start_profiler()
+
 # ---------- Multilanguage dictionary ----------
 LANGUAGES = {
     "en": "English",
@@ -99,14 +269,14 @@ TEXT = {
         "nl": "Omgaan met ontbrekende waarden",
     },
     "missing_options": {
-        "en": ["Drop rows (default)", "Fill with 0", "Fill with mean", "Fill with median"],
-        "id": ["Hapus baris (default)", "Isi dengan 0", "Isi dengan mean", "Isi dengan median"],
-        "cn": ["删除含缺失的行 (默认)", "用 0 填充", "用均值填充", "用中位数填充"],
-        "jp": ["行を削除（デフォルト）", "0で埋める", "平均で埋める", "中央値で埋める"],
-        "kr": ["행 삭제 (기본)", "0으로 채우기", "평균으로 채우기", "중앙값으로 채우기"],
-        "ru": ["Удалить строки (по умолч.)", "Заполнить 0", "Заполнить средним", "Заполнить медианой"],
-        "de": ["Zeilen löschen (Standard)", "Mit 0 füllen", "Mit Mittelwert füllen", "Mit Median füllen"],
-        "nl": ["Rijen verwijderen (standaard)", "Vullen met 0", "Vullen met gemiddelde", "Vullen met mediaan"],
+        "en": ["Drop rows (default)", "Drop incomplete rows (listwise)", "Fill with 0", "Fill with mean", "Fill with median"],
+        "id": ["Hapus baris (default)", "Hapus baris tidak lengkap (listwise)", "Isi dengan 0", "Isi dengan mean", "Isi dengan median"],
+        "cn": ["删除含缺失的行 (默认)", "删除不完整的行 (成列删除)", "用 0 填充", "用均值填充", "用中位数填充"],
+        "jp": ["行を削除（デフォルト）", "不完全な行を削除（リストワイズ）", "0で埋める", "平均で埋める", "中央値で埋める"],
+        "kr": ["행 삭제 (기본)", "불완전한 행 삭제 (목록별)", "0으로 채우기", "평균으로 채우기", "중앙값으로 채우기"],
+        "ru": ["Удалить строки (по умолч.)", "Удалить неполные строки (listwise)", "Заполнить 0", "Заполнить средним", "Заполнить медианой"],
+        "de": ["Zeilen löschen (Standard)", "Unvollständige Zeilen löschen (listwise)", "Mit 0 füllen", "Mit Mittelwert füllen", "Mit Median füllen"],
+        "nl": ["Rijen verwijderen (standaard)", "Onvolledige rijen verwijderen (listwise)", "Vullen met 0", "Vullen met gemiddelde", "Vullen met mediaan"],
     },
     "compute_composites": {
         "en": "Compute composite scores X_total & Y_total (sum)",
@@ -257,13 +427,46 @@ with st.sidebar:
     st.session_state.theme_dark = dark_toggle
     set_dark_class_js(dark_toggle)
 
+    # streaming mode: CSV is read in chunks into running statistics, never loaded whole
+    st.session_state.streaming = st.checkbox("⚡ Streaming mode (large CSV) / Mode streaming", value=st.session_state.streaming,
+                                             help="Read the CSV in chunks and compute statistics in one pass without loading the full file.")
+    # out-of-core mode: the CSV becomes a memory-mapped columnar file, read one batch at a time
+    st.session_state.columnar = st.checkbox("🗄 Out-of-core mode (very large CSV) / Mode out-of-core", value=st.session_state.columnar,
+                                            disabled=not COLUMNAR_AVAILABLE,
+                                            help="Convert the CSV once into a memory-mapped columnar file on disk and compute every "
+                                                 "statistic from the selected columns batch by batch, so memory stays flat as rows grow. "
+                                                 "Exact medians and association tests, unlike streaming mode. Needs pyarrow.")
+    # append mode: running statistics of an open survey are saved and updated with each upload
+    st.session_state.incremental = st.checkbox("📈 Append mode (open survey) / Mode tambah respons", value=st.session_state.incremental,
+                                               help="Upload only the new responses, or the whole growing CSV: the saved statistics "
+                                                    "of the survey are updated with the new rows only.")
+    if st.session_state.incremental:
+        survey_name = st.text_input("Survey name / Nama survei", value="survey")
+    # fast Excel: only the header is read up front, then just the selected columns
+    st.session_state.excel_fast = st.checkbox("📑 Fast Excel (selected columns only) / Excel cepat", value=st.session_state.excel_fast,
+                                              help="Read only the columns chosen below from the workbook and keep a "
+                                                   "columnar copy for later reruns, instead of loading every cell.")
+
     st.markdown("---")
     st.subheader(TEXT["missing_label"][st.session_state.lang])
     missing_opts = TEXT["missing_options"][st.session_state.lang]
-    missing_choice = st.radio("", options=missing_opts, index=0)
+    missing_choice = st.radio("", options=missing_opts, index=0,
+                              help="Drop rows: each statistic skips the rows missing in its own columns (pairwise). "
+                                   "Listwise: only rows complete on every selected column are used.")
     # normalize to English internal keys
-    mapping_missing = dict(zip(missing_opts, ["Drop rows (default)", "Fill with 0", "Fill with mean", "Fill with median"]))
+    mapping_missing = dict(zip(missing_opts, pipeline.MISSING_METHODS))
     st.session_state.missing_method = mapping_missing.get(missing_choice, "Drop rows (default)")
+    item_mean = st.checkbox("Fill missing items with the item mean in composites / Isi item kosong dengan rata-rata item dalam komposit",
+                            value=False, disabled=st.session_state.streaming or st.session_state.incremental or st.session_state.columnar,
+                            help="A respondent who skipped an item gets that item's mean in X_total/Y_total instead of no total. "
+                                 "Not available in streaming, append or out-of-core mode.")
+
+    if ADMIN or st.query_params.get("admin") == "1":
+        with st.expander("🛠 Admin: caches"):
+            admin_panel()
+    if perf is not NULL_PROFILER:
+        # filled at the end of the rerun, once every stage has been timed
+        perf_slot = st.empty()
 
     st.markdown("---")
     st.subheader("Column tagging / Kategorisasi Kolom")
@@ -291,17 +494,54 @@ if not uploaded:
     st.info(TEXT["upload"][st.session_state.lang])
     st.stop()
 
-# read file safely
+# read file safely (cached by content hash; df is shared, never mutate it in place)
+frame_cache = get_frame_cache()
+incremental = st.session_state.incremental
+kind = file_kind(uploaded.name)
+columnar = st.session_state.columnar and COLUMNAR_AVAILABLE and kind == "csv" and not incremental
+streaming = st.session_state.streaming and kind == "csv" and not incremental and not columnar
+excel_fast = st.session_state.excel_fast and kind == "xlsx" and not incremental
+sheet = None
+# streaming, append and out-of-core mode read their statistics from accumulators instead of the table
+accumulated = streaming or incremental or columnar
+# identifies this upload across reruns without re-hashing its bytes
+upload_key = (getattr(uploaded, "file_id", None) or content_hash(uploaded.getvalue()), uploaded.name)
+# identifies its content for every session (hashed once per upload): the shared result key
+file_key = session_memo("file_key", upload_key, lambda: (content_hash(uploaded.getvalue()), file_kind(uploaded.name)))
 try:
-    if str(uploaded.name).lower().endswith(".csv"):
-        df = pd.read_csv(uploaded)
+    if columnar:
+        # converted once per file content; df is only the first rows, for the column pickers
+        mapped = shared_memo("columnar", file_key, lambda: open_columnar(uploaded.getvalue(), COLUMNAR_DIR))
+        df = mapped.head()
+    elif streaming or (incremental and kind == "csv"):
+        # only the header and first rows; statistics are streamed (or appended) further below
+        df = session_memo("peek", upload_key, lambda: peek_csv(uploaded))
+    elif kind == "xlsx":
+        # sheet list and the first rows of the first sheet (read-only, nothing else is parsed)
+        sheets, first_rows = session_memo("xlsx_peek", upload_key, lambda: peek_xlsx(uploaded.getvalue()))
+        sheet = sheets[0]
+        if len(sheets) > 1:
+            with st.sidebar:
+                sheet = st.selectbox("Sheet / Lembar kerja", sheets)
+        if excel_fast:
+            # the selected columns are read further below, once they are known
+            df = first_rows if sheet == sheets[0] else session_memo(
+                "xlsx_sheet_peek", (upload_key, sheet), lambda: peek_xlsx(uploaded.getvalue(), sheet)[1])
+        else:
+            df = session_memo("frame", (upload_key, sheet), lambda: load_frame(uploaded.getvalue(), uploaded.name, cache=frame_cache,
+                                                                          parquet_dir=PARQUET_DIR, sheet_name=sheet))
     else:
-        df = pd.read_excel(uploaded, engine="openpyxl")
+        df = session_memo("frame", upload_key, lambda: load_frame(uploaded.getvalue(), uploaded.name, cache=frame_cache, parquet_dir=PARQUET_DIR))
 except Exception as e:
     st.error(f"Error reading file: {e}")
     st.stop()
 
 st.success("File loaded successfully.")
+if columnar:
+    st.caption(f"Out-of-core: {mapped.num_rows:,} rows mapped from a {mapped.disk_bytes / 1024**2:.1f} MB columnar file; "
+               "only the selected columns are read, one batch at a time." if st.session_state.lang == "en" else
+               f"Out-of-core: {mapped.num_rows:,} baris dipetakan dari file kolumnar {mapped.disk_bytes / 1024**2:.1f} MB; "
+               "hanya kolom terpilih yang dibaca, per batch.")
 st.dataframe(df.head(8))
 
 # ---------- Sidebar: column tagging (continued) ----------
@@ -315,68 +555,231 @@ with st.sidebar:
     y_items = st.multiselect('Select Y items (min 4) / Pilih item Y (min 4)', all_cols, default=default_y)
     suggest_demo = [c for c in all_cols if any(k in c.lower() for k in ['age','gender','major','department','education','phone','usage'])]
     demo_cols = st.multiselect('Demographic columns (optional) / Kolom demografi (opsional)', all_cols, default=suggest_demo)
+    # more constructs besides X/Y: one per line, "-" before a reverse-coded item
+    scales_text = st.text_area("More scales (optional) / Skala lain (opsional)", value="",
+                               placeholder="Trust (1-5): T1, T2, -T3, T4\nSatisfaction: S1, S2, S3",
+                               help="One scale per line: name, optional response range, then its items separated by commas. "
+                                    "A '-' before an item reverse-codes it (low + high − answer). Every scale gets a composite "
+                                    "and a reliability check (Cronbach's alpha).")
+    try:
+        scales = parse_scales(scales_text)
+        unknown = [c for c in scale_items(scales) if c not in all_cols]
+        if unknown:
+            raise ValueError(("Unknown columns: " if st.session_state.lang == "en" else "Kolom tidak dikenal: ") + ", ".join(unknown))
+        pipeline.all_scales(x_items, y_items, scales)
+    except ValueError as e:
+        st.error(f"Scales / Skala: {e}")
+        scales = []
+
+    cs = frame_cache.stats()
+    st.caption(f"File cache: {cs['hits']} hits / {cs['misses']} misses, {cs['entries']} files, "
+               f"{cs['bytes'] / 1024**2:.1f} / {cs['max_bytes'] / 1024**2:.0f} MB")
 
     compute_composites = st.checkbox(TEXT["compute_composites"][st.session_state.lang], value=True if (len(x_items)>=1 and len(y_items)>=1) else False)
     allow_chi2 = st.checkbox(TEXT["enable_chi2"][st.session_state.lang], value=False)
     if allow_chi2:
         bins = st.slider('Number of bins (for chi-square) / Jumlah bin', 2, 6, 3)
 
-# ---------- Data cleaning & missing handling ----------
-df_work = df.copy()
-for c in x_items + y_items:
-    df_work[c] = pd.to_numeric(df_work[c], errors="coerce")
+items_to_describe = x_items + y_items if (len(x_items)+len(y_items) > 0) else numeric_cols
+mm = st.session_state.missing_method
+
+# ---------- Fast Excel: the selected columns only ----------
+if excel_fast:
+    needed = list(dict.fromkeys(x_items + y_items + items_to_describe + scale_items(scales) + demo_cols))
+    try:
+        df = session_memo("xlsx_columns", (upload_key, sheet, tuple(needed)),
+                          lambda: load_xlsx_columns(uploaded.getvalue(), sheet, needed, cache=frame_cache, parquet_dir=EXCEL_DIR))
+    except Exception as e:
+        st.error(f"Error reading file: {e}")
+        st.stop()
+    st.caption(f"Fast Excel: {len(needed)} of {len(all_cols)} columns read from sheet '{sheet}' ({len(df):,} rows); "
+               "they are kept as a columnar copy for later reruns." if st.session_state.lang == "en" else
+               f"Excel cepat: {len(needed)} dari {len(all_cols)} kolom dibaca dari lembar '{sheet}' ({len(df):,} baris); "
+               "disimpan sebagai salinan kolumnar untuk rerun berikutnya.")
 
+# ---------- Memory footprint ----------
+def memory_caption(df, df_work):
+    # sizes of the upload as parsed vs. with compact dtypes, and of the working table
+    mem = df.attrs.get("memory")
+    if not mem:
+        return
+    size = lambda b: f"{b / 1024**2:.1f} MB" if b >= 1024**2 else f"{b / 1024:.0f} KB"
+    ratio = mem["parsed_bytes"] / max(mem["compact_bytes"], 1)
+    work = frame_nbytes(df_work)
+    work_f64 = df_work.shape[0] * df_work.shape[1] * 8 + df_work.index.nbytes
+    if st.session_state.lang == "en":
+        st.caption(f"Memory: {size(mem['parsed_bytes'])} as parsed → {size(mem['compact_bytes'])} with compact types "
+                   f"({ratio:.1f}× smaller); working table {size(work)} (float64: {size(work_f64)}).")
+    else:
+        st.caption(f"Memori: {size(mem['parsed_bytes'])} saat dibaca → {size(mem['compact_bytes'])} dengan tipe ringkas "
+                   f"({ratio:.1f}× lebih kecil); tabel kerja {size(work)} (float64: {size(work_f64)}).")
+
+# ---------- Streaming statistics (large CSV) ----------
+def get_stream_stats(uploaded, items, composites, listwise):
+    # one chunked pass per (file, items, composites, listwise); kept in session state across reruns
+    key = (file_key, tuple(items), tuple((k, tuple(v)) for k, v in composites.items()), listwise)
+    def run():
+        with st.spinner("Streaming file in chunks..." if st.session_state.lang == "en" else "Membaca file per bagian..."):
+            return stream_csv(uploaded, items, composites, listwise=listwise)
+    return shared_memo("stream", key, run)
+
+# data_key: the working columns and their masks; work_key adds the missing-value option,
+# so switching the option only recomputes the statistics, never the working table
+data_key = (file_key, sheet, streaming, columnar, tuple(x_items), tuple(y_items), tuple(items_to_describe),
+            tuple(sc.spec() for sc in scales), compute_composites, item_mean,
+            (survey_name, st.session_state.get("append_generation", 0)) if incremental else None)
+work_key = data_key + (mm,)
+
+composites = {}
 if compute_composites:
     if len(x_items) >= 1:
-        df_work["X_total"] = df_work[x_items].sum(axis=1, skipna=False)
+        composites["X_total"] = x_items
     if len(y_items) >= 1:
-        df_work["Y_total"] = df_work[y_items].sum(axis=1, skipna=False)
+        composites["Y_total"] = y_items
+# the other scales are computed on the full table only (not in streaming, append or out-of-core mode)
+composite_names = ["X_total", "Y_total"] + ([] if accumulated else [sc.name for sc in scales])
+if accumulated and scales:
+    st.info("More scales and their reliability need the full table; turn off streaming / append / out-of-core mode to compute them." if st.session_state.lang == "en" else
+            "Skala lain dan reliabilitasnya memerlukan tabel lengkap; matikan mode streaming / tambah / out-of-core untuk menghitungnya.")
 
-# apply missing value handling chosen
-mm = st.session_state.missing_method
-if mm == "Fill with 0":
-    df_work = df_work.fillna(0)
-elif mm == "Fill with mean":
-    numeric_means = df_work.mean(numeric_only=True)
-    df_work = df_work.fillna(numeric_means)
-elif mm == "Fill with median":
-    numeric_meds = df_work.median(numeric_only=True)
-    df_work = df_work.fillna(numeric_meds)
-# else "Drop rows (default)" -> do not globally fill, we'll drop pairwise in association step if default
-
-# ---------- Descriptive helper ----------
-def descriptive_series(s: pd.Series):
-    s_num = pd.to_numeric(s, errors='coerce')
-    out = {}
-    out['count'] = int(s_num.count())
-    if out['count'] == 0:
-        return out
-    out['mean'] = s_num.mean()
-    out['median'] = s_num.median()
-    out['mode'] = s_num.mode().tolist()
-    out['min'] = s_num.min()
-    out['max'] = s_num.max()
-    out['std'] = s_num.std(ddof=1)
-    freq = s.value_counts(dropna=False).sort_index()
-    pct = (freq / freq.sum() * 100).round(2)
-    out['freq_table'] = pd.DataFrame({'count': freq, 'percent': pct})
-    return out
+# ---------- Append mode (open surveys) ----------
+def append_section():
+    # fold this upload into the survey's saved statistics (once per upload, selection and reset)
+    lang = st.session_state.lang
+    generation = st.session_state.get("append_generation", 0)
+    reset = st.session_state.pop("append_reset", False)
+    key = (upload_key, sheet, survey_name, tuple(items_to_describe), tuple((k, tuple(v)) for k, v in composites.items()), generation)
+    path = state_path(STATE_DIR, survey_name)
+    try:
+        out = session_memo("append", key, lambda: append_upload(path, uploaded.getvalue(), uploaded.name,
+                                                                items_to_describe, composites, reset=reset,
+                                                                sheet_name=sheet))
+    except Exception as e:
+        st.error(f"Append error: {e}")
+        st.stop()
+    state = out["state"]
+    if out["status"] == "mismatch":
+        st.warning(f"The saved statistics of '{survey_name}' were built for other items ({', '.join(state.items)}). "
+                   "Start over to rebuild them from this upload with the current selection." if lang == "en" else
+                   f"Statistik tersimpan '{survey_name}' dibuat untuk item lain ({', '.join(state.items)}). "
+                   "Mulai ulang untuk membangunnya dari unggahan ini dengan pilihan sekarang.")
+    elif out["status"] == "duplicate":
+        st.caption(f"Append mode — this upload is already included; '{survey_name}' has {state.n_rows:,} rows from {len(state.batches)} uploads."
+                   if lang == "en" else
+                   f"Mode tambah — unggahan ini sudah termasuk; '{survey_name}' berisi {state.n_rows:,} baris dari {len(state.batches)} unggahan.")
+    elif out["status"] == "overlap":
+        st.warning(f"This upload starts with rows '{survey_name}' already includes, but it is not the file seen so far plus new rows, "
+                   "so nothing was added. Upload only the new rows, or the whole file unchanged up to its new rows." if lang == "en" else
+                   f"Unggahan ini diawali baris yang sudah termasuk di '{survey_name}', tetapi bukan file sebelumnya ditambah baris baru, "
+                   "jadi tidak ada yang ditambahkan. Unggah hanya baris baru, atau seluruh file tanpa perubahan sampai baris barunya.")
+    else:
+        done = {"added": "added", "tail": "added (new rows of the whole file)"}[out["status"]]
+        st.caption(f"Append mode — this upload: {out['rows']:,} rows {done} in {out['seconds'] * 1000:.0f} ms; "
+                   f"'{survey_name}' now has {state.n_rows:,} rows from {len(state.batches)} uploads." if lang == "en" else
+                   f"Mode tambah — unggahan ini: {out['rows']:,} baris ({out['status']}) dalam {out['seconds'] * 1000:.0f} ms; "
+                   f"'{survey_name}' kini {state.n_rows:,} baris dari {len(state.batches)} unggahan.")
+    if st.button("Start over from this upload / Mulai ulang dari unggahan ini"):
+        st.session_state.append_reset = True
+        st.session_state.append_generation = generation + 1
+        st.rerun()
+    if out["status"] == "mismatch":
+        st.stop()
+    return state
 
-items_to_describe = x_items + y_items if (len(x_items)+len(y_items) > 0) else numeric_cols
+if incremental:
+    append_state = append_section()
+    if pipeline.HANDLING[mm] == "listwise":
+        st.info("Listwise deletion needs every row at once; append mode uses pairwise deletion." if st.session_state.lang == "en" else
+                "Penghapusan listwise butuh semua baris sekaligus; mode tambah memakai penghapusan pairwise.")
+    stream_acc = apply_missing(append_state.stats, mm)
+    # no rows are kept: only the composite names, for the sections that check for them
+    df_work = pd.DataFrame(columns=list(append_state.composites))
+elif columnar:
+    # one pass over the mapped columns; the composites are written to a mapped file beside it
+    listwise = pipeline.HANDLING[mm] == "listwise"
+    raw_acc, mapped_work = shared_memo("mapped_stats", (data_key, listwise), lambda: column_stats(
+        mapped, items_to_describe, composites, listwise, COLUMNAR_DIR))
+    stream_acc, mapped_fills = shared_memo("mapped_missing", work_key, lambda: mapped_missing(raw_acc, mapped_work, pipeline.HANDLING[mm]))
+    df_work = pd.DataFrame(columns=list(composites))
+elif streaming:
+    listwise = pipeline.HANDLING[mm] == "listwise"
+    raw_acc, comp_frame = get_stream_stats(uploaded, items_to_describe, composites, listwise)
+    stream_acc = apply_missing(raw_acc, mm)
+    # df_work holds only the composite columns (needed row-wise for association)
+    df_work = comp_frame if comp_frame is not None else pd.DataFrame()
+    work_data = shared_memo("masked", (data_key, listwise),
+                             lambda: pipeline.masked(df_work, df_work.columns.tolist()))
+else:
+    # ---------- Data cleaning & missing handling ----------
+    df_work = shared_memo("work", data_key, lambda: pipeline.prepare(df, x_items, y_items, compute_composites,
+                                                                     extra_cols=items_to_describe, item_mean=item_mean,
+                                                                     scales=scales))
+    memory_caption(df, df_work)
+    desc_cols = items_to_describe + scale_items(scales) + [c for c in ["X_total", "Y_total"] + [sc.name for sc in scales] if c in df_work.columns]
+    work_data = shared_memo("masked", data_key, lambda: pipeline.masked(df_work, desc_cols))
 
-# ---------- Descriptive display (cards) ----------
-st.header("A. " + ("Descriptive Statistics" if st.session_state.lang == "en" else "Statistik Deskriptif"))
-st.markdown('<div style="display:flex;flex-wrap:wrap;gap:14px;">', unsafe_allow_html=True)
+# ---------- Descriptive statistics (all described columns in one vectorized pass) ----------
+if not accumulated:
+    desc_table = shared_memo("desc", work_key, lambda: pipeline.descriptives(work_data, mm))
+
+def describe(col):
+    return stream_acc[col].summary() if accumulated else desc_table.summary(col)
+
+def chart_spec(col, max_bins, min_bins, per_bin):
+    # histogram bins are computed once here and reused by the PNG cache and the PDF pages
+    if accumulated:
+        # no rows to plot: histogram from value counts (or the sample), boxplot from quantiles
+        acc = stream_acc[col]
+        vals, weights = acc.hist_source()
+        return hist_box_spec(vals, min(max_bins, max(min_bins, int(acc.count / per_bin))), weights=weights, box=acc.box_stats())
+    data = desc_table.values(col)
+    return hist_box_spec(data, min(max_bins, max(min_bins, int(len(data) / per_bin))))
+
+def get_chart_specs(cols):
+    # built on demand (visible cards, PDF export) and kept while data and settings are unchanged
+    specs = session_memo("chart_specs", work_key, dict)
+    for col in cols:
+        if col not in specs:
+            specs[col] = chart_spec(col, 10, 4, 3) if col in composite_names else chart_spec(col, 8, 3, 4)
+    return {col: specs[col] for col in cols}
 
-for col in items_to_describe:
-    out = descriptive_series(df_work[col])
+def render_charts(cols):
+    # all cache misses are rendered together so they can go to the process pool in one batch
+    with profiler().stage("render_charts", detail=f"{len(cols)} charts"):
+        specs = get_chart_specs(cols)
+        return get_chart_renderer().render_many({c: sp for c, sp in specs.items() if sp["counts"].sum() > 0})
+
+def build_summary_grid():
+    # one row per item; in-memory mode reads the batch table, the other modes the accumulators
+    if not accumulated:
+        return desc_table.table.loc[items_to_describe]
+    rows = []
+    for col in items_to_describe:
+        a = stream_acc[col]
+        modes = a.mode()
+        rows.append({"item": col, "count": a.count, "n_missing": a.n_missing, "mean": a.mean if a.count else np.nan,
+                     "median": a.median, "mode": modes[0] if modes else np.nan,
+                     "min": a.min if a.count else np.nan, "max": a.max if a.count else np.nan, "std": a.std})
+    return pd.DataFrame(rows).set_index("item")
+
+def show_freq_table(out, name):
+    if out['freq_table'] is None:
+        st.caption("Too many distinct values for an exact frequency table in streaming/append/out-of-core mode." if st.session_state.lang == "en" else "Terlalu banyak nilai unik untuk tabel frekuensi pada mode streaming/tambah/out-of-core.")
+    else:
+        st.dataframe(out['freq_table'].reset_index().rename(columns={'index':name}))
+
+# ---------- Descriptive display (cards) ----------
+# A compact grid shows every item; the detailed cards (frequency table + chart) are paged,
+# so only the visible items get tables and charts built and sent to the browser.
+def render_item_card(col, pngs):
+    out = describe(col)
     st.markdown('<div class="glass-card fade-in" style="width:48%;">', unsafe_allow_html=True)
     st.markdown('<div class="card-accent"></div>', unsafe_allow_html=True)
     st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{col}</div>", unsafe_allow_html=True)
     if out.get('count', 0) == 0:
         st.write("No numeric data for this item." if st.session_state.lang == "en" else "Tidak ada data numerik untuk item ini.")
         st.markdown('</div>', unsafe_allow_html=True)
-        continue
+        return
     c1, c2, c3 = st.columns([1,1,1])
     with c1:
         st.markdown(f"<div class='metric'><div class='metric-label'>{'Count' if st.session_state.lang == 'en' else 'Jumlah'}</div><div class='metric-value'>{out['count']}</div></div>", unsafe_allow_html=True)
@@ -397,30 +800,43 @@ for col in items_to_describe:
     t1, t2 = st.columns([1,1])
     with t1:
         st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{'Frequency & Percentage' if st.session_state.lang == 'en' else 'Frekuensi & Persentase'}</div>", unsafe_allow_html=True)
-        st.dataframe(out['freq_table'].reset_index().rename(columns={'index':col}))
+        show_freq_table(out, col)
     with t2:
-        fig, axes = plt.subplots(1,2, figsize=(6,2.2))
-        data = pd.to_numeric(df_work[col], errors='coerce').dropna()
-        axes[0].hist(data, bins=min(8, max(3, int(len(data)/4))))
-        axes[0].set_title('Histogram')
-        axes[0].tick_params(axis='both', which='major', labelsize=8)
-        axes[1].boxplot(data, vert=True)
-        axes[1].set_title('Boxplot')
-        axes[1].tick_params(axis='both', which='major', labelsize=8)
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
+        st.image(pngs[col], use_column_width=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-st.markdown('</div>', unsafe_allow_html=True)
+@st.fragment
+def descriptive_section():
+    grid = session_memo("summary_grid", work_key, build_summary_grid)
+    st.subheader("Summary (all items)" if st.session_state.lang == "en" else "Ringkasan (semua item)")
+    st.dataframe(grid.round(3), use_container_width=True)
+
+    p1, p2 = st.columns([1, 1])
+    with p1:
+        page_size = st.selectbox("Cards per page / Kartu per halaman", options=[6, 12, 24, 48], index=1)
+    n_pages = max(1, -(-len(items_to_describe) // page_size))
+    with p2:
+        page = st.number_input(f"Page / Halaman (1-{n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+    visible = items_to_describe[(page - 1) * page_size: page * page_size]
+
+    pngs = render_charts(visible)
+    st.markdown('<div style="display:flex;flex-wrap:wrap;gap:14px;">', unsafe_allow_html=True)
+    for col in visible:
+        render_item_card(col, pngs)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+st.header("A. " + ("Descriptive Statistics" if st.session_state.lang == "en" else "Statistik Deskriptif"))
+with profiler().stage("cards"):
+    descriptive_section()
 
 # ---------- Composite totals ----------
 if compute_composites:
     st.header("Composite scores (X_total, Y_total)" if st.session_state.lang == "en" else "Statistik skor komposit (X_total, Y_total)")
-    for comp in ["X_total", "Y_total"]:
+    comp_pngs = render_charts([c for c in composite_names if c in df_work.columns])
+    for comp in composite_names:
         if comp in df_work.columns:
-            out = descriptive_series(df_work[comp])
+            out = describe(comp)
             st.markdown('<div class="glass-card fade-in">', unsafe_allow_html=True)
             st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{comp}</div>", unsafe_allow_html=True)
             if out.get('count',0) == 0:
@@ -446,207 +862,409 @@ if compute_composites:
             t1, t2 = st.columns([1,1])
             with t1:
                 st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{'Frequency & Percentage' if st.session_state.lang == 'en' else 'Frekuensi & Persentase'}</div>", unsafe_allow_html=True)
-                st.dataframe(out['freq_table'].reset_index().rename(columns={'index':comp}))
+                show_freq_table(out, comp)
             with t2:
-                fig, axes = plt.subplots(1,2, figsize=(6,2.2))
-                data = pd.to_numeric(df_work[comp], errors='coerce').dropna()
-                axes[0].hist(data, bins=min(10, max(4, int(len(data)/3))))
-                axes[0].set_title('Histogram')
-                axes[0].tick_params(axis='both', which='major', labelsize=8)
-                axes[1].boxplot(data, vert=True)
-                axes[1].set_title('Boxplot')
-                axes[1].tick_params(axis='both', which='major', labelsize=8)
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                st.image(comp_pngs[comp], use_column_width=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
+# ---------- Scale reliability ----------
+# Cronbach's alpha of every construct (X, Y and the scales from the sidebar) with
+# alpha-if-deleted and corrected item-total r per item, from one covariance matrix per scale.
+def reliability_section():
+    lang = st.session_state.lang
+    constructs = pipeline.all_scales(x_items, y_items, scales)
+    rel = shared_memo("reliability", work_key, lambda: pipeline.reliability(work_data, constructs, mm))
+    st.dataframe(rel.summary.round(3), use_container_width=True)
+    weak = rel.summary.index[rel.summary["alpha"] < 0.7].tolist()
+    if weak:
+        st.caption(("Alpha below 0.7 (treat these composites with care): " if lang == "en" else
+                    "Alpha di bawah 0,7 (gunakan komposit ini dengan hati-hati): ") + ", ".join(map(str, weak)))
+    for name, table in rel.items.items():
+        better = table.index[table["alpha_if_deleted"] > rel.summary.loc[name, "alpha"]].tolist()
+        label = f"{name}: " + ("items" if lang == "en" else "item")
+        if better:
+            label += " — " + ("alpha rises without " if lang == "en" else "alpha naik tanpa ") + ", ".join(map(str, better))
+        with st.expander(label):
+            st.dataframe(table.round(3), use_container_width=True)
+    st.download_button("Download reliability table (CSV) / Unduh tabel reliabilitas (CSV)",
+                       data=rel.summary.to_csv().encode("utf-8"), file_name="reliability.csv", mime="text/csv")
+
+if compute_composites and not accumulated:
+    st.header("Scale reliability (Cronbach's alpha)" if st.session_state.lang == "en" else "Reliabilitas skala (Cronbach's alpha)")
+    with profiler().stage("reliability"):
+        reliability_section()
+
 # ---------- Association Analysis ----------
+# The association card and the export run as fragments: changing the method radio or the
+# binning controls reruns only the fragment, against the memoized pair and normality results.
+def association_inputs(work_data, mm):
+    # pair handling depends on missing method
+    pair = pipeline.association_pair(work_data, mm)
+    norm_x, norm_y = pipeline.normality(pair)
+    return pair, norm_x, norm_y
+
+@st.fragment
+def association_section(pair, norm_x, norm_y):
+    # results are shared with the export fragment through session state
+    st.session_state.assoc = {}
+    n_pairs = len(pair)
+    st.write(("Number of valid pairs:" if st.session_state.lang == "en" else "Jumlah pasangan valid:"), n_pairs)
+    if n_pairs < 3:
+        st.warning("Not enough pairs to perform correlation (need at least 3)." if st.session_state.lang == "en" else "Pasangan tidak cukup untuk korelasi (butuh minimal 3).")
+        return
+
+    # the normality test depends on n (Shapiro-Wilk, on a subsample above 5,000, or a
+    # skew/kurtosis rule for very large files); say which one ran and what it cost
+    st.write(("Normality p-values (X_total, Y_total):" if st.session_state.lang == "en" else "p-value normalitas (X_total, Y_total):"),
+             round(norm_x["p"],4) if norm_x is not None else None,
+             round(norm_y["p"],4) if norm_y is not None else None)
+    for name, a in (("X_total", norm_x), ("Y_total", norm_y)):
+        if a is not None:
+            st.caption(f"{name}: {a['label']}, n = {a['n_used']:,} / {a['n']:,}, skew {a['skew']:.2f}, "
+                       f"{'excess kurtosis' if st.session_state.lang == 'en' else 'kurtosis berlebih'} {a['excess_kurtosis']:.2f}, "
+                       f"{'normal' if a['normal'] else ('not normal' if st.session_state.lang == 'en' else 'tidak normal')} ({a['seconds'] * 1000:.1f} ms)")
+
+    auto_method = pipeline.auto_method(norm_x, norm_y)
+    st.write((TEXT["auto_method"][st.session_state.lang] if st.session_state.lang in TEXT["auto_method"] else TEXT["auto_method"]["en"]), auto_method.capitalize())
+
+    # allow manual override (power users) - keep feature
+    method_choice = st.radio("Choose method (Auto / Pearson / Spearman / Chi-square)" if st.session_state.lang == "en" else "Pilih metode (Otomatis / Pearson / Spearman / Chi-square)",
+                             options=["Auto", "Pearson", "Spearman", "Chi-square"], index=0)
+    method_used = pipeline.resolve_method(method_choice, auto_method)
+    result = st.session_state.assoc
+
+    if method_used == "chi2":
+        st.info("Chi-square requires categorical variables. We'll bin X_total and Y_total." if st.session_state.lang == "en" else "Chi-square memerlukan variabel kategorikal. Kita akan melakukan bin pada X_total dan Y_total.")
+        bins_choice = st.selectbox("Binning method / Metode binning", options=["Quantiles", "Equal width"])
+        nbins = st.slider("Number of bins / Jumlah bin", 2, 6, value=3)
+        result.update(shared_memo("chi_square", (work_key, nbins, bins_choice),
+                                  lambda: pipeline.chi_square(pair, nbins, bins_choice)))
+        st.subheader("Contingency table" if st.session_state.lang == "en" else "Tabel Kontingensi")
+        st.dataframe(result["table"])
+        if "error" in result:
+            st.error(f"Chi-square error: {result['error']}")
+        else:
+            st.write(("Chi-square:", "p-value:"))
+            st.write(round(result["chi2"],4), round(result["p_val"],4))
+            if result["p_method"] != "asymptotic":
+                st.caption((f"Some expected counts are below {pipeline.MIN_EXPECTED:g}, so the p-value is "
+                            + ("Fisher's exact test" if result["p_method"] == "exact" else f"a Monte Carlo estimate ({result['n_resamples']:,} random tables)")
+                            + f" instead of the chi-square approximation (p = {result['p_asymptotic']:.4f})")
+                           if st.session_state.lang == "en" else
+                           (f"Sebagian frekuensi harapan di bawah {pipeline.MIN_EXPECTED:g}, jadi nilai p memakai "
+                            + ("uji eksak Fisher" if result["p_method"] == "exact" else f"estimasi Monte Carlo ({result['n_resamples']:,} tabel acak)")
+                            + f" alih-alih pendekatan chi-square (p = {result['p_asymptotic']:.4f})"))
+            st.write(("Cramér's V:", round(result["cramers_v"], 4)))
+            interp = ("Dependent (reject H0)" if result["p_val"] < 0.05 else "Independent (fail to reject H0)")
+            st.write(("Interpretation:", interp))
+        if demo_cols and not streaming:
+            # every demographic column against both binned composites, one bincount per column (per batch out of core)
+            batch = shared_memo("demographic_chi2", (work_key, nbins, bins_choice, tuple(demo_cols)),
+                                lambda: pipeline.demographic_chi_square(pair, mapped if columnar else df, demo_cols, nbins, bins_choice))
+            with st.expander("Demographics vs binned totals (chi-square)" if st.session_state.lang == "en" else "Demografi vs total yang di-bin (chi-square)"):
+                st.dataframe(batch.summary.drop(columns="error").round(4) if batch.summary["error"].isna().all() else batch.summary.round(4),
+                             hide_index=True)
+                row, col = st.selectbox("Table / Tabel", list(batch.tables), format_func=lambda k: f"{k[0]} × {k[1]}")
+                st.dataframe(batch.tables[(row, col)])
+                st.download_button("Download chi-square table (CSV) / Unduh tabel chi-square (CSV)",
+                                   data=batch.summary.to_csv(index=False).encode("utf-8"),
+                                   file_name="chi_square_demographics.csv", mime="text/csv")
+        return
+
+    result.update(shared_memo("correlation", (work_key, method_used), lambda: pipeline.correlate(pair, method_used)))
+    if "error" in result:
+        st.error(f"Correlation error: {result['error']}")
+    r, pval, label = result["r"], result["pval"], result["label"]
+
+    # bootstrap CI and permutation p-value, memoized per data, method and resample count;
+    # resamples draw rows at random, so out-of-core mode has none
+    n_resamples = 0 if columnar else st.selectbox("Bootstrap / permutation resamples" if st.session_state.lang == "en" else "Jumlah resampel bootstrap / permutasi",
+                               options=[0, 1000, 2000, 5000, 10000], index=2 if n_pairs <= 100_000 else 0,
+                               format_func=lambda v: ("Off" if st.session_state.lang == "en" else "Mati") if v == 0 else f"{v:,}")
+    if n_resamples and not np.isnan(r):
+        with st.spinner("Resampling..." if st.session_state.lang == "en" else "Melakukan resampling..."):
+            result.update(shared_memo("resample", (work_key, method_used, n_resamples),
+                                      lambda: pipeline.resample(pair, method_used, n_resamples)))
+
+    # Show result card
+    st.markdown('<div class="glass-card" style="width:48%;">', unsafe_allow_html=True)
+    st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{label}</div>", unsafe_allow_html=True)
+    try:
+        st.markdown(f"<div style='font-size:18px;font-weight:700;color:#16224a;'>{r:.4f}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div style='margin-top:6px'>p-value: {pval:.4f}</div>", unsafe_allow_html=True)
+    except Exception:
+        st.write("Result: ", r, pval)
+    direction, strength = pipeline.interpret(r, st.session_state.lang)
+    st.markdown(f"<div style='margin-top:8px'><b>{'Interpretation' if st.session_state.lang == 'en' else 'Interpretasi'}:</b> {direction}, {strength}</div>", unsafe_allow_html=True)
+    if "ci_low" in result:
+        st.markdown("<div style='margin-top:6px'>" + "<br>".join(pipeline.resample_lines(result, st.session_state.lang)) + "</div>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    result.update(direction=direction, strength=strength)
+
+    # scatter with regression line (visual); kept as PNG so the PDF export reuses it.
+    # Large samples are binned once into a density grid, shared by every method's plot.
+    grid = None
+    if n_pairs > DENSITY_MIN_ROWS:
+        grid = shared_memo("scatter_grid", work_key, lambda: pipeline.scatter_grid(pair))
+        st.caption(f"{n_pairs:,} pairs: drawn as a density plot (respondents per cell)." if st.session_state.lang == "en" else
+                   f"{n_pairs:,} pasangan: ditampilkan sebagai plot kepadatan (responden per sel).")
+    result["scatter_png"] = shared_memo("scatter_png", (work_key, method_used),
+                                        lambda: pipeline.scatter_png(pair, result, grid=grid))
+    st.image(result["scatter_png"])
+
+def appended_association(ps):
+    # Pearson r from the merged co-moments of X_total and Y_total; what cannot be merged is listed
+    lang = st.session_state.lang
+    st.session_state.assoc = {}
+    st.write(("Number of valid pairs:" if lang == "en" else "Jumlah pasangan valid:"), ps.n)
+    if ps.n < 3:
+        st.warning("Not enough pairs to perform correlation (need at least 3)." if lang == "en" else "Pasangan tidak cukup untuk korelasi (butuh minimal 3).")
+        return
+    r, pval = ps.r, ps.pvalue
+    direction, strength = pipeline.interpret(r, lang)
+    st.session_state.assoc = {"method_used": "pearson", "label": "Pearson r", "r": r, "pval": pval,
+                              "direction": direction, "strength": strength}
+    st.markdown('<div class="glass-card" style="width:48%;">', unsafe_allow_html=True)
+    st.markdown("<div style='font-weight:700;margin-bottom:6px;'>Pearson r</div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='font-size:18px;font-weight:700;color:#16224a;'>{r:.4f}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='margin-top:6px'>p-value: {pval:.4f}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='margin-top:8px'><b>{'Interpretation' if lang == 'en' else 'Interpretasi'}:</b> {direction}, {strength}</div>", unsafe_allow_html=True)
+    slope, intercept = ps.line()
+    if not np.isnan(slope):
+        st.markdown(f"<div style='margin-top:6px'>Y_total ≈ {intercept:.3f} + {slope:.3f} · X_total</div>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    with st.expander("Needs a full recompute (not updated in append mode)" if lang == "en" else "Perlu dihitung ulang penuh (tidak diperbarui di mode tambah)"):
+        for _, en, id_ in NOT_MERGEABLE:
+            st.markdown(f"- {en if lang == 'en' else id_}")
+        approx = append_state.needs_recompute()
+        if approx:
+            st.markdown(("- Median and frequency table (approximate, too many distinct values): " if lang == "en" else
+                         "- Median dan tabel frekuensi (perkiraan, terlalu banyak nilai unik): ") + ", ".join(approx))
+
 st.header("B. Association Analysis (X and Y)" if st.session_state.lang == "en" else "B. Analisis Asosiasi (X dan Y)")
 has_X_total = "X_total" in df_work.columns
 has_Y_total = "Y_total" in df_work.columns
 if not (has_X_total and has_Y_total):
+    st.session_state.assoc = {}
     st.warning("Composite totals X_total and Y_total missing. Select X and Y items and enable composite computation in sidebar." if st.session_state.lang == "en" else "Skor komposit X_total dan Y_total belum tersedia. Pilih item X dan Y lalu aktifkan penghitungan komposit di sidebar.")
+elif incremental:
+    appended_association(append_state.pair)
 else:
-    # pair handling depends on missing method
-    if st.session_state.missing_method == "Drop rows (default)":
-        pair = df_work[["X_total", "Y_total"]].dropna()
+    if columnar:
+        # the pair stays in the mapped file: every statistic below is a pass over its batches
+        pair = shared_memo("mapped_pair", work_key, lambda: MappedPair(mapped_work, mapped_fills))
+        norm_x, norm_y = shared_memo("assoc_inputs", work_key, lambda: pipeline.normality(pair))
     else:
-        pair = df_work[["X_total", "Y_total"]]
+        pair, norm_x, norm_y = shared_memo("assoc_inputs", work_key, lambda: association_inputs(work_data, mm))
+    with profiler().stage("association"):
+        association_section(pair, norm_x, norm_y)
 
-    n_pairs = len(pair)
-    st.write(("Number of valid pairs:" if st.session_state.lang == "en" else "Jumlah pasangan valid:"), n_pairs)
-    if n_pairs < 3:
-        st.warning("Not enough pairs to perform correlation (need at least 3)." if st.session_state.lang == "en" else "Pasangan tidak cukup untuk korelasi (butuh minimal 3).")
-    else:
-        # normality
+# ---------- Item correlation matrix ----------
+# Every X item (and composite) against every Y item (and composite), pairwise complete,
+# from the numeric matrix already built for the descriptives. Memoized per method, so
+# switching Pearson/Spearman back and forth only recomputes once each.
+@st.fragment
+def matrix_section():
+    method = st.radio("Matrix method / Metode matriks", options=["Pearson", "Spearman"], horizontal=True).lower()
+    with st.spinner("Computing correlation matrix..." if st.session_state.lang == "en" else "Menghitung matriks korelasi..."):
+        mat = shared_memo("matrix_" + method, work_key, lambda: pipeline.item_matrix(desc_table, x_items, y_items, method))
+    png = shared_memo("matrix_png_" + method, work_key, lambda: heatmap_png(mat.r, title=f"{method.capitalize()} correlation matrix"))
+    st.image(png)
+    st.caption(("Pairs with missing values use every row where both columns are present (n per cell in the export)."
+                if st.session_state.lang == "en" else
+                "Pasangan dengan data hilang memakai semua baris di mana kedua kolom terisi (n per sel ada di ekspor)."))
+    table_choice = st.selectbox("Show / Tampilkan", options=["r", "p-value", "n"])
+    st.dataframe({"r": mat.r, "p-value": mat.p, "n": mat.n}[table_choice].round(4))
+    csv = shared_memo("matrix_csv_" + method, work_key, lambda: mat.long_table().to_csv(index=False).encode("utf-8"))
+    st.download_button("Download matrix (CSV) / Unduh matriks (CSV)", data=csv,
+                       file_name=f"correlation_matrix_{method}.csv", mime="text/csv")
+
+st.subheader("Item correlation matrix" if st.session_state.lang == "en" else "Matriks korelasi item")
+if streaming or columnar:
+    st.info("The item matrix needs the full table; turn off streaming / out-of-core mode to compute it." if st.session_state.lang == "en" else "Matriks item memerlukan tabel lengkap; matikan mode streaming / out-of-core untuk menghitungnya.")
+elif incremental:
+    st.info("The item matrix cannot be updated from new rows; turn off append mode and upload the whole file to recompute it." if st.session_state.lang == "en" else "Matriks item tidak dapat diperbarui dari baris baru; matikan mode tambah dan unggah file lengkap untuk menghitung ulang.")
+elif not (x_items and y_items):
+    st.info("Select X and Y items to compute the item matrix." if st.session_state.lang == "en" else "Pilih item X dan Y untuk menghitung matriks item.")
+else:
+    matrix_section()
+
+# ---------- Segment comparison ----------
+# All levels of the chosen demographic column in one grouped pass over the descriptives'
+# numeric matrix (per-level means/SDs, composite correlation, Kruskal-Wallis / ANOVA).
+@st.fragment
+def segment_section():
+    seg_col = st.selectbox("Segment by / Segmentasi berdasarkan", demo_cols)
+    method = st.radio("Correlation within segments / Korelasi dalam segmen", options=["Pearson", "Spearman"], horizontal=True).lower()
+    keep_missing = st.checkbox("Show rows without a value as a '(missing)' segment" if st.session_state.lang == "en" else "Tampilkan baris tanpa nilai sebagai segmen '(missing)'", value=False)
+    with st.spinner("Comparing segments..." if st.session_state.lang == "en" else "Membandingkan segmen..."):
+        seg = shared_memo("segments", (work_key, seg_col, method, keep_missing),
+                           lambda: pipeline.segments(desc_table, df, seg_col, method, keep_missing))
+    st.caption(f"{len(seg.levels)} " + ("segments" if st.session_state.lang == "en" else "segmen"))
+    st.dataframe(seg.summary.round(4))
+    st.markdown("**" + ("Differences between segments (Kruskal-Wallis / ANOVA)" if st.session_state.lang == "en" else "Perbedaan antar segmen (Kruskal-Wallis / ANOVA)") + "**")
+    tests = seg.tests.round(4)
+    # composites first: they are what the segment comparison is usually about
+    st.dataframe(tests.loc[[c for c in ["X_total", "Y_total"] if c in tests.index] + [c for c in tests.index if c not in ("X_total", "Y_total")]])
+    with st.expander("Item means per segment" if st.session_state.lang == "en" else "Rata-rata item per segmen"):
+        st.dataframe(seg.means.round(3))
+    st.download_button("Download segment table (CSV) / Unduh tabel segmen (CSV)",
+                       data=seg.export_table().to_csv().encode("utf-8"),
+                       file_name=f"segments_{seg_col}.csv", mime="text/csv")
+
+st.header("C. " + ("Segment comparison" if st.session_state.lang == "en" else "Perbandingan segmen"))
+if streaming or columnar:
+    st.info("Segment comparison needs the full table; turn off streaming / out-of-core mode to compute it." if st.session_state.lang == "en" else "Perbandingan segmen memerlukan tabel lengkap; matikan mode streaming / out-of-core untuk menghitungnya.")
+elif incremental:
+    st.info("Segment comparison cannot be updated from new rows; turn off append mode and upload the whole file to recompute it." if st.session_state.lang == "en" else "Perbandingan segmen tidak dapat diperbarui dari baris baru; matikan mode tambah dan unggah file lengkap untuk menghitung ulang.")
+elif not demo_cols:
+    st.info("Select demographic columns in the sidebar to compare segments." if st.session_state.lang == "en" else "Pilih kolom demografi di sidebar untuk membandingkan segmen.")
+else:
+    segment_section()
+
+# ---------- Driver analysis ----------
+# OLS of Y_total / each Y item on the X items, overall and per segment. The cross-products
+# are one pass over the descriptives' matrix per segment column; changing predictors,
+# target or segment column afterwards is a batched solve on the cached cross-products.
+@st.fragment
+def driver_section():
+    lang = st.session_state.lang
+    predictors_all, targets = pipeline.driver_columns(x_items, y_items, desc_table)
+    predictors = st.multiselect("Predictors (X items) / Prediktor (item X)", predictors_all, default=predictors_all)
+    target = st.selectbox("Outcome / Variabel terikat", targets)
+    seg_col = st.selectbox("Per segment of / Per segmen", ["(none)"] + demo_cols) if demo_cols else "(none)"
+    seg_col = None if seg_col == "(none)" else seg_col
+    if not predictors:
+        st.info("Select at least one predictor." if lang == "en" else "Pilih minimal satu prediktor.")
+        return
+    with st.spinner("Fitting driver models..." if lang == "en" else "Menghitung model pendorong..."):
+        products = shared_memo("driver_products", (work_key, seg_col),
+                               lambda: pipeline.driver_products(desc_table, x_items, y_items, df, seg_col))
+        # every target at once: switching the outcome afterwards is a lookup
+        table = shared_memo("drivers", (work_key, seg_col, tuple(predictors)),
+                            lambda: pipeline.drivers(products, predictors, targets))
+    model = table.models.set_index(["segment", "target"]).loc[(OVERALL, target)]
+    skipped = f"; {products.n_skipped:,} incomplete rows skipped" if products.n_skipped else ""
+    st.caption((f"n = {int(model['n']):,}{skipped} · R² = {model['r2']:.4f} · adjusted R² = {model['adj_r2']:.4f} · "
+                f"F = {model['F']:.2f}, p = {model['p']:.4g}") if lang == "en" else
+               (f"n = {int(model['n']):,}{skipped.replace('incomplete rows skipped', 'baris tidak lengkap dilewati')} · "
+                f"R² = {model['r2']:.4f} · R² disesuaikan = {model['adj_r2']:.4f} · F = {model['F']:.2f}, p = {model['p']:.4g}"))
+    if not model["full_rank"] and model["n"] > len(predictors) + 1:
+        st.warning("Some predictors are exact combinations of others; their SEs and VIFs are undefined." if lang == "en" else
+                   "Sebagian prediktor merupakan kombinasi persis prediktor lain; SE dan VIF-nya tidak terdefinisi.")
+    ranking = table.ranking(target)
+    st.dataframe(ranking.round(4))
+    high = ranking.index[ranking["vif"] > VIF_WARN].tolist()
+    if high:
+        st.caption((f"VIF above {VIF_WARN:g} (strongly overlapping predictors): " if lang == "en" else
+                    f"VIF di atas {VIF_WARN:g} (prediktor sangat tumpang tindih): ") + ", ".join(high))
+    if seg_col is not None:
+        st.markdown("**" + ("Standardized betas per segment" if lang == "en" else "Beta terstandar per segmen") + "**")
+        st.dataframe(table.betas(target).round(4))
+        with st.expander("Model fit per segment" if lang == "en" else "Kecocokan model per segmen"):
+            st.dataframe(table.models[table.models["target"] == target].drop(columns="target").set_index("segment").round(4))
+    st.download_button("Download driver table (CSV) / Unduh tabel pendorong (CSV)",
+                       data=table.export_table().to_csv(index=False).encode("utf-8"),
+                       file_name=f"drivers_{seg_col or 'overall'}.csv", mime="text/csv")
+
+st.header("D. " + ("Driver analysis" if st.session_state.lang == "en" else "Analisis pendorong"))
+if accumulated:
+    st.info("Driver analysis needs the full table; turn off streaming / append / out-of-core mode to compute it." if st.session_state.lang == "en" else "Analisis pendorong memerlukan tabel lengkap; matikan mode streaming / tambah / out-of-core untuk menghitungnya.")
+elif not (x_items and pipeline.driver_columns(x_items, y_items, desc_table)[1]):
+    st.info("Select X and Y items to find out which X items drive Y." if st.session_state.lang == "en" else "Pilih item X dan Y untuk melihat item X mana yang mendorong Y.")
+else:
+    driver_section()
+
+# ---------- PDF export ----------
+# The report is written page by page to a temp file by a background thread, from a
+# snapshot of what is already on screen (summary numbers, cached card PNGs, scatter PNG).
+def report_snapshot():
+    lang = st.session_state.lang
+    items = items_to_describe.copy()
+    if compute_composites:
+        items += [c for c in ["X_total", "Y_total"] if c in df_work.columns]
+    lines = []
+    for col in items:
         try:
-            stat_x, p_x = stats.shapiro(pair["X_total"]) if n_pairs >= 3 else (None, None)
-            stat_y, p_y = stats.shapiro(pair["Y_total"]) if n_pairs >= 3 else (None, None)
+            if accumulated:
+                a = stream_acc[col]
+                txt = f"{col} — mean: {a.mean:.3f}, median: {a.median:.3f}, std: {a.std:.3f}, n: {int(a.count)}"
+            else:
+                row = desc_table.table.loc[col]
+                txt = f"{col} — mean: {row['mean']:.3f}, median: {row['median']:.3f}, std: {row['std']:.3f}, n: {int(row['count'])}"
         except Exception:
-            p_x, p_y = None, None
-
-        st.write(("Shapiro p-values (X_total, Y_total):" if st.session_state.lang == "en" else "p-value Shapiro (X_total, Y_total):"),
-                 round(p_x,4) if p_x is not None else None,
-                 round(p_y,4) if p_y is not None else None)
-
-        auto_method = "pearson" if (p_x is not None and p_y is not None and p_x > 0.05 and p_y > 0.05) else "spearman"
-        st.write((TEXT["auto_method"][st.session_state.lang] if st.session_state.lang in TEXT["auto_method"] else TEXT["auto_method"]["en"]), auto_method.capitalize())
-
-        # allow manual override (power users) - keep feature
-        method_choice = st.radio("Choose method (Auto / Pearson / Spearman / Chi-square)" if st.session_state.lang == "en" else "Pilih metode (Otomatis / Pearson / Spearman / Chi-square)",
-                                 options=["Auto", "Pearson", "Spearman", "Chi-square"], index=0)
-        if method_choice == "Auto":
-            method_used = auto_method
-        elif method_choice == "Chi-square":
-            method_used = "chi2"
-        else:
-            method_used = method_choice.lower()
+            txt = f"{col} — (could not compute numeric summary)"
+        lines.append(txt)
+    pngs = render_charts(items)
+    report = {
+        "title": TEXT["title"][lang],
+        "subtitle": TEXT["subtitle"][lang],
+        "members": f"{TEXT['group_members'][lang]}: " + ", ".join([m.split(" — ")[0] for m in GROUP_INFO]),
+        "summary_heading": "Descriptive statistics summary:" if lang == "en" else "Ringkasan statistik deskriptif:",
+        "summary_lines": lines,
+        "charts": [(c, pngs[c]) for c in items if c in pngs],
+    }
 
+    # Association summary + scatter image
+    assoc = st.session_state.get("assoc", {})
+    method_used = assoc.get("method_used")
+    if method_used:
+        a_lines = []
         if method_used == "chi2":
-            st.info("Chi-square requires categorical variables. We'll bin X_total and Y_total." if st.session_state.lang == "en" else "Chi-square memerlukan variabel kategorikal. Kita akan melakukan bin pada X_total dan Y_total.")
-            bins_choice = st.selectbox("Binning method / Metode binning", options=["Quantiles", "Equal width"])
-            nbins = st.slider("Number of bins / Jumlah bin", 2, 6, value=3)
-            if bins_choice == "Quantiles":
-                pair["X_cat"] = pd.qcut(pair["X_total"], q=nbins, duplicates="drop").astype(str)
-                pair["Y_cat"] = pd.qcut(pair["Y_total"], q=nbins, duplicates="drop").astype(str)
-            else:
-                pair["X_cat"] = pd.cut(pair["X_total"], bins=nbins, duplicates="drop").astype(str)
-                pair["Y_cat"] = pd.cut(pair["Y_total"], bins=nbins, duplicates="drop").astype(str)
-            ct = pd.crosstab(pair["X_cat"], pair["Y_cat"])
-            st.subheader("Contingency table" if st.session_state.lang == "en" else "Tabel Kontingensi")
-            st.dataframe(ct)
-            try:
-                chi2, p_val, dof, exp = stats.chi2_contingency(ct)
-                st.write(("Chi-square:", "p-value:"))
-                st.write(round(chi2,4), round(p_val,4))
-                interp = ("Dependent (reject H0)" if p_val < 0.05 else "Independent (fail to reject H0)")
-                st.write(("Interpretation:", interp))
-            except Exception as e:
-                st.error(f"Chi-square error: {e}")
+            a_lines.append("Chi-square test performed on categorized totals." if lang == "en" else "Uji Chi-square dilakukan pada total yang dikategorikan.")
+            a_lines += pipeline.chi_square_lines(assoc)
         else:
             try:
-                if method_used == "pearson":
-                    r, pval = stats.pearsonr(pair["X_total"], pair["Y_total"])
-                    label = "Pearson r"
-                else:
-                    r, pval = stats.spearmanr(pair["X_total"], pair["Y_total"])
-                    label = "Spearman rho"
-            except Exception as e:
-                st.error(f"Correlation error: {e}")
-                r, pval, label = np.nan, np.nan, "Error"
-
-            # Show result card
-            st.markdown('<div class="glass-card" style="width:48%;">', unsafe_allow_html=True)
-            st.markdown(f"<div style='font-weight:700;margin-bottom:6px;'>{label}</div>", unsafe_allow_html=True)
-            try:
-                st.markdown(f"<div style='font-size:18px;font-weight:700;color:#16224a;'>{r:.4f}</div>", unsafe_allow_html=True)
-                st.markdown(f"<div style='margin-top:6px'>p-value: {pval:.4f}</div>", unsafe_allow_html=True)
+                a_lines.append(f"{assoc['label']} = {assoc['r']:.4f}, p = {assoc['pval']:.4f}")
             except Exception:
-                st.write("Result: ", r, pval)
-            abs_r = abs(r) if not np.isnan(r) else 0
-            if abs_r < 0.1:
-                strength = ("negligible" if st.session_state.lang == "en" else "sangat lemah")
-            elif abs_r < 0.3:
-                strength = ("weak" if st.session_state.lang == "en" else "lemah")
-            elif abs_r < 0.5:
-                strength = ("moderate" if st.session_state.lang == "en" else "sedang")
-            elif abs_r < 0.7:
-                strength = ("strong" if st.session_state.lang == "en" else "kuat")
-            else:
-                strength = ("very strong" if st.session_state.lang == "en" else "sangat kuat")
-            direction = ("positive" if r > 0 else "negative") if not np.isnan(r) else ""
-            st.markdown(f"<div style='margin-top:8px'><b>{'Interpretation' if st.session_state.lang == 'en' else 'Interpretasi'}:</b> {direction}, {strength}</div>", unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+                a_lines.append("Correlation: could not compute")
+            a_lines.append(("Interpretation:" if lang == "en" else "Interpretasi:") + f" {assoc.get('direction', '')}, {assoc.get('strength', '')}")
+            a_lines += pipeline.resample_lines(assoc, lang)
+        report["assoc"] = {
+            "heading": "Association Analysis" if lang == "en" else "Analisis Asosiasi",
+            "lines": a_lines,
+            "scatter_png": assoc.get("scatter_png") if method_used != "chi2" else None,
+        }
+    return report
 
-            # scatter with regression line (visual)
-            fig, ax = plt.subplots(figsize=(6,4))
-            ax.scatter(pair["X_total"], pair["Y_total"], alpha=0.75)
-            try:
-                slope, intercept, _, _, _ = stats.linregress(pair["X_total"], pair["Y_total"])
-                xs = np.array([pair["X_total"].min(), pair["X_total"].max()])
-                ax.plot(xs, slope * xs + intercept, color="red", linestyle="--")
-            except Exception:
-                pass
-            ax.set_xlabel("X_total", fontname="Times New Roman")
-            ax.set_ylabel("Y_total", fontname="Times New Roman")
-            ax.set_title("Scatter X_total vs Y_total", fontname="Times New Roman")
-            st.pyplot(fig)
-            plt.close(fig)
+def export_section():
+    job = st.session_state.get("report_job")
+    if st.button("Generate PDF report / Buat laporan PDF"):
+        if job is not None:
+            job.discard()
+        st.session_state.report_job = start_report(report_snapshot())
+        # full rerun so this section is rebuilt with progress polling switched on
+        st.rerun()
+    if job is None:
+        return
+    if not job.done():
+        st.progress(job.progress, text="Building PDF report..." if st.session_state.lang == "en" else "Membuat laporan PDF...")
+        return
+    if job.error is not None:
+        st.error(f"PDF export error: {job.error}")
+    else:
+        if job.seconds is not None and not job.logged:
+            job.logged = True
+            log_event("pdf_export", session=st.session_state.get("_perf_session"), pages=job.pages, seconds=job.seconds)
+        with open(job.path, "rb") as f:
+            st.download_button("Download PDF report / Unduh laporan PDF", data=f, file_name="survey_report.pdf", mime="application/pdf")
+        st.success("PDF ready. Click the button above to download." if st.session_state.lang == "en" else "PDF siap. Klik tombol di atas untuk mengunduh.")
+    if st.session_state.get("report_polling"):
+        # finished: rebuild the section once more without polling
+        st.session_state.report_polling = False
+        st.rerun()
 
-# ---------- PDF export ----------
 st.header("Export report / Ekspor laporan")
-if st.button("Generate PDF report / Buat laporan PDF"):
-    buffer = io.BytesIO()
-    with PdfPages(buffer) as pdf:
-        # Title page
-        fig = plt.figure(figsize=(8.27, 11.69)); plt.axis("off")
-        plt.text(0.5, 0.85, TEXT["title"][st.session_state.lang], ha="center", va="center", fontsize=18, fontname="Times New Roman", weight="bold")
-        plt.text(0.5, 0.80, TEXT["subtitle"][st.session_state.lang], ha="center", va="center", fontsize=10, fontname="Times New Roman")
-        plt.text(0.1, 0.75, f"{TEXT['group_members'][st.session_state.lang]}: " + ", ".join([m.split(" — ")[0] for m in GROUP_INFO]), fontsize=9, fontname="Times New Roman")
-        pdf.savefig(fig); plt.close(fig)
-
-        # Descriptive summary
-        fig = plt.figure(figsize=(8.27, 11.69)); plt.axis("off")
-        y_pos = 0.95
-        plt.text(0.01, y_pos, ("Descriptive statistics summary:" if st.session_state.lang == "en" else "Ringkasan statistik deskriptif:"), fontsize=12, fontname="Times New Roman", weight="bold")
-        y_pos -= 0.03
-        items = items_to_describe.copy()
-        if compute_composites:
-            items += [c for c in ["X_total", "Y_total"] if c in df_work.columns]
-        for col in items:
-            if y_pos < 0.05:
-                pdf.savefig(fig); plt.close(fig); fig = plt.figure(figsize=(8.27, 11.69)); plt.axis("off"); y_pos = 0.95
-            try:
-                s = pd.to_numeric(df_work[col], errors="coerce")
-                txt = f"{col} — mean: {s.mean():.3f}, median: {s.median():.3f}, std: {s.std():.3f}, n: {int(s.count())}"
-            except Exception:
-                txt = f"{col} — (could not compute numeric summary)"
-            plt.text(0.01, y_pos, txt, fontsize=10, fontname="Times New Roman")
-            y_pos -= 0.03
-        pdf.savefig(fig); plt.close(fig)
-
-        # Association summary + scatter image
-        if has_X_total and has_Y_total and len(df_work[["X_total","Y_total"]].dropna()) >= 3:
-            pair2 = df_work[["X_total","Y_total"]].dropna()
-            fig = plt.figure(figsize=(8.27, 11.69)); plt.axis("off")
-            plt.text(0.01, 0.95, ("Association Analysis" if st.session_state.lang == "en" else "Analisis Asosiasi"), fontsize=12, fontname="Times New Roman", weight="bold")
-            y_pos = 0.9
-            try:
-                if method_used == "chi2":
-                    txt = ("Chi-square test performed on categorized totals." if st.session_state.lang == "en" else "Uji Chi-square dilakukan pada total yang dikategorikan.")
-                    plt.text(0.01, y_pos, txt, fontsize=10, fontname="Times New Roman"); y_pos -= 0.03
-                    try:
-                        plt.text(0.01, y_pos, f"Chi2 = {chi2:.4f}, p = {p_val:.4f}", fontsize=10, fontname="Times New Roman"); y_pos -= 0.03
-                    except:
-                        pass
-                    pdf.savefig(fig); plt.close(fig)
-                else:
-                    try:
-                        txt = f"{label} = {r:.4f}, p = {pval:.4f}"
-                    except:
-                        txt = f"Correlation: could not compute"
-                    plt.text(0.01, y_pos, txt, fontsize=10, fontname="Times New Roman"); y_pos -= 0.03
-                    plt.text(0.01, y_pos, ("Interpretation:" if st.session_state.lang == "en" else "Interpretasi:") + f" {direction}, {strength}", fontsize=10, fontname="Times New Roman"); y_pos -= 0.03
-                    pdf.savefig(fig); plt.close(fig)
-                    # scatter page
-                    fig2, ax2 = plt.subplots(figsize=(8,6))
-                    ax2.scatter(pair2["X_total"], pair2["Y_total"], alpha=0.7)
-                    try:
-                        ax2.plot(xs, slope*xs + intercept, color='red', linestyle='--')
-                    except:
-                        pass
-                    ax2.set_xlabel("X_total", fontname="Times New Roman")
-                    ax2.set_ylabel("Y_total", fontname="Times New Roman")
-                    ax2.set_title("X_total vs Y_total", fontname="Times New Roman")
-                    pdf.savefig(fig2); plt.close(fig2)
-            except Exception:
-                pass
+_job = st.session_state.get("report_job")
+st.session_state.report_polling = _job is not None and not _job.done()
+# polls twice a second only while a report is being written
+st.fragment(run_every=0.5 if st.session_state.report_polling else None)(export_section)()
 
-    buffer.seek(0)
-    b64 = base64.b64encode(buffer.read()).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="survey_report.pdf">Download PDF report</a>'
-    st.markdown(href, unsafe_allow_html=True)
-    st.success("PDF ready. Click the link above to download." if st.session_state.lang == "en" else "PDF siap. Klik link di atas untuk mengunduh.")
+# ---------- Performance panel ----------
+if perf is not NULL_PROFILER:
+    record = perf.finish()
+    with perf_slot.container():
+        with st.expander("⏱ Performance / Kinerja"):
+            perf_panel(record)
 
-# ---------- End ----------
\ No newline at end of file
+# ---------- End ----------
@@ -0,0 +1,463 @@
+# survey_assoc.py
+# Correlation matrices for many items at once (every X item against every Y item,
+# items against the composites) with pairwise-complete missing data.
+# Coefficients come from a few matrix products over row chunks instead of one
+# pearsonr/spearmanr call per pair. Spearman ranks each column once up front, which is
+# exact for pairs missing the same rows; the other pairs are re-ranked within the rows
+# both columns have (from joint frequency tables for Likert-range columns).
+# The same batching gives bootstrap CIs and permutation p-values for one pair.
+
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+from survey_stats import MAX_BINCOUNT_SPAN, numeric_matrix
+
+# rows per chunk of the cross-product accumulation; bounds the temporaries to
+# CHUNK_ROWS x (3 * columns) floats whatever the file size
+CHUNK_ROWS = 32_768
+# up to this share of missing cells the pair corrections go through sparse
+# missing-indicator products; denser gaps use 0/1 mask matrix products
+SPARSE_MISSING_MAX = 0.25
+METHODS = ("pearson", "spearman")
+
+
+def _chunks(n: int, size: int):
+    for start in range(0, n, size):
+        yield slice(start, min(start + size, n))
+
+
+def rank_columns(M: np.ndarray) -> np.ndarray:
+    """Average ranks (1-based, ties share their mean rank) per column; NaN stays NaN.
+
+    Small-range integer columns (Likert items and their sums) are ranked from a
+    bincount in O(n); anything else goes through scipy's rankdata.
+    """
+    R = np.full(M.shape, np.nan, order="F")
+    for j in range(M.shape[1]):
+        col = M[:, j]
+        valid = ~np.isnan(col)
+        v = col[valid]
+        if v.size == 0:
+            continue
+        lo, hi = v.min(), v.max()
+        if hi - lo < MAX_BINCOUNT_SPAN and np.all(v == np.floor(v)):
+            codes = (v - lo).astype(np.int64)
+            cnt = np.bincount(codes)
+            avg = np.cumsum(cnt) - cnt + (cnt + 1) / 2.0
+            R[valid, j] = avg[codes]
+        else:
+            R[valid, j] = stats.rankdata(v)
+    return R
+
+
+def pairwise_corr(M: np.ndarray, rows: Sequence[int], cols: Sequence[int],
+                  chunk_rows: int = CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson r and pair counts of M[:, rows] against M[:, cols], pairwise complete.
+
+    Every pair needs N, sum(a), sum(a^2), sum(b), sum(b^2) and sum(ab) over the rows
+    where both are present; with zero-filled values a, b, sum(ab) is just a^T b, and
+    the other sums come from products with the missing masks (see _sums_sparse /
+    _sums_dense) — a handful of matrix products per chunk instead of
+    len(rows) * len(cols) scalar calls. Columns are centered on their own mean first
+    so the sums stay well conditioned.
+    """
+    rows, cols = np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+    n, p, q = M.shape[0], rows.size, cols.size
+    used = np.union1d(rows, cols)
+    total, count = np.zeros(M.shape[1]), np.zeros(M.shape[1])
+    for sl in _chunks(n, chunk_rows):
+        c = M[sl][:, used]
+        valid = ~np.isnan(c)
+        total[used] += np.where(valid, c, 0.0).sum(axis=0)
+        count[used] += valid.sum(axis=0)
+    center = total / np.maximum(count, 1)
+    complete = bool(count[used].min(initial=n) == n)
+
+    if complete:
+        # no missing values: every pair has all n rows and the centered sums are zero
+        s_ab, s_aa, s_bb = np.zeros((p, q)), np.zeros(p), np.zeros(q)
+        for sl in _chunks(n, chunk_rows):
+            a = M[sl][:, rows] - center[rows]
+            b = M[sl][:, cols] - center[cols]
+            s_ab += a.T @ b
+            s_aa += (a * a).sum(axis=0)
+            s_bb += (b * b).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = s_ab / np.sqrt(np.outer(s_aa, s_bb))
+        return np.clip(r, -1.0, 1.0), np.full((p, q), n, dtype=np.int64)
+
+    if missing_frac(count[used], n) <= SPARSE_MISSING_MAX:
+        N, s_a, s_aa, s_b, s_bb, s_ab = _sums_sparse(M, rows, cols, center, chunk_rows)
+    else:
+        N, s_a, s_aa, s_b, s_bb, s_ab = _sums_dense(M, rows, cols, center, chunk_rows)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = s_ab - s_a * s_b / N
+        var_a = s_aa - s_a * s_a / N
+        var_b = s_bb - s_b * s_b / N
+        r = cov / np.sqrt(var_a * var_b)
+    r[N < 2] = np.nan
+    return np.clip(r, -1.0, 1.0), np.rint(N).astype(np.int64)
+
+
+def _pair_table_corr(T: np.ndarray) -> float:
+    """Spearman rho from the joint frequency table of two integer-coded columns.
+
+    Mid-ranks of each value follow from the margins, so the Pearson sums over the
+    complete rows are weighted sums over the table's cells.
+    """
+    ca, cb = T.sum(axis=1), T.sum(axis=0)
+    N = ca.sum()
+    if N < 2:
+        return np.nan
+    mid = (N + 1) / 2.0
+    ra = np.cumsum(ca) - ca + (ca + 1) / 2.0 - mid
+    rb = np.cumsum(cb) - cb + (cb + 1) / 2.0 - mid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return float(ra @ T @ rb / np.sqrt((ca * ra * ra).sum() * (cb * rb * rb).sum()))
+
+
+def _onehot(M, sl, idx, lo, offset, width):
+    # chunk rows x (sum of levels) indicator matrix of the coded columns idx, built as CSR
+    c = M[sl][:, idx] - lo[idx]
+    valid = ~np.isnan(c)
+    indptr = np.zeros(c.shape[0] + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    codes = (c + offset)[valid].astype(np.int64)
+    return sparse.csr_matrix((np.ones(codes.size), codes, indptr), shape=(c.shape[0], width))
+
+
+def rerank_pairs(M: np.ndarray, rows: Sequence[int], cols: Sequence[int], r: np.ndarray, n: np.ndarray,
+                 chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    """Pairwise-complete Spearman for the pairs whose columns miss different rows.
+
+    `r` and `n` come from pairwise_corr over ranks taken on each column's own rows,
+    which is only right when both columns have the same rows; the other pairs are
+    fixed in place. Small-range integer pairs get their rho from joint frequency
+    tables (one sparse indicator product over row chunks for all of them), any other
+    pair is ranked again on its complete rows.
+    """
+    rows, cols = np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+    count = np.zeros(M.shape[1], dtype=np.int64)
+    for sl in _chunks(M.shape[0], chunk_rows):
+        count += (~np.isnan(M[sl])).sum(axis=0)
+    fix = (n != count[rows][:, None]) | (n != count[cols][None, :])
+    if not fix.any():
+        return r
+    with np.errstate(invalid="ignore"):
+        lo, hi = np.nanmin(M, axis=0), np.nanmax(M, axis=0)
+    coded = np.zeros(M.shape[1], dtype=bool)
+    for j in np.union1d(rows[fix.any(axis=1)], cols[fix.any(axis=0)]):
+        col = M[:, j]
+        coded[j] = count[j] > 0 and hi[j] - lo[j] < MAX_BINCOUNT_SPAN and bool(np.all((col == np.floor(col)) | np.isnan(col)))
+
+    table_pairs = fix & coded[rows][:, None] & coded[cols][None, :]
+    if table_pairs.any():
+        a_idx = rows[np.unique(np.nonzero(table_pairs)[0])]
+        b_idx = cols[np.unique(np.nonzero(table_pairs)[1])]
+        width = np.zeros(M.shape[1], dtype=np.int64)
+        width[coded] = (hi[coded] - lo[coded]).astype(np.int64) + 1
+        a_off, b_off = np.zeros(M.shape[1], dtype=np.int64), np.zeros(M.shape[1], dtype=np.int64)
+        a_off[a_idx] = np.r_[0, np.cumsum(width[a_idx])[:-1]]
+        b_off[b_idx] = np.r_[0, np.cumsum(width[b_idx])[:-1]]
+        wa, wb = int(width[a_idx].sum()), int(width[b_idx].sum())
+        T = sparse.csr_matrix((wa, wb))
+        for sl in _chunks(M.shape[0], chunk_rows):
+            A = _onehot(M, sl, a_idx, lo, a_off[a_idx], wa)
+            B = _onehot(M, sl, b_idx, lo, b_off[b_idx], wb)
+            T = T + (A.T @ B).tocsr()
+        T = T.toarray()
+        for i, j in zip(*np.nonzero(table_pairs)):
+            a, b = rows[i], cols[j]
+            r[i, j] = _pair_table_corr(T[a_off[a]:a_off[a] + width[a], b_off[b]:b_off[b] + width[b]])
+
+    for i, j in zip(*np.nonzero(fix & ~table_pairs)):
+        x, y = M[:, rows[i]], M[:, cols[j]]
+        both = ~(np.isnan(x) | np.isnan(y))
+        if both.sum() < 2:
+            r[i, j] = np.nan
+            continue
+        R = rank_columns(np.column_stack([x[both], y[both]]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r[i, j] = np.corrcoef(R, rowvar=False)[0, 1]
+    np.clip(r, -1.0, 1.0, out=r)
+    return r
+
+
+def missing_frac(counts: np.ndarray, n: int) -> float:
+    return float(1.0 - counts.sum() / (n * counts.size)) if n and counts.size else 0.0
+
+
+def _centered(M, sl, idx, center):
+    x = M[sl][:, idx]
+    x -= center[idx]
+    miss = np.isnan(x)
+    x[miss] = 0.0
+    return x, miss
+
+
+def _missing_csc(miss: np.ndarray) -> sparse.csc_matrix:
+    # built straight from the column-major nonzeros; csc_matrix(dense) would
+    # ravel and scan the whole chunk a second time
+    cols, rows = np.nonzero(miss.T)
+    indptr = np.zeros(miss.shape[1] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cols, minlength=miss.shape[1]), out=indptr[1:])
+    return sparse.csc_matrix((np.ones(rows.size), rows, indptr), shape=miss.shape)
+
+
+def _sums_dense(M, rows, cols, center, chunk_rows):
+    # masks as 0/1 matrices:  [A_m | a | a^2]^T B_m  and  A_m^T [b | b^2]
+    p, q = rows.size, cols.size
+    left, right, s_ab = np.zeros((3 * p, q)), np.zeros((p, 2 * q)), np.zeros((p, q))
+    for sl in _chunks(M.shape[0], chunk_rows):
+        a, a_miss = _centered(M, sl, rows, center)
+        b, b_miss = _centered(M, sl, cols, center)
+        am, bm = (~a_miss).astype(float), (~b_miss).astype(float)
+        left += np.hstack([am, a, a * a]).T @ bm
+        right += am.T @ np.hstack([b, b * b])
+        s_ab += a.T @ b
+    return left[:p], left[p:2 * p], left[2 * p:], right[:, :q], right[:, q:], s_ab
+
+
+def _sums_sparse(M, rows, cols, center, chunk_rows):
+    # few missing cells: take the column totals and subtract what falls on the other
+    # column's missing rows, using sparse missing-indicator matrices; the only dense
+    # product left is a^T b (zero-filled, so it already covers complete pairs only)
+    p, q = rows.size, cols.size
+    n = M.shape[0]
+    tot_a, tot_b = np.zeros((2, p)), np.zeros((2, q))
+    miss_a, miss_b = np.zeros(p), np.zeros(q)
+    cut_a, cut_b = np.zeros((q, 2 * p)), np.zeros((p, 2 * q))
+    miss_ab, s_ab = np.zeros((p, q)), np.zeros((p, q))
+    for sl in _chunks(n, chunk_rows):
+        a, a_miss = _centered(M, sl, rows, center)
+        b, b_miss = _centered(M, sl, cols, center)
+        a2, b2 = a * a, b * b
+        tot_a += (a.sum(axis=0), a2.sum(axis=0))
+        tot_b += (b.sum(axis=0), b2.sum(axis=0))
+        miss_a += a_miss.sum(axis=0)
+        miss_b += b_miss.sum(axis=0)
+        As, Bs = _missing_csc(a_miss), _missing_csc(b_miss)
+        BsT, AsT = Bs.T.tocsr(), As.T.tocsr()
+        cut_a[:, :p] += BsT @ a
+        cut_a[:, p:] += BsT @ a2
+        cut_b[:, :q] += AsT @ b
+        cut_b[:, q:] += AsT @ b2
+        miss_ab += (AsT @ Bs).toarray()
+        s_ab += a.T @ b
+    N = n - miss_a[:, None] - miss_b[None, :] + miss_ab
+    s_a = tot_a[0][:, None] - cut_a[:, :p].T
+    s_aa = tot_a[1][:, None] - cut_a[:, p:].T
+    s_b = tot_b[0][None, :] - cut_b[:, :q]
+    s_bb = tot_b[1][None, :] - cut_b[:, q:]
+    return N, s_a, s_aa, s_b, s_bb, s_ab
+
+
+def corr_pvalues(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Two-sided p-values for r with n pairs (t test on n - 2 df, as pearsonr/spearmanr)."""
+    dof = (n - 2).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = 2.0 * stats.t.sf(np.abs(t), dof)
+    p[np.abs(r) == 1.0] = 0.0
+    p[(dof < 1) | np.isnan(r)] = np.nan
+    return p
+
+
+class AssocMatrix:
+    """r, p-values and pair counts for rows x cols, as DataFrames."""
+
+    def __init__(self, r: np.ndarray, p: np.ndarray, n: np.ndarray,
+                 rows: List[str], cols: List[str], method: str):
+        self.method = method
+        self.rows, self.cols = list(rows), list(cols)
+        self.r = pd.DataFrame(r, index=self.rows, columns=self.cols)
+        self.p = pd.DataFrame(p, index=self.rows, columns=self.cols)
+        self.n = pd.DataFrame(n, index=self.rows, columns=self.cols)
+
+    def long_table(self) -> pd.DataFrame:
+        """One row per pair (row, col, r, p, n) — the export format."""
+        rr, cc = np.meshgrid(np.arange(len(self.rows)), np.arange(len(self.cols)), indexing="ij")
+        return pd.DataFrame({
+            "row": np.asarray(self.rows, dtype=object)[rr.ravel()],
+            "col": np.asarray(self.cols, dtype=object)[cc.ravel()],
+            "method": self.method,
+            "r": self.r.to_numpy().ravel(),
+            "p": self.p.to_numpy().ravel(),
+            "n": self.n.to_numpy().ravel(),
+        })
+
+
+def association_matrix(M: np.ndarray, names: List[str], rows: List[str], cols: List[str],
+                       method: str = "pearson") -> AssocMatrix:
+    """Correlate the `rows` columns of M against the `cols` columns (names index M's columns)."""
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    pos = {c: j for j, c in enumerate(names)}
+    ri, ci = [pos[c] for c in rows], [pos[c] for c in cols]
+    if method == "spearman":
+        # rank only the columns in use, each once, even when it is both a row and a column
+        used = list(dict.fromkeys(ri + ci))
+        local = {j: k for k, j in enumerate(used)}
+        values = M[:, used]
+        ri, ci = [local[j] for j in ri], [local[j] for j in ci]
+        r, n = pairwise_corr(rank_columns(values), ri, ci)
+        r = rerank_pairs(values, ri, ci, r, n)
+    else:
+        r, n = pairwise_corr(M, ri, ci)
+    return AssocMatrix(r, corr_pvalues(r, n), n, rows, cols, method)
+
+
+def frame_matrix(df: pd.DataFrame, rows: List[str], cols: List[str], method: str = "pearson") -> AssocMatrix:
+    names = list(dict.fromkeys(list(rows) + list(cols)))
+    return association_matrix(numeric_matrix(df, names), names, rows, cols, method)
+
+
+# ---------- Resampling: bootstrap CI and permutation p-value ----------
+# Resamples are drawn as index batches from seeded Generators and evaluated a whole
+# batch at a time (weighted sums as matrix-vector products); fixed-size tasks, each
+# with its own spawned seed, are spread over a process pool, so results depend only on
+# `seed`, not on the number of workers.
+
+RESAMPLE_WORKERS = int(os.environ.get("SURVEY_RESAMPLE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# cells (resamples x pairs) per batch: bounds each B x n temporary to ~16 MB
+BATCH_CELLS = 2_000_000
+TASK_RESAMPLES = 1_000
+# below this many cells in total the pool start-up/IPC costs more than the work
+MIN_PARALLEL_CELLS = 5_000_000
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _tie_groups(v: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort order, start of each run of equal values, and each observation's run."""
+    order = np.argsort(v, kind="stable")
+    vs = v[order]
+    is_start = np.r_[True, vs[1:] != vs[:-1]]
+    group = np.empty(v.size, dtype=np.intp)
+    group[order] = np.cumsum(is_start) - 1
+    return order, np.flatnonzero(is_start), group
+
+
+def _weighted_ranks(W: np.ndarray, ties) -> np.ndarray:
+    """Average ranks of every observation inside each resample (rows of counts W)."""
+    order, starts, group = ties
+    C = np.add.reduceat(W[:, order], starts, axis=1)
+    R = np.cumsum(C, axis=1) - C + (C + 1) / 2.0
+    return R[:, group]
+
+
+def _boot_batch(x, y, method, W, ties) -> np.ndarray:
+    n = x.size
+    if method == "pearson":
+        S = W @ np.column_stack([x, y, x * x, y * y, x * y])
+        sx, sy, sxx, syy, sxy = S.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    rx, ry = _weighted_ranks(W, ties[0]), _weighted_ranks(W, ties[1])
+    # every resample has n draws, so the mean rank is (n + 1) / 2 whatever the ties
+    rx -= (n + 1) / 2.0
+    ry -= (n + 1) / 2.0
+    sxy = np.einsum("bi,bi,bi->b", W, rx, ry)
+    sxx = np.einsum("bi,bi,bi->b", W, rx, rx)
+    syy = np.einsum("bi,bi,bi->b", W, ry, ry)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sxy / np.sqrt(sxx * syy)
+
+
+def _resample_task(args) -> np.ndarray:
+    kind, x, y, method, n_resamples, seed_seq = args
+    rng = np.random.default_rng(seed_seq)
+    n = x.size
+    batch = max(1, BATCH_CELLS // max(n, 1))
+    out = np.empty(n_resamples)
+    if kind == "perm":
+        # permutations leave each column's centering, scale and ranks unchanged:
+        # r for a batch is one gather plus one matrix-vector product
+        if method == "spearman":
+            x, y = stats.rankdata(x), stats.rankdata(y)
+        xc, yc = x - x.mean(), y - y.mean()
+        denom = np.sqrt((xc @ xc) * (yc @ yc))
+        for start in range(0, n_resamples, batch):
+            b = min(batch, n_resamples - start)
+            P = rng.permuted(np.broadcast_to(np.arange(n), (b, n)), axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[start:start + b] = (xc[P] @ yc) / denom
+        return out
+    x, y = x - x.mean(), y - y.mean()
+    ties = (_tie_groups(x), _tie_groups(y)) if method == "spearman" else None
+    for start in range(0, n_resamples, batch):
+        b = min(batch, n_resamples - start)
+        idx = rng.integers(0, n, size=(b, n)) + (np.arange(b) * n)[:, None]
+        W = np.bincount(idx.ravel(), minlength=b * n).reshape(b, n).astype(float)
+        out[start:start + b] = _boot_batch(x, y, method, W, ties)
+    return out
+
+
+def _get_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if workers < 2:
+        return None
+    if _pool is None:
+        # spawn: the Streamlit server is multi-threaded, forking it is not safe
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def _run_tasks(jobs, workers: int) -> List[np.ndarray]:
+    cells = sum(job[1].size * job[4] for job in jobs)
+    pool = _get_pool(workers) if cells >= MIN_PARALLEL_CELLS else None
+    if pool is not None:
+        try:
+            return list(pool.map(_resample_task, jobs))
+        except Exception:
+            # broken pool (e.g. a worker was killed): start a fresh one next time, run here now
+            _reset_pool()
+    return [_resample_task(job) for job in jobs]
+
+
+def resample_association(x, y, method: str = "pearson", n_resamples: int = 10_000,
+                         confidence: float = 0.95, seed: int = 0,
+                         workers: Optional[int] = None) -> dict:
+    """Percentile bootstrap CI and two-sided permutation p-value for r (Pearson/Spearman).
+
+    Returns ci_low, ci_high, boot_se, perm_p, n_resamples, confidence, seed.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    workers = RESAMPLE_WORKERS if workers is None else workers
+    sizes = [min(TASK_RESAMPLES, n_resamples - s) for s in range(0, n_resamples, TASK_RESAMPLES)]
+    boot_seq, perm_seq = np.random.SeedSequence(seed).spawn(2)
+    jobs = ([("boot", x, y, method, k, s) for k, s in zip(sizes, boot_seq.spawn(len(sizes)))]
+            + [("perm", x, y, method, k, s) for k, s in zip(sizes, perm_seq.spawn(len(sizes)))])
+    parts = _run_tasks(jobs, workers)
+    boot = np.concatenate(parts[:len(sizes)])
+    perm = np.concatenate(parts[len(sizes):])
+
+    r_obs = (stats.pearsonr(x, y) if method == "pearson" else stats.spearmanr(x, y))[0]
+    boot = boot[~np.isnan(boot)]
+    alpha = (1.0 - confidence) / 2.0
+    lo, hi = np.quantile(boot, [alpha, 1.0 - alpha]) if boot.size else (np.nan, np.nan)
+    # (hits + 1) / (B + 1): never exactly zero, valid as a Monte Carlo p-value
+    hits = int(np.sum(np.abs(perm) >= abs(r_obs) - 1e-12))
+    return {"ci_low": float(lo), "ci_high": float(hi),
+            "boot_se": float(boot.std(ddof=1)) if boot.size > 1 else np.nan,
+            "perm_p": (hits + 1) / (perm.size + 1),
+            "n_resamples": int(n_resamples), "confidence": confidence, "seed": seed}
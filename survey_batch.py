@@ -0,0 +1,224 @@
+# survey_batch.py
+# Headless batch analysis of a directory of survey files (.csv / .xlsx).
+# Run: python survey_batch.py INPUT_DIR OUTPUT_DIR [--workers 4] [--pdf] [--matrix spearman] [--segments gender age] [--x X1 X2 ...] [--y Y1 Y2 ...]
+#      [--missing "Drop incomplete rows (listwise)"] [--item-mean] [--scales SCALES.txt] [--charts]
+#
+# Each input file gets OUTPUT_DIR/<file name>/ with results.json, descriptives.parquet
+# (CSV if Parquet is unavailable), correlations.csv (item matrix, one row per pair),
+# segments_<column>.csv / segment_tests_<column>.csv for each --segments column,
+# chi_square_demographics.csv (each --segments column against binned X_total / Y_total),
+# drivers.csv (OLS of Y_total and each Y item on the X items, overall and per segment level),
+# reliability.csv / reliability_items.csv (Cronbach's alpha of X, Y and each --scales scale;
+# a scale whose items a file lacks is skipped for that file and listed in results.json),
+# with --charts a charts/<column>.png per described column and, with --pdf, report.pdf.
+# results.json is written last, so a file counts as done only once it exists: re-running
+# the same command skips finished files and retries the ones that failed (see error.json).
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import survey_pipeline as pipeline
+from survey_charts import hist_box_spec, render_png
+from survey_report import write_report
+from survey_scales import Scale, parse_scales
+
+SUFFIXES = (".csv", ".xlsx")
+
+
+def find_inputs(input_dir: str) -> List[str]:
+    return sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir)
+                  if f.lower().endswith(SUFFIXES) and not f.startswith("~$"))
+
+
+def out_dir_for(output_dir: str, path: str) -> str:
+    return os.path.join(output_dir, os.path.basename(path))
+
+
+def _write_json(obj, path: str) -> None:
+    # atomic: results.json doubles as the "done" marker
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def chart_file_name(col) -> str:
+    """File name of a column's chart PNG (characters unsafe in file names become "_")."""
+    return re.sub(r"[^\w.-]+", "_", str(col)).strip("._") + ".png"
+
+
+def chart_pngs(desc) -> Dict[str, bytes]:
+    """Histogram/boxplot PNG per described column, with the app cards' bins
+    (items: 3-8 bins, composites: 4-10)."""
+    pngs = {}
+    for col in desc.table.index:
+        data = desc.values(col)
+        if data.size == 0:
+            continue
+        lo, hi, per = (4, 10, 3) if col in pipeline.COMPOSITES else (3, 8, 4)
+        pngs[col] = render_png(hist_box_spec(data, min(hi, max(lo, int(len(data) / per)))))
+    return pngs
+
+
+def split_scales(columns, scales: Optional[List[Scale]]):
+    """The scales whose items are all in `columns`, and {name: missing items} of the others."""
+    have = set(columns)
+    usable, skipped = [], {}
+    for sc in scales or []:
+        lacking = [c for c in sc.items if c not in have]
+        if lacking:
+            skipped[sc.name] = lacking
+        else:
+            usable.append(sc)
+    return usable, skipped
+
+
+def analyze_file(path: str, output_dir: str, x_items: Optional[List[str]], y_items: Optional[List[str]],
+                 missing: str, method: str, pdf: bool, matrix_method: str = "pearson",
+                 resamples: int = 0, segment_cols: Optional[List[str]] = None,
+                 item_mean: bool = False, scales: Optional[List[Scale]] = None, charts: bool = False) -> dict:
+    """Worker: analyze one file and write its outputs. Returns a small status dict."""
+    t0 = time.perf_counter()
+    dest = out_dir_for(output_dir, path)
+    os.makedirs(dest, exist_ok=True)
+    try:
+        df = pipeline.load(path)
+        scales, skipped_scales = split_scales(df.columns, scales)
+        # files already run one per process, so resampling stays in this worker (workers=1)
+        result = pipeline.analyze(df, x_items, y_items, missing=missing, method=method,
+                                  matrix_method=matrix_method, resamples=resamples, workers=1,
+                                  segment_cols=[c for c in segment_cols or [] if c in df.columns],
+                                  item_mean=item_mean, scales=scales)
+        table = result["descriptives"].table
+        try:
+            table.to_parquet(os.path.join(dest, "descriptives.parquet"))
+        except Exception:
+            table.to_csv(os.path.join(dest, "descriptives.csv"))
+        result["matrix"].long_table().to_csv(os.path.join(dest, "correlations.csv"), index=False)
+        for col, seg in result["segments"].items():
+            seg.export_table().to_csv(os.path.join(dest, f"segments_{col}.csv"))
+            seg.tests.to_csv(os.path.join(dest, f"segment_tests_{col}.csv"))
+        if "drivers" in result:
+            pd.concat([t.export_table() for t in result["drivers"].values()],
+                      keys=list(result["drivers"]), names=["column"]).reset_index(level=0).to_csv(
+                os.path.join(dest, "drivers.csv"), index=False)
+        rel = result["reliability"]
+        rel.summary.to_csv(os.path.join(dest, "reliability.csv"))
+        if rel.items:
+            pd.concat(rel.items, names=["scale"]).to_csv(os.path.join(dest, "reliability_items.csv"))
+        if "demographic_chi2" in result:
+            result["demographic_chi2"].summary.to_csv(os.path.join(dest, "chi_square_demographics.csv"), index=False)
+        pngs = chart_pngs(result["descriptives"]) if pdf or charts else {}
+        if charts:
+            os.makedirs(os.path.join(dest, "charts"), exist_ok=True)
+            for col, png in pngs.items():
+                with open(os.path.join(dest, "charts", chart_file_name(col)), "wb") as f:
+                    f.write(png)
+        if pdf:
+            write_report(os.path.join(dest, "report.pdf"),
+                         pipeline.report_snapshot(result, pngs, subtitle=os.path.basename(path)))
+        out = pipeline.result_json(result)
+        out["file"] = path
+        out["seconds"] = round(time.perf_counter() - t0, 4)
+        if skipped_scales:
+            out["skipped_scales"] = skipped_scales
+        _write_json(out, os.path.join(dest, "results.json"))
+        err = os.path.join(dest, "error.json")
+        if os.path.exists(err):
+            os.remove(err)
+        return {"file": path, "ok": True, "seconds": out["seconds"], "skipped_scales": skipped_scales}
+    except Exception as e:
+        _write_json({"file": path, "error": repr(e), "traceback": traceback.format_exc()},
+                    os.path.join(dest, "error.json"))
+        return {"file": path, "ok": False, "error": repr(e)}
+
+
+def run(input_dir: str, output_dir: str, workers: int, x_items=None, y_items=None,
+        missing: str = pipeline.MISSING_METHODS[0], method: str = "Auto", pdf: bool = False,
+        resume: bool = True, matrix_method: str = "pearson", resamples: int = 0,
+        segment_cols: Optional[List[str]] = None, item_mean: bool = False,
+        scales: Optional[List[Scale]] = None, charts: bool = False) -> dict:
+    os.makedirs(output_dir, exist_ok=True)
+    inputs = find_inputs(input_dir)
+    todo = [p for p in inputs
+            if not (resume and os.path.exists(os.path.join(out_dir_for(output_dir, p), "results.json")))]
+    skipped = len(inputs) - len(todo)
+    print(f"{len(inputs)} files, {skipped} already done, {len(todo)} to analyze with {workers} workers")
+
+    t0 = time.perf_counter()
+    ok, failed = 0, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_file, p, output_dir, x_items, y_items, missing, method, pdf,
+                               matrix_method, resamples, segment_cols, item_mean, scales, charts): p for p in todo}
+        for i, fut in enumerate(as_completed(futures), 1):
+            try:
+                status = fut.result()
+            except Exception as e:  # worker crashed hard (e.g. killed); the file is retried next run
+                status = {"file": futures[fut], "ok": False, "error": repr(e)}
+            if status["ok"]:
+                ok += 1
+                for name, lacking in status.get("skipped_scales", {}).items():
+                    print(f"  {status['file']}: scale {name} skipped, missing {', '.join(map(str, lacking))}",
+                          file=sys.stderr)
+            else:
+                failed.append(status)
+                print(f"  FAILED {status['file']}: {status['error']}", file=sys.stderr)
+            if i % 50 == 0 or i == len(futures):
+                elapsed = time.perf_counter() - t0
+                print(f"  {i}/{len(futures)} files, {i / elapsed:.2f} files/sec")
+    elapsed = time.perf_counter() - t0
+    summary = {"files": len(inputs), "skipped": skipped, "ok": ok, "failed": len(failed),
+               "seconds": round(elapsed, 3),
+               "files_per_sec": round(len(todo) / elapsed, 3) if todo and elapsed > 0 else 0.0}
+    _write_json({**summary, "failures": failed}, os.path.join(output_dir, "_batch_summary.json"))
+    print(f"done: {ok} ok, {len(failed)} failed, {skipped} skipped in {elapsed:.1f}s "
+          f"({summary['files_per_sec']} files/sec)")
+    return summary
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Analyze a directory of survey files headlessly.")
+    ap.add_argument("input_dir")
+    ap.add_argument("output_dir")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--x", nargs="+", dest="x_items", help="X item columns (default: first 4 numeric)")
+    ap.add_argument("--y", nargs="+", dest="y_items", help="Y item columns (default: next 4 numeric)")
+    ap.add_argument("--missing", choices=pipeline.MISSING_METHODS, default=pipeline.MISSING_METHODS[0])
+    ap.add_argument("--method", choices=["Auto", "Pearson", "Spearman", "Chi-square"], default="Auto")
+    ap.add_argument("--matrix", choices=["pearson", "spearman"], default="pearson",
+                    help="method for the item correlation matrix (correlations.csv)")
+    ap.add_argument("--resamples", type=int, default=0,
+                    help="bootstrap/permutation resamples for the X_total-Y_total correlation (0 = off)")
+    ap.add_argument("--segments", nargs="+", dest="segment_cols",
+                    help="demographic columns to compare segments by (skipped in files without them)")
+    ap.add_argument("--item-mean", action="store_true",
+                    help="fill missing items with the item mean inside X_total/Y_total")
+    ap.add_argument("--scales", help="file defining more scales, one per line: "
+                                     "'Name (1-5): item, item, -reversed item' (see survey_scales)")
+    ap.add_argument("--charts", action="store_true", help="also write charts/<column>.png per file")
+    ap.add_argument("--pdf", action="store_true", help="also write report.pdf per file")
+    ap.add_argument("--no-resume", action="store_true", help="re-analyze files that already have results")
+    args = ap.parse_args(argv)
+    scales = None
+    if args.scales:
+        with open(args.scales, encoding="utf-8") as f:
+            scales = parse_scales(f.read())
+    summary = run(args.input_dir, args.output_dir, args.workers, args.x_items, args.y_items,
+                  args.missing, args.method, args.pdf, resume=not args.no_resume,
+                  matrix_method=args.matrix, resamples=args.resamples,
+                  segment_cols=args.segment_cols, item_mean=args.item_mean, scales=scales, charts=args.charts)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
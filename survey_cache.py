@@ -0,0 +1,227 @@
+# survey_cache.py
+# Bounded, size-aware LRU cache shared by the analyzer modules.
+# Values are weighed in bytes (DataFrames via memory_usage(deep=True)) and the
+# least recently used entries are evicted once the byte budget is exceeded; with a
+# TTL, entries not read for that many seconds are evicted as well.
+# ResultCache puts one in front of the analysis stages so every session of the
+# process shares results computed for the same file and settings.
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_nbytes(value: Any, _seen: Optional[set] = None) -> int:
+    """Best-effort in-memory size of a cached value, in bytes.
+
+    Containers and plain objects are walked (each object counted once), so a result
+    object is weighed by the arrays and tables it holds.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (str, int, float, complex, bool, np.generic)) or value is None:
+        return sys.getsizeof(value)
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_nbytes(k, _seen) + estimate_nbytes(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_nbytes(v, _seen) for v in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_nbytes(vars(value), _seen)
+    return size
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by total byte size rather than entry count.
+
+    A value larger than the whole budget is never stored (it would only evict
+    everything else and then be evicted itself on the next insert). With `ttl`
+    (seconds), an entry not read or written for that long counts as gone. All
+    operations hold a lock, so one instance can be shared between Streamlit session
+    threads.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = estimate_nbytes,
+                 ttl: Optional[float] = None):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes = {}
+        self._touched = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            self._expire()
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._touched[key] = time.monotonic()
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            self._expire()
+            return list(self._data)
+
+    def _expire(self) -> None:
+        # entries are kept in access order, so the expired ones are all at the front
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._data:
+            oldest = next(iter(self._data))
+            if self._touched[oldest] > cutoff:
+                break
+            self._drop(oldest)
+            self.expirations += 1
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """Insert `value`; returns False if it is too large to be cached at all."""
+        size = int(self._sizeof(value))
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            self._expire()
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._touched[key] = time.monotonic()
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._data:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+        return True
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._drop(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._touched.clear()
+            self.current_bytes = 0
+
+    def _drop(self, key: Hashable) -> None:
+        del self._data[key]
+        del self._touched[key]
+        self.current_bytes -= self._sizes.pop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Process-wide cache of analysis stage results, keyed by (stage, inputs).
+
+    Inputs identify the data by content hash plus the settings that shape the stage,
+    so a second session opening the same file with the same settings gets every stage
+    from here. Each key is computed once: concurrent callers of a key that is being
+    computed wait for that result instead of repeating the work. Values are shared
+    between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self.cache = LRUCache(max_bytes, ttl=ttl)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, threading.Lock] = {}
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    def get_or_compute(self, stage: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        full = (stage, key)
+        hit = self.cache.get(full, _MISSING)
+        if hit is _MISSING:
+            with self._lock:
+                lock = self._inflight.setdefault(full, threading.Lock())
+            with lock:
+                # another session may have computed it while this one waited
+                hit = self.cache.get(full, _MISSING)
+                if hit is _MISSING:
+                    try:
+                        t0 = time.perf_counter()
+                        value = fn()
+                        seconds = time.perf_counter() - t0
+                        self.cache.put(full, (value, seconds))
+                    finally:
+                        with self._lock:
+                            self._inflight.pop(full, None)
+                    self._count(stage, "misses", seconds)
+                    return value
+        value, seconds = hit
+        self._count(stage, "hits", seconds)
+        return value
+
+    def _count(self, stage: str, field: str, seconds: float) -> None:
+        with self._lock:
+            s = self._stages.setdefault(stage, {"hits": 0, "misses": 0, "compute_s": 0.0, "saved_s": 0.0})
+            s[field] += 1
+            s["compute_s" if field == "misses" else "saved_s"] += seconds
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        """Totals (as LRUCache.stats) plus per-stage hits, misses, compute and saved seconds."""
+        out = self.cache.stats()
+        entries: Dict[str, int] = {}
+        for stage, _ in self.cache.keys():
+            entries[stage] = entries.get(stage, 0) + 1
+        with self._lock:
+            stages = {name: dict(s, entries=entries.get(name, 0)) for name, s in self._stages.items()}
+        out["hits"] = sum(s["hits"] for s in stages.values())
+        out["misses"] = sum(s["misses"] for s in stages.values())
+        out["stages"] = stages
+        return out
@@ -0,0 +1,229 @@
+# survey_charts.py
+# Cached histogram/boxplot rendering for the descriptive cards.
+# A chart is described by a small "spec" (NumPy histogram counts + boxplot stats),
+# so the same bins serve the on-screen PNG and the PDF export. Rendered PNG bytes are
+# cached by a fingerprint of the spec and plot parameters; cache misses are rendered
+# in parallel in a process pool using the Agg backend.
+# Large X_total/Y_total scatters are drawn the same way: a 2-D count grid
+# (density_grid) replaces one marker per respondent.
+
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+from matplotlib import cbook
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from survey_cache import LRUCache
+
+# below this many misses the pool start-up/IPC costs more than rendering inline
+MIN_PARALLEL = 4
+CHART_WORKERS = int(os.environ.get("SURVEY_CHART_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# above this many pairs the scatter is a density plot (one marker each would take seconds to draw)
+DENSITY_MIN_ROWS = int(os.environ.get("SURVEY_DENSITY_ROWS", "20000"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hist_box_spec(values, bins: int, weights=None, box: Optional[dict] = None) -> dict:
+    """Histogram counts/edges and boxplot stats for one column.
+
+    `weights` lets callers pass value counts instead of raw rows (streaming mode);
+    `box` overrides the boxplot stats when they come from an accumulator.
+    """
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    if box is None:
+        box = cbook.boxplot_stats(values)[0] if values.size else None
+        if box is not None:
+            # Likert data repeats the same few outliers many times; one marker each is enough
+            box["fliers"] = np.unique(box["fliers"])
+    return {"counts": counts, "edges": edges, "box": box}
+
+
+def spec_fingerprint(spec: dict, **plot_params) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.asarray(spec["counts"], dtype=float).tobytes())
+    h.update(np.asarray(spec["edges"], dtype=float).tobytes())
+    box = spec.get("box") or {}
+    for k in ("med", "q1", "q3", "whislo", "whishi", "mean"):
+        h.update(repr(box.get(k)).encode())
+    h.update(np.asarray(box.get("fliers", []), dtype=float).tobytes())
+    h.update(repr(sorted(plot_params.items())).encode())
+    return h.hexdigest()
+
+
+def draw_hist_box(axes, spec: dict) -> None:
+    """Draw a spec onto a pair of axes (histogram, boxplot) — used for PNGs and PDF pages."""
+    counts, edges = spec["counts"], spec["edges"]
+    axes[0].stairs(counts, edges, fill=True)
+    axes[0].set_title('Histogram')
+    axes[0].tick_params(axis='both', which='major', labelsize=8)
+    if spec.get("box") is not None:
+        axes[1].bxp([spec["box"]], showfliers=True)
+    axes[1].set_title('Boxplot')
+    axes[1].tick_params(axis='both', which='major', labelsize=8)
+
+
+def render_png(spec: dict, figsize=(6, 2.2), dpi: int = 120) -> bytes:
+    # Figure() without pyplot uses the Agg canvas and is safe in threads and worker processes
+    fig = Figure(figsize=figsize, dpi=dpi)
+    axes = fig.subplots(1, 2)
+    draw_hist_box(axes, spec)
+    # fixed margins: tight_layout would cost an extra full layout/draw pass per chart
+    fig.subplots_adjust(left=0.08, right=0.98, bottom=0.12, top=0.86, wspace=0.25)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def _grid_axis(v: np.ndarray, max_bins: int):
+    """Cell edges along one axis and each value's cell index."""
+    return grid_cells(v, float(v.min()), float(v.max()), max_bins)
+
+
+def grid_cells(v: np.ndarray, lo: float, hi: float, max_bins: int, integer: Optional[bool] = None):
+    """_grid_axis for values within [lo, hi], e.g. one batch of a longer column; `integer`
+    says whether the whole column holds whole numbers (else checked on v)."""
+    if hi - lo + 1 <= max_bins and (np.array_equal(v, np.floor(v)) if integer is None else integer):
+        # integer totals (Likert sums): one cell per value, centred on it
+        return np.arange(lo - 0.5, hi + 1.0), (v - lo).astype(np.intp)
+    if lo == hi:
+        return np.array([lo - 0.5, hi + 0.5]), np.zeros(v.size, dtype=np.intp)
+    # equal-width cells: the index is arithmetic, as in np.histogram
+    idx = ((v - lo) * (max_bins / (hi - lo))).astype(np.intp)
+    np.minimum(idx, max_bins - 1, out=idx)
+    return np.linspace(lo, hi, max_bins + 1), idx
+
+
+def density_grid(x, y, max_bins: int = 60) -> dict:
+    """Respondent counts on a 2-D grid of (x, y) for the density scatter.
+
+    Integer data with at most `max_bins` distinct values per axis gets one cell per
+    value, anything else `max_bins` equal-width cells. Counted with one bincount over
+    the flat cell index (no per-point drawing or sorting).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = ~np.isnan(x) & ~np.isnan(y)
+    if not ok.all():
+        x, y = x[ok], y[ok]
+    if x.size == 0:
+        return {"counts": np.zeros((0, 0), dtype=np.intp), "xedges": np.zeros(1), "yedges": np.zeros(1), "n": 0}
+    xedges, ix = _grid_axis(x, max_bins)
+    yedges, iy = _grid_axis(y, max_bins)
+    ny = len(yedges) - 1
+    counts = np.bincount(ix * ny + iy, minlength=(len(xedges) - 1) * ny).reshape(-1, ny)
+    return {"counts": counts, "xedges": xedges, "yedges": yedges, "n": int(x.size)}
+
+
+def draw_density(ax, grid: dict) -> None:
+    """Draw a density grid as a heatmap (empty cells blank, log colour scale) with a colorbar."""
+    counts = np.ma.masked_equal(grid["counts"].T, 0)
+    if counts.count() == 0:
+        return
+    norm = LogNorm(vmin=1, vmax=max(2, int(counts.max())))
+    mesh = ax.pcolormesh(grid["xedges"], grid["yedges"], counts, cmap="viridis", norm=norm)
+    ax.figure.colorbar(mesh, ax=ax, fraction=0.05, pad=0.02).set_label("respondents", fontsize=8)
+
+
+def heatmap_png(r, title: str = "", max_labels: int = 40, annotate_max: int = 15, dpi: int = 120) -> bytes:
+    """Correlation heatmap of a rows x cols DataFrame (diverging, fixed to [-1, 1]).
+
+    Tick labels are dropped past `max_labels` per axis and cell values past
+    `annotate_max`, so a 200 x 200 matrix still renders in one imshow call.
+    """
+    n_rows, n_cols = r.shape
+    width = min(12.0, 2.5 + 0.35 * n_cols)
+    height = min(12.0, 1.5 + 0.3 * n_rows)
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    ax = fig.subplots()
+    im = ax.imshow(r.to_numpy(dtype=float), cmap="RdBu_r", vmin=-1, vmax=1, aspect="auto", interpolation="nearest")
+    fig.colorbar(im, ax=ax, fraction=0.04, pad=0.02)
+    if n_cols <= max_labels:
+        ax.set_xticks(range(n_cols), [str(c) for c in r.columns], rotation=90, fontsize=7)
+    else:
+        ax.set_xticks([])
+    if n_rows <= max_labels:
+        ax.set_yticks(range(n_rows), [str(c) for c in r.index], fontsize=7)
+    else:
+        ax.set_yticks([])
+    if n_rows <= annotate_max and n_cols <= annotate_max:
+        for (i, j), v in np.ndenumerate(r.to_numpy(dtype=float)):
+            if not np.isnan(v):
+                ax.text(j, i, f"{v:.2f}", ha="center", va="center", fontsize=6,
+                        color="white" if abs(v) > 0.6 else "black")
+    if title:
+        ax.set_title(title, fontname="Times New Roman")
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def _render_job(args):
+    spec, figsize, dpi = args
+    return render_png(spec, figsize, dpi)
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if CHART_WORKERS < 2:
+        return None
+    if _pool is None:
+        # spawn: the Streamlit server is multi-threaded, forking it is not safe
+        _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+class ChartRenderer:
+    """PNG cache in front of render_png; `render_many` fans cache misses out to the pool."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.cache = LRUCache(max_bytes)
+
+    def render_many(self, specs: Dict[str, dict], figsize=(6, 2.2), dpi: int = 120) -> Dict[str, bytes]:
+        out, todo = {}, {}
+        for name, spec in specs.items():
+            key = spec_fingerprint(spec, figsize=figsize, dpi=dpi)
+            png = self.cache.get(key)
+            if png is None:
+                todo[name] = (key, spec)
+            else:
+                out[name] = png
+        if not todo:
+            return out
+
+        pool = _get_pool() if len(todo) >= MIN_PARALLEL else None
+        jobs = [(spec, figsize, dpi) for _, spec in todo.values()]
+        if pool is not None:
+            try:
+                pngs = list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * CHART_WORKERS))))
+            except Exception:
+                # broken pool (e.g. a worker was killed): start a fresh one next time, render here now
+                _reset_pool()
+                pngs = [_render_job(j) for j in jobs]
+        else:
+            pngs = [_render_job(j) for j in jobs]
+        for (name, (key, _)), png in zip(todo.items(), pngs):
+            self.cache.put(key, png)
+            out[name] = png
+        return out
+
+    def render(self, spec: dict, figsize=(6, 2.2), dpi: int = 120) -> bytes:
+        return self.render_many({"_": spec}, figsize, dpi)["_"]
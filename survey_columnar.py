@@ -0,0 +1,622 @@
+# survey_columnar.py
+# Out-of-core mode for CSV files too large for an in-memory table. The upload is
+# converted once, block by block, into an uncompressed Arrow IPC file (numeric columns
+# as float64 with NaN for blanks, everything else as text) and that file is
+# memory-mapped: a record batch of a float column is a NumPy view of the mapped pages,
+# with no parse and no copy, and the OS pages it in and out as needed. Each statistic
+# then reads only the selected columns, one batch at a time, so resident memory stays at
+# a few batches whatever the number of rows:
+#   column_stats    RunningStats (survey_streaming) per item and composite; the composites
+#                   (and, for listwise deletion, the mask of complete rows) are written
+#                   to a second mapped file aligned batch for batch with the upload
+#   mapped_missing  the missing-value options on those accumulators, with exact
+#                   quartiles and medians where value counts are not exact: a histogram
+#                   pass locates the bin holding each rank, narrowed until it is small
+#                   enough to sort (select_ranks)
+#   MappedPair      X_total / Y_total for the association section: Pearson r from
+#                   merged co-moments, Spearman rho from the mid-ranks of the distinct
+#                   totals, normality from moment sums, the crosstabs behind the
+#                   chi-square tests (binned totals, demographics) and the density grid
+#                   of the scatter, each summed over batches.
+# Needs pyarrow; AVAILABLE is False without it.
+
+import copy
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+from survey_assoc import corr_pvalues
+from survey_charts import grid_cells
+from survey_contingency import BINNINGS, crosstabs
+from survey_excel import header_names
+from survey_incremental import PairStats
+from survey_ingest import content_hash
+from survey_normality import SUBSAMPLE_MAX_N, TEST_LABELS, assess, moment_verdict
+from survey_segments import MISSING_LEVEL
+from survey_streaming import RunningStats
+
+AVAILABLE = pa is not None
+
+# CSV bytes parsed per block; every block becomes one record batch of the mapped file
+BLOCK_BYTES = int(os.environ.get("SURVEY_COLUMNAR_BLOCK_MB", "16")) * 1024 * 1024
+# quantile selection: histogram bins per pass, and the largest bin sorted directly
+HIST_BINS = 4096
+GATHER_MAX = 1 << 16
+# Spearman ranks and quantile bins of the totals come from their distinct values up to this many
+DISTINCT_MAX = 100_000
+BOX_QUANTILES = (0.25, 0.5, 0.75)
+# mapped copies and work files kept per directory, least recently used removed first
+DIR_MAX_BYTES = int(os.environ.get("SURVEY_COLUMNAR_MAX_MB", "4096")) * 1024 * 1024
+_COMPLETE = "__complete__"
+
+
+# ---------- Conversion ----------
+def _reader(data: bytes, names: Optional[List[str]] = None, types: Optional[dict] = None):
+    read = pacsv.ReadOptions(block_size=BLOCK_BYTES, column_names=names, skip_rows=1 if names else 0)
+    convert = pacsv.ConvertOptions(column_types=types or {}, strings_can_be_null=True)
+    return pacsv.open_csv(pa.BufferReader(data), read_options=read, convert_options=convert)
+
+
+def _is_numeric(t) -> bool:
+    return pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t) or pa.types.is_null(t)
+
+
+def _write_batches(batches, schema, path: str) -> int:
+    # temp file first, like survey_ingest.write_parquet: readers never see half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".arrow.tmp", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    rows = 0
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+
+def _stored(batch, schema):
+    # NaN instead of nulls: float batches without a validity bitmap map straight to NumPy
+    arrays = [pc.fill_null(col, np.nan) if pa.types.is_floating(field.type) else col
+              for col, field in zip(batch.columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def convert_csv(data: bytes, path: str) -> int:
+    """Write the CSV `data` to `path` as an Arrow IPC file, one block at a time; returns
+    the number of rows. Headers follow pd.read_csv ("Unnamed: <i>", ".1" for repeats).
+
+    Column types come from the first block (numbers -> float64, anything else -> text);
+    a column that turns out to hold text further down is re-read as text.
+    """
+    first = _reader(data)
+    names = header_names([n if n != "" else None for n in first.schema.names])
+    types = {n: pa.float64() if _is_numeric(f.type) else pa.string() for n, f in zip(names, first.schema)}
+    schema = pa.schema([(n, t) for n, t in types.items()])
+    while True:
+        reader = _reader(data, names, types)
+        try:
+            return _write_batches((_stored(b, schema) for b in reader), schema, path)
+        except pa.ArrowInvalid as e:
+            # "In CSV column #3: Row #1234: CSV conversion error to double: invalid value 'n/a'"
+            msg = str(e)
+            pos = msg.find("column #")
+            col = int(msg[pos + 8:].split(":")[0]) if pos >= 0 else None
+            if col is None or types[names[col]] == pa.string():
+                raise
+            types[names[col]] = pa.string()
+            schema = pa.schema([(n, t) for n, t in types.items()])
+
+
+class MappedTable:
+    """An Arrow IPC file mapped into memory. Every column has the same record batches,
+    so the i-th batch of any two columns covers the same rows."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.key = os.path.basename(path).split(".")[0]
+        self._map = pa.memory_map(path, "r")
+        # reading from a memory map references the mapped pages instead of copying them
+        self.table = pa.ipc.open_file(self._map).read_all()
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def disk_bytes(self) -> int:
+        return os.path.getsize(self.path)
+
+    def head(self, n: int = 1000) -> pd.DataFrame:
+        return self.table.slice(0, n).to_pandas()
+
+    def values(self, col: str) -> Iterator[np.ndarray]:
+        """Float values of `col` per batch (NaN = missing); text is coerced like pipeline.coerce."""
+        for chunk in self.table.column(col).chunks:
+            if pa.types.is_floating(chunk.type):
+                yield chunk.to_numpy(zero_copy_only=chunk.null_count == 0)
+            else:
+                yield pd.to_numeric(chunk.to_pandas(), errors="coerce").to_numpy(dtype=float)
+
+    def labels(self, col: str) -> Iterator[pd.Series]:
+        """Raw values of `col` per batch, for categories."""
+        for chunk in self.table.column(col).chunks:
+            yield chunk.to_pandas()
+
+
+def _touch(path: str) -> None:
+    # the modification time orders files for eviction: a reused file counts as new
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict(directory: str, max_bytes: int = DIR_MAX_BYTES, keep: Sequence[str] = ()) -> int:
+    """Remove the least recently used .arrow files of `directory` until the rest fit in
+    `max_bytes` (files in `keep` stay). A removed file stays readable wherever it is still
+    mapped (POSIX); one that cannot be removed (mapped on Windows) is skipped. Returns
+    the bytes freed."""
+    keep = {os.path.abspath(p) for p in keep}
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".arrow") and entry.is_file():
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    freed = 0
+    for _, size, path in sorted(files):
+        if total - freed <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+def open_columnar(data: bytes, directory: str) -> MappedTable:
+    """The mapped copy of a CSV upload, converting it on first use (kept per content,
+    within DIR_MAX_BYTES per directory)."""
+    path = os.path.join(directory, f"{content_hash(data, kind='columnar')}.arrow")
+    if os.path.exists(path):
+        _touch(path)
+    else:
+        convert_csv(data, path)
+        evict(directory, keep=[path])
+    return MappedTable(path)
+
+
+# ---------- Statistics over batches ----------
+class MappedWork:
+    """The analysed columns of a mapped upload: its items, the composites written next to
+    it and, with listwise deletion, the mask of complete rows."""
+
+    def __init__(self, source: MappedTable, derived: Optional[MappedTable], listwise: bool):
+        self.source = source
+        self.derived = derived
+        self.listwise = listwise
+
+    def values(self, col: str) -> Iterator[np.ndarray]:
+        if self.derived is not None and col in self.derived.columns:
+            yield from self.derived.values(col)
+        elif self.listwise:
+            for v, ok in zip(self.source.values(col), self.derived.values(_COMPLETE)):
+                yield np.where(ok > 0, v, np.nan)
+        else:
+            yield from self.source.values(col)
+
+
+def column_stats(source: MappedTable, items: List[str], composites: Optional[Dict[str, List[str]]] = None,
+                 listwise: bool = False, directory: Optional[str] = None) -> Tuple[Dict[str, RunningStats], MappedWork]:
+    """One pass over the mapped columns, as survey_streaming.stream_csv over the CSV:
+    RunningStats for `items` and the summed `composites` (missing when any item is),
+    and the MappedWork the other statistics read. With `listwise`, rows missing any of
+    the read columns are left out of everything."""
+    composites = composites or {}
+    needed = list(dict.fromkeys(list(items) + [c for cols in composites.values() for c in cols]))
+    acc = {c: RunningStats() for c in list(items) + list(composites)}
+    fields = [(name, pa.float64()) for name in composites] + ([(_COMPLETE, pa.uint8())] if listwise else [])
+    schema = pa.schema(fields)
+    path = None
+    if fields:
+        spec = content_hash(source.key.encode(), composites=sorted(composites.items()), listwise=listwise,
+                            needed=needed if listwise else None)
+        path = os.path.join(directory or os.path.dirname(source.path), f"{spec}.work.arrow")
+
+    def batches():
+        for arrays in zip(*(source.values(c) for c in needed)):
+            v = dict(zip(needed, arrays))
+            ok = None
+            if listwise:
+                ok = np.ones(len(arrays[0]), dtype=bool)
+                for a in arrays:
+                    ok &= ~np.isnan(a)
+            for c in items:
+                acc[c].update(v[c] if ok is None else v[c][ok])
+            out = []
+            for name, cols in composites.items():
+                total = v[cols[0]].copy()
+                for c in cols[1:]:
+                    total += v[c]
+                if ok is not None:
+                    total[~ok] = np.nan
+                acc[name].update(total if ok is None else total[ok])
+                out.append(pa.array(total))
+            if ok is not None:
+                out.append(pa.array(ok.astype(np.uint8)))
+            yield pa.RecordBatch.from_arrays(out, schema=schema)
+
+    if path is None:
+        for _ in batches():
+            pass
+        return acc, MappedWork(source, None, False)
+    if os.path.exists(path):
+        # written by an earlier run: only the accumulators are rebuilt
+        for _ in batches():
+            pass
+        _touch(path)
+    else:
+        _write_batches(batches(), schema, path)
+        evict(os.path.dirname(path), keep=[path, source.path])
+    return acc, MappedWork(source, MappedTable(path), listwise)
+
+
+def _pick(vals: np.ndarray, j: int, fill: Optional[float], n_fill: int) -> float:
+    # the j-th of the sorted `vals` merged with n_fill copies of `fill`
+    if n_fill:
+        below = int(np.searchsorted(vals, fill, side="left"))
+        if below <= j < below + n_fill:
+            return float(fill)
+        if j >= below + n_fill:
+            j -= n_fill
+    return float(vals[j])
+
+
+def _bin_index(edges: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # bin j holds edges[j] <= v < edges[j + 1]; the last bin also holds the upper edge
+    return np.minimum(np.searchsorted(edges, v, side="right") - 1, HIST_BINS - 1)
+
+
+def select_ranks(values: Callable[[], Iterator[np.ndarray]], ranks: Sequence[int], lo: float, hi: float,
+                 fill: Optional[float] = None, n_fill: int = 0) -> Dict[int, float]:
+    """Values at the 0-based positions `ranks` of the sorted non-missing values that
+    values() yields batch by batch, plus n_fill copies of `fill`; all lie in [lo, hi].
+
+    Each pass counts the values of a window in HIST_BINS bins; a rank's bin is sorted
+    once it holds at most GATHER_MAX values, else it becomes the next window. A window
+    holding a single distinct value (ties) answers its ranks directly.
+    """
+    out = {}
+    todo = [(sorted(set(ranks)), lo, hi, 0)]
+    while todo:
+        rs, a, b, below = todo.pop()
+        edges = np.linspace(a, b, HIST_BINS + 1)
+        hist = np.zeros(HIST_BINS, dtype=np.int64)
+        vmin, vmax = np.inf, -np.inf
+        for v in values():
+            w = v[(v >= a) & (v <= b)]
+            if w.size:
+                vmin, vmax = min(vmin, w.min()), max(vmax, w.max())
+                hist += np.bincount(_bin_index(edges, w), minlength=HIST_BINS)
+        m = n_fill if n_fill and a <= fill <= b else 0
+        if m:
+            vmin, vmax = min(vmin, fill), max(vmax, fill)
+            hist[_bin_index(edges, np.array([fill]))[0]] += m
+        if vmin == vmax:
+            out.update((r, float(vmin)) for r in rs)
+            continue
+        cum = below + np.cumsum(hist)
+        groups: Dict[int, List[int]] = {}
+        for r in rs:
+            groups.setdefault(int(np.searchsorted(cum, r, side="right")), []).append(r)
+        gather = {}
+        for j, rj in groups.items():
+            start = int(cum[j] - hist[j])
+            if hist[j] <= GATHER_MAX:
+                gather[j] = (rj, start)
+            else:
+                top = b if j == HIST_BINS - 1 else np.nextafter(edges[j + 1], -np.inf)
+                todo.append((rj, edges[j], top, start))
+        if not gather:
+            continue
+        parts = {j: [] for j in gather}
+        for v in values():
+            w = v[(v >= a) & (v <= b)]
+            idx = _bin_index(edges, w)
+            for j in parts:
+                parts[j].append(w[idx == j])
+        fill_bin = _bin_index(edges, np.array([fill]))[0] if m else None
+        for j, (rj, start) in gather.items():
+            vals = np.sort(np.concatenate(parts[j]))
+            for r in rj:
+                out[r] = _pick(vals, r - start, fill, m if j == fill_bin else 0)
+    return out
+
+
+def select_quantiles(values: Callable[[], Iterator[np.ndarray]], qs: Sequence[float], n: int, lo: float, hi: float,
+                     fill: Optional[float] = None, n_fill: int = 0) -> List[float]:
+    """Exact quantiles (linear interpolation, as pandas) of the n values counted by
+    select_ranks (n includes the n_fill copies of `fill`)."""
+    if n == 0:
+        return [np.nan] * len(qs)
+    hs = [(n - 1) * q for q in qs]
+    got = select_ranks(values, [int(np.floor(h)) for h in hs] + [int(np.ceil(h)) for h in hs], lo, hi, fill, n_fill)
+    return [got[int(np.floor(h))] + (got[int(np.ceil(h))] - got[int(np.floor(h))]) * (h - np.floor(h)) for h in hs]
+
+
+def mapped_missing(acc: Dict[str, RunningStats], work: MappedWork,
+                   handling: str) -> Tuple[Dict[str, RunningStats], Dict[str, Optional[float]]]:
+    """survey_streaming.apply_missing for mapped columns (handling as survey_missing),
+    plus the value each column's missing answers stand for (None: left out). Columns
+    without exact value counts get exact quartiles and median from their mapped values."""
+    out, fills = {}, {}
+    for c, a in acc.items():
+        values = lambda c=c: work.values(c)
+        fill = None
+        if handling == "zero":
+            fill = 0.0
+        elif handling == "mean":
+            fill = a.mean if a.count else np.nan
+        elif handling == "median":
+            fill = a.median if a.exact else select_quantiles(values, [0.5], a.count, a.min, a.max)[0]
+        # a copy either way: the pinned quantiles must not reach the shared accumulators
+        b = a.with_fill(fill) if fill is not None else copy.copy(a)
+        n_fill = b.count - a.count
+        if b.count and not b.exact:
+            b.pinned = dict(zip(BOX_QUANTILES, select_quantiles(values, BOX_QUANTILES, b.count, b.min, b.max,
+                                                                fill, n_fill)))
+        out[c] = b
+        fills[c] = fill if n_fill else None
+    return out, fills
+
+
+# ---------- X_total / Y_total ----------
+def _merge_counts(u: np.ndarray, c: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    bu, bc = np.unique(v, return_counts=True)
+    allu, inv = np.unique(np.concatenate([u, bu]), return_inverse=True)
+    return allu, np.bincount(inv, weights=np.concatenate([c, bc])).astype(np.int64)
+
+
+class MappedPair:
+    """X_total / Y_total of a MappedWork on the rows where both are present, missing
+    totals first replaced by `fills` (see mapped_missing). One pass at construction
+    gathers the co-moments and ranges; every method below is one or two more passes."""
+
+    def __init__(self, work: MappedWork, fills: Optional[Dict[str, Optional[float]]] = None,
+                 x: str = "X_total", y: str = "Y_total"):
+        self.work = work
+        self.fills = fills or {}
+        self.x, self.y = x, y
+        self.stats = PairStats()
+        self.lo = {x: np.inf, y: np.inf}
+        self.hi = {x: -np.inf, y: -np.inf}
+        self.integer = {x: True, y: True}
+        self._distinct = {}
+        for xv, yv in self.batches():
+            self.stats.update(xv, yv)
+            for name, v in ((x, xv), (y, yv)):
+                if v.size:
+                    self.lo[name] = min(self.lo[name], float(v.min()))
+                    self.hi[name] = max(self.hi[name], float(v.max()))
+                    self.integer[name] = self.integer[name] and np.array_equal(v, np.floor(v))
+
+    def __len__(self) -> int:
+        return self.stats.n
+
+    def batches(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(x, y) per batch, filled, rows missing either left out."""
+        fx, fy = self.fills.get(self.x), self.fills.get(self.y)
+        for xv, yv in zip(self.work.values(self.x), self.work.values(self.y)):
+            if fx is not None:
+                xv = np.where(np.isnan(xv), fx, xv)
+            if fy is not None:
+                yv = np.where(np.isnan(yv), fy, yv)
+            ok = ~np.isnan(xv) & ~np.isnan(yv)
+            yield (xv, yv) if ok.all() else (xv[ok], yv[ok])
+
+    def column(self, name: str) -> Callable[[], Iterator[np.ndarray]]:
+        i = 0 if name == self.x else 1
+        return lambda: (pair[i] for pair in self.batches())
+
+    def frame(self) -> pd.DataFrame:
+        """The pair as an in-memory frame (callers keep this to small pairs)."""
+        parts = list(self.batches())
+        return pd.DataFrame({self.x: np.concatenate([p[0] for p in parts]) if parts else np.empty(0),
+                             self.y: np.concatenate([p[1] for p in parts]) if parts else np.empty(0)})
+
+    def distinct(self, name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Sorted distinct values of `name` and their counts; None beyond DISTINCT_MAX."""
+        if name not in self._distinct:
+            u, c = np.empty(0), np.empty(0, dtype=np.int64)
+            for v in self.column(name)():
+                u, c = _merge_counts(u, c, v)
+                if u.size > DISTINCT_MAX:
+                    u = None
+                    break
+            self._distinct[name] = None if u is None else (u, c)
+        return self._distinct[name]
+
+    def quantiles(self, name: str, qs: Sequence[float]) -> List[float]:
+        n = len(self)
+        dist = self.distinct(name)
+        if dist is None:
+            return select_quantiles(self.column(name), qs, n, self.lo[name], self.hi[name])
+        u, c = dist
+        cum = np.cumsum(c)
+        at = lambda r: float(u[np.searchsorted(cum, r, side="right")])
+        hs = [(n - 1) * q for q in qs]
+        return [at(int(np.floor(h))) + (at(int(np.ceil(h))) - at(int(np.floor(h)))) * (h - np.floor(h)) for h in hs]
+
+    # ----- correlation -----
+    def correlation(self, method: str) -> Tuple[float, float]:
+        """(r, two-sided p) for "pearson" or "spearman" (mid-ranks, as scipy's spearmanr)."""
+        if method == "pearson":
+            return self.stats.r, self.stats.pvalue
+        ranks = []
+        for name in (self.x, self.y):
+            dist = self.distinct(name)
+            if dist is None:
+                raise ValueError(f"Spearman out of core needs at most {DISTINCT_MAX:,} distinct values of {name}")
+            u, c = dist
+            ranks.append((u, np.cumsum(c) - (c - 1) / 2.0))
+        rs = PairStats()
+        (ux, rx), (uy, ry) = ranks
+        for xv, yv in self.batches():
+            rs.update(rx[np.searchsorted(ux, xv)], ry[np.searchsorted(uy, yv)])
+        return rs.r, float(corr_pvalues(np.array([rs.r]), np.array([rs.n]))[0])
+
+    def line(self) -> Tuple[float, float, np.ndarray]:
+        """Least-squares slope and intercept of y on x, and the x range to draw it over."""
+        slope, intercept = self.stats.line()
+        return slope, intercept, np.array([self.lo[self.x], self.hi[self.x]])
+
+    # ----- normality -----
+    def normality(self, seed: int = 0) -> Tuple[Optional[dict], Optional[dict]]:
+        """survey_normality.assess of both totals: on the values themselves up to
+        SUBSAMPLE_MAX_N pairs, beyond that from moment sums over the batches."""
+        n = len(self)
+        if n < 3:
+            return None, None
+        if n <= SUBSAMPLE_MAX_N:
+            pair = self.frame()
+            return assess(pair[self.x], seed), assess(pair[self.y], seed)
+        t0 = time.perf_counter()
+        means = np.array([self.stats.mean_x, self.stats.mean_y])
+        sums = np.zeros((3, 2))
+        for xv, yv in self.batches():
+            for i, v in enumerate((xv, yv)):
+                d = v - means[i]
+                d2 = d * d
+                sums[:, i] += (d2.sum(), (d2 * d).sum(), (d2 * d2).sum())
+        out = []
+        for i in range(2):
+            m2, m3, m4 = sums[:, i] / n
+            skew, kurt = (np.nan, np.nan) if m2 == 0 else (m3 / m2 ** 1.5, m4 / (m2 * m2) - 3.0)
+            res = {"n": n, "skew": float(skew), "excess_kurtosis": float(kurt), **moment_verdict(n, skew, kurt)}
+            res["label"] = TEST_LABELS[res["test"]]
+            res["seconds"] = time.perf_counter() - t0
+            out.append(res)
+        return out[0], out[1]
+
+    # ----- chi-square -----
+    def bins(self, name: str, nbins: int, binning: str = "Quantiles") -> Tuple[np.ndarray, List[str], bool]:
+        """The edges and labels pd.qcut / pd.cut (survey_contingency.bin_codes) would give
+        `name`, and whether the lowest edge belongs to the first bin."""
+        if binning not in BINNINGS:
+            raise ValueError(f"unknown binning {binning!r}")
+        if binning == "Quantiles":
+            edges = np.unique(self.quantiles(name, np.linspace(0, 1, nbins + 1)))
+            lowest = True
+        else:
+            edges = pd.cut(np.array([self.lo[name], self.hi[name]]), nbins, retbins=True, duplicates="drop")[1]
+            lowest = False
+        labels = pd.cut(np.empty(0), edges, include_lowest=lowest).categories
+        return edges, [str(c) for c in labels], lowest
+
+    @staticmethod
+    def bin_codes(v: np.ndarray, edges: np.ndarray, lowest: bool) -> np.ndarray:
+        # right-closed bins (edges[j], edges[j + 1]], as pd.cut; -1 outside every bin
+        codes = np.searchsorted(edges, v, side="left") - 1
+        if lowest:
+            codes[v == edges[0]] = 0
+        codes[(codes >= len(edges) - 1) | np.isnan(v)] = -1
+        return codes.astype(np.intp)
+
+    def crosstab(self, nbins: int, binning: str = "Quantiles") -> Tuple[np.ndarray, List[str], List[str]]:
+        """Counts of binned X_total (rows) against binned Y_total, with both bin labels."""
+        (xe, xl, xlow), (ye, yl, ylow) = self.bins(self.x, nbins, binning), self.bins(self.y, nbins, binning)
+        counts = np.zeros((len(xl), len(yl)), dtype=np.int64)
+        for xv, yv in self.batches():
+            counts += crosstabs(self.bin_codes(xv, xe, xlow), len(xl), [(self.bin_codes(yv, ye, ylow), len(yl))])[0]
+        return counts, xl, yl
+
+    def demographic_tables(self, source: MappedTable, columns: List[str], nbins: int = 3, binning: str = "Quantiles",
+                           keep_missing: bool = False) -> Dict[Tuple[str, str], pd.DataFrame]:
+        """Every demographic column of `source` against binned X_total and binned Y_total,
+        labelled as survey_contingency.chi_square_batch labels them (levels sorted where
+        possible, "(missing)" last)."""
+        bins = [self.bins(name, nbins, binning) for name in (self.x, self.y)]
+        index = {c: {} for c in columns}
+        counts = {c: [np.zeros((0, len(labels)), dtype=np.int64) for _, labels, _ in bins] for c in columns}
+        missing = object()
+        fx, fy = self.fills.get(self.x), self.fills.get(self.y)
+        streams = [self.work.values(self.x), self.work.values(self.y)] + [source.labels(c) for c in columns]
+        for xv, yv, *demo in zip(*streams):
+            if fx is not None:
+                xv = np.where(np.isnan(xv), fx, xv)
+            if fy is not None:
+                yv = np.where(np.isnan(yv), fy, yv)
+            ok = ~np.isnan(xv) & ~np.isnan(yv)
+            cols = [(self.bin_codes(v[ok], e, low), len(labels)) for v, (e, labels, low) in zip((xv, yv), bins)]
+            for c, s in zip(columns, demo):
+                codes, uniques = pd.factorize(s[ok])
+                seen = index[c]
+                ids = np.array([seen.setdefault(u, len(seen)) for u in uniques], dtype=np.intp)
+                g = ids[codes] if ids.size else np.zeros(codes.size, dtype=np.intp)
+                g[codes < 0] = -1
+                if keep_missing and (codes < 0).any():
+                    g[codes < 0] = seen.setdefault(missing, len(seen))
+                for k, table in enumerate(crosstabs(g, len(seen), cols)):
+                    acc = counts[c][k]
+                    if acc.shape[0] < len(seen):
+                        acc = np.vstack([acc, np.zeros((len(seen) - acc.shape[0], acc.shape[1]), dtype=np.int64)])
+                    acc += table
+                    counts[c][k] = acc
+        tables = {}
+        for c in columns:
+            keys = [k for k in index[c] if k is not missing]
+            try:
+                order = sorted(range(len(keys)), key=lambda i: keys[i])
+            except TypeError:
+                # mixed types cannot be sorted: first appearance, as level_codes
+                order = list(range(len(keys)))
+            rows = [index[c][keys[i]] for i in order] + ([index[c][missing]] if missing in index[c] else [])
+            levels = [_level_label(keys[i]) for i in order] + ([MISSING_LEVEL] if missing in index[c] else [])
+            for name, (_, labels, _), acc in zip((self.x, self.y), bins, counts[c]):
+                tables[(c, name)] = pd.DataFrame(acc[rows] if rows else np.zeros((0, len(labels)), dtype=np.int64),
+                                                 index=pd.Index(levels, name=c), columns=pd.Index(labels, name=name))
+        return tables
+
+    # ----- scatter -----
+    def density_grid(self, max_bins: int = 60) -> dict:
+        """survey_charts.density_grid of the pair, counted batch by batch."""
+        if len(self) == 0:
+            return {"counts": np.zeros((0, 0), dtype=np.intp), "xedges": np.zeros(1), "yedges": np.zeros(1), "n": 0}
+        counts = None
+        for xv, yv in self.batches():
+            xedges, ix = grid_cells(xv, self.lo[self.x], self.hi[self.x], max_bins, self.integer[self.x])
+            yedges, iy = grid_cells(yv, self.lo[self.y], self.hi[self.y], max_bins, self.integer[self.y])
+            ny = len(yedges) - 1
+            part = np.bincount(ix * ny + iy, minlength=(len(xedges) - 1) * ny)
+            counts = part if counts is None else counts + part
+        return {"counts": counts.reshape(-1, ny), "xedges": xedges, "yedges": yedges, "n": len(self)}
+
+
+def _level_label(u) -> str:
+    # numbers are stored as float64: 25.0 is labelled "25", as the compact integer column would be
+    if isinstance(u, float) and u.is_integer():
+        return str(int(u))
+    return str(u)
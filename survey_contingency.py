@@ -0,0 +1,136 @@
+# survey_contingency.py
+# Chi-square tests of independence on integer-coded categories. Every variable is
+# coded once into level codes (binned composites through pd.cut/pd.qcut codes, never
+# their interval labels as strings; demographics through pd.factorize), and all the
+# tables of one row variable come from a single np.bincount over combined codes
+# row * (sum of column levels) + offset + column, whatever the number of rows.
+# Each table then gets chi2_contingency and Cramér's V. When its expected counts are
+# too small for the chi-square approximation (Cochran: any below 1, or more than 20%
+# below 5) the p-value is Fisher's exact test for 2 x 2 tables and a Monte Carlo
+# estimate otherwise: random tables with the same margins (scipy's random_table, whose
+# cost does not depend on the number of rows), p = (1 + #{chi2* >= chi2}) / (1 + R).
+
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from survey_segments import level_codes
+
+MIN_EXPECTED = 5.0
+MAX_SMALL_SHARE = 0.2
+MONTE_CARLO_RESAMPLES = int(os.environ.get("SURVEY_CHI2_RESAMPLES", "10000"))
+BINNINGS = ("Quantiles", "Equal width")
+
+
+def bin_codes(v: pd.Series, nbins: int, binning: str = "Quantiles") -> Tuple[np.ndarray, List[str]]:
+    """Bin codes per row (-1 = missing) and the bin labels, as pd.qcut / pd.cut would bin."""
+    if binning not in BINNINGS:
+        raise ValueError(f"unknown binning {binning!r}")
+    cut = pd.qcut if binning == "Quantiles" else pd.cut
+    cat = cut(v, nbins, duplicates="drop")
+    # the codes of the Categorical; the labels are formatted once per bin, not per row
+    return np.asarray(cat.cat.codes, dtype=np.intp), [str(c) for c in cat.cat.categories]
+
+
+def crosstabs(row: np.ndarray, k_row: int, cols: Sequence[Tuple[np.ndarray, int]]) -> List[np.ndarray]:
+    """Counts of `row` (codes 0..k_row-1, -1 = missing) against each (codes, levels) of
+    `cols`, rows missing either code left out, from one bincount."""
+    sizes = [k for _, k in cols]
+    offsets = np.r_[0, np.cumsum(sizes)[:-1]].astype(np.intp)
+    width = int(sum(sizes))
+    combined = []
+    for (codes, _), off in zip(cols, offsets):
+        ok = (row >= 0) & (codes >= 0)
+        combined.append(row[ok] * width + off + codes[ok])
+    counts = np.bincount(np.concatenate(combined) if combined else np.empty(0, np.intp),
+                         minlength=k_row * width).reshape(k_row, width)
+    return [counts[:, off:off + k] for off, k in zip(offsets, sizes)]
+
+
+def _chi2_stats(tables: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Pearson chi-square of each table in a (R, r, c) stack against the same expected counts."""
+    return (((tables - expected) ** 2) / expected).sum(axis=(-2, -1))
+
+
+def monte_carlo_p(table: np.ndarray, n_resamples: int = MONTE_CARLO_RESAMPLES, seed: int = 0) -> float:
+    """Share of random tables with the margins of `table` at least as far from independence."""
+    rows, cols = table.sum(axis=1), table.sum(axis=0)
+    expected = np.outer(rows, cols) / table.sum()
+    observed = _chi2_stats(table, expected)
+    sims = stats.random_table(rows, cols, seed=seed).rvs(n_resamples)
+    # a relative tolerance so tables equal to the observed one count despite rounding
+    hits = int(np.sum(_chi2_stats(sims, expected) >= observed * (1 - 1e-9)))
+    return (1 + hits) / (1 + n_resamples)
+
+
+def test_table(table: np.ndarray, n_resamples: int = MONTE_CARLO_RESAMPLES, seed: int = 0) -> dict:
+    """Chi-square test, Cramér's V and the p-value method of one table of counts.
+
+    Levels without any count are dropped first; a table with fewer than two levels on
+    either side has no test (the result holds only n and an "error").
+    """
+    table = np.asarray(table)
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    n = int(table.sum())
+    out = {"n": n, "shape": tuple(table.shape)}
+    if min(table.shape) < 2:
+        out["error"] = "needs at least two non-empty levels on each side"
+        return out
+    chi2, p_val, dof, expected = stats.chi2_contingency(table)
+    # V from the uncorrected statistic (Yates only applies to the 2 x 2 p-value)
+    plain = float(_chi2_stats(table, expected))
+    out.update(chi2=float(chi2), dof=int(dof), p_asymptotic=float(p_val), p_val=float(p_val),
+               p_method="asymptotic", min_expected=float(expected.min()),
+               cramers_v=float(np.sqrt(plain / (n * (min(table.shape) - 1)))))
+    small = expected < MIN_EXPECTED
+    if expected.min() < 1 or small.mean() > MAX_SMALL_SHARE:
+        if table.shape == (2, 2):
+            out.update(p_val=float(stats.fisher_exact(table)[1]), p_method="exact")
+        else:
+            out.update(p_val=monte_carlo_p(table, n_resamples, seed), p_method="monte carlo",
+                       n_resamples=n_resamples)
+    return out
+
+
+class ChiSquareBatch:
+    """Chi-square tests of several row variables against several binned columns.
+
+    summary: one row per (row variable, column) — n, levels, chi2, dof, p, the p-value
+             method, Cramér's V and the smallest expected count
+    tables:  the labelled contingency table of every pair, keyed (row, column)
+    """
+
+    def __init__(self, summary: pd.DataFrame, tables: Dict[Tuple[str, str], pd.DataFrame]):
+        self.summary = summary
+        self.tables = tables
+
+
+def chi_square_tables(tables: Dict[Tuple[str, str], pd.DataFrame], n_resamples: int = MONTE_CARLO_RESAMPLES,
+                      seed: int = 0) -> ChiSquareBatch:
+    """Test every labelled table of counts (keyed (row variable, column))."""
+    records = []
+    for (name, col), table in tables.items():
+        res = test_table(table.to_numpy(), n_resamples, seed)
+        records.append({"row": name, "col": col, "levels": res["shape"][0], "bins": res["shape"][1],
+                        **{k: v for k, v in res.items() if k != "shape"}})
+    summary = pd.DataFrame(records, columns=["row", "col", "n", "levels", "bins", "chi2", "dof", "p_val",
+                                             "p_method", "p_asymptotic", "cramers_v", "min_expected", "error"])
+    return ChiSquareBatch(summary, tables)
+
+
+def chi_square_batch(rows: Dict[str, pd.Series], cols: Dict[str, Tuple[np.ndarray, List[str]]],
+                     keep_missing: bool = False, n_resamples: int = MONTE_CARLO_RESAMPLES,
+                     seed: int = 0) -> ChiSquareBatch:
+    """Every series of `rows` (categories; coded here) against every coded column of
+    `cols` (bin codes and labels, e.g. from bin_codes), on the same rows."""
+    tables = {}
+    col_codes = [(codes, len(labels)) for codes, labels in cols.values()]
+    for name, s in rows.items():
+        codes, levels = level_codes(s, keep_missing)
+        for (col, (_, labels)), counts in zip(cols.items(), crosstabs(codes, len(levels), col_codes)):
+            tables[(name, col)] = pd.DataFrame(counts, index=pd.Index(levels, name=name),
+                                               columns=pd.Index(labels, name=col))
+    return chi_square_tables(tables, n_resamples, seed)
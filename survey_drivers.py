@@ -0,0 +1,222 @@
+# survey_drivers.py
+# Driver analysis: OLS of Y_total (or each Y item) on the X items, overall and per
+# segment of a demographic column. One pass over the rows accumulates, per level, the
+# row count, column sums and Gram matrix Z'Z of every candidate column; every model is
+# then a slice of those cross-products. All targets and all segments are solved at once
+# with a batched pseudo-inverse of the stacked X'X blocks (least squares, minimum norm
+# when items are collinear), so picking other predictors, targets or segments refits
+# without touching the rows, and new rows are folded in with `update` / `merge`.
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from survey_assoc import CHUNK_ROWS
+from survey_segments import level_codes
+
+OVERALL = "(all)"
+# VIF above this is usually read as a predictor that the others nearly explain
+VIF_WARN = 10.0
+
+
+class CrossProducts:
+    """Mergeable per-level sufficient statistics of the OLS models over `names`.
+
+    Slot 0 holds rows without a level (they count towards the overall model only),
+    slot i + 1 the rows of levels[i]. Rows missing any of the columns are skipped, so
+    every model is fitted on the same complete rows. Sums are taken about a fixed
+    `shift` (the first batch's column means) to keep the Gram matrices well conditioned.
+    """
+
+    def __init__(self, names: Sequence[str], column: Optional[str] = None):
+        self.names = list(names)
+        self.column = column
+        self.levels: List[str] = []
+        self._slot = {}
+        m = len(self.names)
+        self.shift: Optional[np.ndarray] = None
+        self.n = np.zeros(1)
+        self.sums = np.zeros((1, m))
+        self.gram = np.zeros((1, m, m))
+        self.n_skipped = 0
+
+    def _grow(self, labels: List[str]) -> None:
+        new = [lv for lv in labels if lv not in self._slot]
+        if not new:
+            return
+        m = len(self.names)
+        for lv in new:
+            self._slot[lv] = len(self.levels) + 1
+            self.levels.append(lv)
+        k = len(new)
+        self.n = np.concatenate([self.n, np.zeros(k)])
+        self.sums = np.concatenate([self.sums, np.zeros((k, m))])
+        self.gram = np.concatenate([self.gram, np.zeros((k, m, m))])
+
+    def update(self, M: np.ndarray, labels=None, keep_missing: bool = False) -> "CrossProducts":
+        """Fold in rows of M (columns in `names` order) with their level labels (None = no
+        segments); `keep_missing` makes blank labels a MISSING_LEVEL segment of their own."""
+        M = np.asarray(M, dtype=float)
+        ok = ~np.isnan(M).any(axis=1)
+        self.n_skipped += int(M.shape[0] - ok.sum())
+        if not ok.any():
+            return self
+        if self.shift is None:
+            self.shift = M[ok].mean(axis=0)
+        slots = np.zeros(M.shape[0], dtype=np.intp)
+        if labels is not None:
+            codes, names = level_codes(pd.Series(labels), keep_missing)
+            self._grow(names)
+            lookup = np.array([0] + [self._slot[lv] for lv in names], dtype=np.intp)
+            slots = lookup[codes + 1]
+        rows = np.flatnonzero(ok)
+        k = self.n.size
+        for start in range(0, rows.size, CHUNK_ROWS):
+            idx = rows[start:start + CHUNK_ROWS]
+            Z = M[idx] - self.shift
+            g = slots[idx]
+            counts = np.bincount(g, minlength=k)
+            order = np.argsort(g, kind="stable")
+            bounds = np.r_[0, np.cumsum(counts)]
+            # rows of one level are contiguous after the sort: one Z'Z product per level present
+            for s in np.flatnonzero(counts):
+                Zs = Z[order[bounds[s]:bounds[s + 1]]]
+                self.gram[s] += Zs.T @ Zs
+                self.sums[s] += Zs.sum(axis=0)
+            self.n += counts
+        return self
+
+    def merge(self, other: "CrossProducts") -> "CrossProducts":
+        """Fold another accumulator over the same columns in (its sums are moved to our shift)."""
+        if other.names != self.names:
+            raise ValueError("cross-products over different columns cannot be merged")
+        self.n_skipped += other.n_skipped
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        self._grow(other.levels)
+        slots = np.array([0] + [self._slot[lv] for lv in other.levels], dtype=np.intp)
+        d = other.shift - self.shift
+        n = other.n[:, None]
+        sums = other.sums + n * d
+        # sum (z' + d)(z' + d)^T = G' + S' d^T + d S'^T + n d d^T
+        gram = (other.gram + other.sums[:, :, None] * d[None, None, :] + d[None, :, None] * other.sums[:, None, :]
+                + n[:, :, None] * np.outer(d, d)[None])
+        np.add.at(self.n, slots, other.n)
+        np.add.at(self.sums, slots, sums)
+        np.add.at(self.gram, slots, gram)
+        return self
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.n.sum())
+
+    def fit(self, predictors: Sequence[str], targets: Sequence[str],
+            segments: Optional[Sequence[str]] = None) -> "DriverTable":
+        """OLS of every target on `predictors`, overall and per level (all levels, or `segments`)."""
+        pos = {c: j for j, c in enumerate(self.names)}
+        P = np.array([pos[c] for c in predictors], dtype=np.intp)
+        T = np.array([pos[c] for c in targets], dtype=np.intp)
+        levels = list(self.levels if segments is None else segments)
+        slots = [self._slot[lv] for lv in levels]
+        # stacked models: overall (every slot) then one per level
+        n = np.r_[self.n.sum(), self.n[slots]]
+        S = np.concatenate([self.sums.sum(axis=0)[None], self.sums[slots]])
+        G = np.concatenate([self.gram.sum(axis=0)[None], self.gram[slots]])
+        shift = self.shift if self.shift is not None else np.zeros(len(self.names))
+        return DriverTable(list(predictors), list(targets), [OVERALL] + levels, self.column,
+                           *_solve(n, S, G, P, T, shift))
+
+
+def _solve(n: np.ndarray, S: np.ndarray, G: np.ndarray, P: np.ndarray, T: np.ndarray, shift: np.ndarray):
+    """Batched OLS from stacked cross-products: n (L,), S (L, m), G (L, m, m)."""
+    p = P.size
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = S / n[:, None]
+        # centered sums of squares and cross-products
+        C = G - S[:, :, None] * mean[:, None, :]
+        Cxx = C[:, P][:, :, P]
+        Cxy = C[:, P][:, :, T]
+        Cyy = C[:, T, T]
+        usable = (n > p + 1) & np.isfinite(Cxx).all(axis=(1, 2))
+        inv = np.full(Cxx.shape, np.nan)
+        rank = np.zeros(n.size, dtype=np.intp)
+        if usable.any():
+            inv[usable] = np.linalg.pinv(Cxx[usable], hermitian=True)
+            rank[usable] = np.linalg.matrix_rank(Cxx[usable], hermitian=True)
+        B = inv @ Cxy
+        sse = np.maximum(Cyy - (Cxy * B).sum(axis=1), 0.0)
+        dof = n - p - 1
+        sigma2 = sse / dof[:, None]
+        d = np.diagonal(inv, axis1=1, axis2=2)
+        cxx = np.diagonal(Cxx, axis1=1, axis2=2)
+        se = np.sqrt(d[:, :, None] * sigma2[:, None, :])
+        # collinear predictors: coefficients are the minimum-norm solution, their SEs and VIFs undefined
+        singular = usable & (rank < p)
+        se[singular] = np.nan
+        beta = B * np.sqrt(cxx)[:, :, None] / np.sqrt(Cyy)[:, None, :]
+        t = B / se
+        pval = 2.0 * stats.t.sf(np.abs(t), dof[:, None, None])
+        r2 = 1.0 - sse / Cyy
+        adj = 1.0 - (1.0 - r2) * (n - 1)[:, None] / dof[:, None]
+        F = (r2 / p) / ((1.0 - r2) / dof[:, None])
+        p_f = stats.f.sf(F, p, dof[:, None])
+        vif = d * cxx
+        intercept = (mean[:, T] + shift[T]) - ((mean[:, P] + shift[P])[:, :, None] * B).sum(axis=1)
+    vif[singular] = np.inf
+    return n, B, se, beta, t, pval, intercept, r2, adj, F, p_f, vif, usable & ~singular
+
+
+class DriverTable:
+    """Driver models of several targets over several segments.
+
+    coefficients: one row per segment x target x predictor — b, SE, standardized beta, t, p, VIF
+    models:       one row per segment x target — n, intercept, R², adjusted R², F and its p-value
+    vif:          segments x predictors (the same for every target)
+    """
+
+    def __init__(self, predictors: List[str], targets: List[str], segments: List[str], column: Optional[str],
+                 n, B, se, beta, t, pval, intercept, r2, adj, F, p_f, vif, full_rank):
+        self.predictors = predictors
+        self.targets = targets
+        self.segments = segments
+        self.column = column
+        L, p, q = B.shape
+        seg = np.repeat(np.array(segments, dtype=object), p * q)
+        tgt = np.tile(np.repeat(np.array(targets, dtype=object), p), L)
+        prd = np.tile(np.array(predictors, dtype=object), L * q)
+
+        def flat(a):
+            # (L, p, q) -> segment, target, predictor order
+            return np.transpose(a, (0, 2, 1)).ravel()
+
+        self.coefficients = pd.DataFrame({
+            "segment": seg, "target": tgt, "predictor": prd, "b": flat(B), "se": flat(se),
+            "beta": flat(beta), "t": flat(t), "p": flat(pval),
+            "vif": flat(np.broadcast_to(vif[:, :, None], B.shape))})
+        self.models = pd.DataFrame({
+            "segment": np.repeat(np.array(segments, dtype=object), q),
+            "target": np.tile(np.array(targets, dtype=object), L),
+            "n": np.repeat(n.astype(np.int64), q), "intercept": intercept.ravel(), "r2": r2.ravel(),
+            "adj_r2": adj.ravel(), "F": F.ravel(), "p": p_f.ravel(),
+            "full_rank": np.repeat(full_rank, q)})
+        self.vif = pd.DataFrame(vif, index=pd.Index(segments, name=column or "segment"), columns=predictors)
+
+    def betas(self, target: str, value: str = "beta") -> pd.DataFrame:
+        """Predictors x segments of one target (standardized betas by default)."""
+        sub = self.coefficients[self.coefficients["target"] == target]
+        return sub.pivot(index="predictor", columns="segment", values=value).loc[self.predictors, self.segments]
+
+    def ranking(self, target: str, segment: str = OVERALL) -> pd.DataFrame:
+        """Predictors of one model ordered by |standardized beta| (the usual driver chart)."""
+        c = self.coefficients
+        sub = c[(c["target"] == target) & (c["segment"] == segment)].set_index("predictor")
+        return sub.drop(columns=["segment", "target"]).reindex(sub["beta"].abs().sort_values(ascending=False).index)
+
+    def export_table(self) -> pd.DataFrame:
+        """Coefficients with their model's n and R² on every row (the CSV export)."""
+        return self.coefficients.merge(self.models[["segment", "target", "n", "r2", "adj_r2"]],
+                                       on=["segment", "target"], how="left")
@@ -0,0 +1,67 @@
+# survey_dtypes.py
+# Compact column types for survey frames. CSV/XLSX parsing gives float64 for every
+# Likert column (as soon as one answer is blank) and object for text, so a 1-5 answer
+# costs 8 bytes and every "Male"/"Female" a full Python string. After parsing:
+#   integer-valued numeric columns -> the smallest nullable integer (Int8 for Likert)
+#   low-cardinality text columns   -> category (demographics)
+#   anything else                  -> unchanged (fractional floats are never narrowed)
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# text columns become categorical when distinct values are at most this share of rows
+CATEGORY_MAX_RATIO = 0.5
+
+_INT_TYPES = [(np.int8, pd.Int8Dtype()), (np.int16, pd.Int16Dtype()),
+              (np.int32, pd.Int32Dtype()), (np.int64, pd.Int64Dtype())]
+
+
+def int_dtype_for(lo: float, hi: float) -> Optional[pd.api.extensions.ExtensionDtype]:
+    """Smallest nullable integer dtype holding [lo, hi], or None if none does."""
+    for np_type, dtype in _INT_TYPES:
+        info = np.iinfo(np_type)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return None
+
+
+def compact_series(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        v = s.to_numpy(dtype=float, na_value=np.nan)
+        missing = np.isnan(v)
+        valid = v[~missing]
+        if valid.size == 0 or not np.all(valid == np.floor(valid)):
+            return s
+        dtype = int_dtype_for(valid.min(), valid.max())
+        if dtype is None:
+            return s
+        # built from the float values directly (Series.astype re-checks every value)
+        values = np.where(missing, 0, v).astype(dtype.numpy_dtype)
+        return pd.Series(pd.arrays.IntegerArray(values, missing), index=s.index, name=s.name)
+    if pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype):
+        try:
+            codes, uniques = pd.factorize(s, sort=True)
+        except TypeError:
+            # mixed types (numbers and text in one column) cannot be sorted
+            codes, uniques = pd.factorize(s)
+        if len(s) and len(uniques) <= CATEGORY_MAX_RATIO * len(s):
+            return pd.Series(pd.Categorical.from_codes(codes, uniques), index=s.index, name=s.name)
+    return s
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Column-by-column compact copy of `df`; df.attrs["memory"] records the sizes
+    as parsed and after compaction (bytes), and survives the Parquet round trip."""
+    before = frame_nbytes(df)
+    out = pd.DataFrame({c: compact_series(df[c]) for c in df.columns}, index=df.index)
+    out.columns = df.columns
+    out.attrs["memory"] = {"parsed_bytes": before, "compact_bytes": frame_nbytes(out)}
+    return out
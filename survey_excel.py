@@ -0,0 +1,160 @@
+# survey_excel.py
+# Column-selective Excel ingestion. pd.read_excel turns every cell of the first sheet
+# into a Python object before the analysis looks at a single column; here:
+#   peek_xlsx          sheet list plus the header and first rows (openpyxl read-only)
+#   read_xlsx_columns  one streaming pass over the chosen sheet keeping only the
+#                      requested columns, each converted to a typed array and compacted
+#   load_xlsx_columns  the above behind a cache: the columns read so far are kept per
+#                      (workbook content, sheet) in memory and, given a directory, as a
+#                      Parquet file, so reruns read the columnar copy and adding a column to the
+#                      selection only streams the workbook for the new column.
+# Headers follow pd.read_excel: a blank header becomes "Unnamed: <i>", repeats get ".1",
+# ".2", ...
+
+import io
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from survey_cache import LRUCache
+from survey_dtypes import compact_series, frame_nbytes
+from survey_ingest import content_hash, write_parquet
+
+
+def _open(data: bytes):
+    import openpyxl
+    # read-only: rows are parsed while iterating, never held as Cell objects
+    return openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+
+
+def header_names(header) -> List:
+    names, seen = [], {}
+    for i, v in enumerate(header):
+        name = f"Unnamed: {i}" if v is None else v
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def parsed_column(values: list) -> pd.Series:
+    """Cell values as pd.read_excel would type them: float64 (blanks NaN) when every value
+    is a number, else pandas' inference (text, dates, mixed)."""
+    if not any(isinstance(v, str) for v in values):
+        try:
+            return pd.Series(np.array(values, dtype=float))
+        except (TypeError, ValueError):
+            pass
+    return pd.Series(values)
+
+
+def typed_column(values: list) -> pd.Series:
+    """Cell values as one column of the compact dtype."""
+    return compact_series(parsed_column(values))
+
+
+def _picked_rows(ws, pos: List[int], max_row: Optional[int] = None) -> List[tuple]:
+    """Values at positions `pos` of every data row (below the header), up to the last row
+    holding any value at all; like pd.read_excel, empty rows at the end are dropped."""
+    width = max(pos) + 1 if pos else 0
+    rows, last = [], 0
+    for r in ws.iter_rows(min_row=2, max_row=max_row, values_only=True):
+        n = len(r)
+        if n < width:
+            r = r + (None,) * (width - n)
+        rows.append(tuple(r[j] for j in pos))
+        if r.count(None) != len(r):
+            last = len(rows)
+    return rows[:last]
+
+
+def peek_xlsx(data: bytes, sheet: Optional[str] = None, nrows: int = 1000) -> Tuple[List[str], pd.DataFrame]:
+    """(sheet names, header plus the first `nrows` rows of `sheet`, default the first)."""
+    wb = _open(data)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        names = header_names(next(ws.iter_rows(max_row=1, values_only=True), ()))
+        body = _picked_rows(ws, list(range(len(names))), max_row=nrows + 1)
+        # like pd.read_excel, trailing columns with neither a header nor values are dropped
+        width = len(names)
+        while width and names[width - 1] == f"Unnamed: {width - 1}" and all(r[width - 1] is None for r in body):
+            width -= 1
+        names = names[:width]
+        df = pd.DataFrame({name: typed_column([r[j] for r in body]) for j, name in enumerate(names)})
+        df.columns = names
+        return wb.sheetnames, df
+    finally:
+        wb.close()
+
+
+def read_xlsx_columns(data: bytes, sheet: Optional[str], columns: List) -> pd.DataFrame:
+    """The requested columns of `sheet`, read in one pass without the other columns' values."""
+    wb = _open(data)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        names = header_names(next(ws.iter_rows(max_row=1, values_only=True), ()))
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise KeyError(f"columns not in sheet {ws.title!r}: {missing}")
+        rows = _picked_rows(ws, [names.index(c) for c in columns])
+    finally:
+        wb.close()
+    data, parsed = {}, {}
+    for k, c in enumerate(columns):
+        s = parsed_column([r[k] for r in rows])
+        parsed[c] = int(s.memory_usage(deep=True, index=False))
+        data[c] = compact_series(s)
+    df = pd.DataFrame(data)
+    df.columns = list(columns)
+    # each column's size as pd.read_excel would have held it, for the memory caption
+    df.attrs["parsed_bytes"] = parsed
+    return df
+
+
+def columns_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.columns.parquet")
+
+
+def load_xlsx_columns(data: bytes, sheet: Optional[str], columns: List, cache: Optional[LRUCache] = None,
+                      parquet_dir: Optional[str] = None) -> pd.DataFrame:
+    """`columns` of `sheet`, from the columnar copy when they were read before.
+
+    The cached frame (all columns read so far) is shared: callers get a new frame
+    holding the requested columns and must not modify their values in place. Its
+    attrs["memory"] holds their parsed and compact sizes, as compact_frame records them.
+    """
+    key = content_hash(data, kind="xlsx-columns", sheet=sheet)
+    have = cache.get(key) if cache is not None else None
+    path = columns_path(parquet_dir, key) if parquet_dir else None
+    if have is None and path and os.path.exists(path):
+        try:
+            have = pd.read_parquet(path)
+        except Exception:
+            have = None
+    todo = [c for c in dict.fromkeys(columns) if have is None or c not in have.columns]
+    if todo:
+        new = read_xlsx_columns(data, sheet, todo)
+        if have is not None:
+            parsed = {**have.attrs.get("parsed_bytes", {}), **new.attrs["parsed_bytes"]}
+            have = pd.concat([have, new], axis=1)
+            have.attrs["parsed_bytes"] = parsed
+        else:
+            have = new
+        if cache is not None:
+            cache.put(key, have)
+        if path:
+            write_parquet(have, path)
+    elif cache is not None and key not in cache:
+        cache.put(key, have)
+    out = have[list(columns)]
+    parsed = have.attrs.get("parsed_bytes", {})
+    out.attrs = {}
+    if all(c in parsed for c in columns):
+        out.attrs["memory"] = {"parsed_bytes": sum(parsed[c] for c in columns) + out.index.nbytes,
+                               "compact_bytes": frame_nbytes(out)}
+    return out
@@ -0,0 +1,294 @@
+# survey_incremental.py
+# "Append new responses" mode for surveys that stay open for weeks. Mergeable
+# sufficient statistics are kept per survey on disk and every upload of new rows is
+# folded into them, so an update costs time proportional to the new rows only:
+#   each item / composite   RunningStats (count, mean, M2, min/max, value counts)
+#   X_total x Y_total       PairStats (n, means, M2s, co-moment) -> Pearson r, p, line
+# A re-upload of the whole growing CSV is recognised by its byte prefix (every piece
+# seen so far, hashed, a missing final newline allowed) and only the rows after it are
+# parsed; an upload seen before is skipped, and one that repeats rows already folded in
+# without being the seen file plus new rows is refused. Statistics that cannot be merged
+# are listed by NOT_MERGEABLE and need a full recompute (normal upload).
+
+import hashlib
+import io
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from survey_assoc import corr_pvalues
+from survey_ingest import content_hash, file_kind, read_frame
+from survey_streaming import RunningStats
+
+STATE_VERSION = 2
+# an "added" upload that starts with the first rows (up to this many) of an earlier upload repeats it
+LEAD_ROWS = 50
+_EOL = re.compile(rb"\r?\n")
+
+# (key, English, Indonesian) for the statistics append mode cannot update
+NOT_MERGEABLE = [
+    ("spearman", "Spearman rho (needs the ranks of all rows)", "Spearman rho (butuh peringkat semua baris)"),
+    ("normality", "Normality tests and the automatic method choice", "Uji normalitas dan pemilihan metode otomatis"),
+    ("chi2", "Chi-square (quantile bins move as rows arrive)", "Chi-square (batas bin kuantil berubah)"),
+    ("resample", "Bootstrap CI / permutation p-value", "CI bootstrap / p-value permutasi"),
+    ("matrix", "Item correlation matrix and segment comparison", "Matriks korelasi item dan perbandingan segmen"),
+    ("listwise", "Listwise deletion and item-mean composites", "Penghapusan listwise dan komposit rata-rata item"),
+]
+
+
+class PairStats:
+    """Mergeable co-moments of (x, y) over rows where both are present (Chan et al.)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2x = 0.0
+        self.m2y = 0.0
+        self.cxy = 0.0
+
+    def update(self, x, y) -> "PairStats":
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ok = ~np.isnan(x) & ~np.isnan(y)
+        if not ok.any():
+            return self
+        x, y = x[ok], y[ok]
+        other = PairStats()
+        other.n = x.size
+        other.mean_x, other.mean_y = float(x.mean()), float(y.mean())
+        dx, dy = x - other.mean_x, y - other.mean_y
+        other.m2x, other.m2y, other.cxy = float(dx @ dx), float(dy @ dy), float(dx @ dy)
+        return self.merge(other)
+
+    def merge(self, other: "PairStats") -> "PairStats":
+        if other.n == 0:
+            return self
+        na, nb = self.n, other.n
+        n = na + nb
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        self.m2x += other.m2x + dx * dx * na * nb / n
+        self.m2y += other.m2y + dy * dy * na * nb / n
+        self.cxy += other.cxy + dx * dy * na * nb / n
+        self.mean_x += dx * nb / n
+        self.mean_y += dy * nb / n
+        self.n = n
+        return self
+
+    @property
+    def r(self) -> float:
+        if self.n < 2 or self.m2x <= 0 or self.m2y <= 0:
+            return np.nan
+        return float(np.clip(self.cxy / np.sqrt(self.m2x * self.m2y), -1.0, 1.0))
+
+    @property
+    def pvalue(self) -> float:
+        return float(corr_pvalues(np.array([self.r]), np.array([self.n]))[0])
+
+    def line(self):
+        """Least-squares slope and intercept of y on x (NaN when x is constant)."""
+        if self.n < 2 or self.m2x <= 0:
+            return np.nan, np.nan
+        slope = self.cxy / self.m2x
+        return slope, self.mean_y - slope * self.mean_x
+
+
+class AppendState:
+    """Accumulated statistics of one open survey, for a fixed item / composite selection."""
+
+    def __init__(self, items: List[str], composites: Dict[str, List[str]]):
+        self.version = STATE_VERSION
+        self.items = list(items)
+        self.composites = {k: list(v) for k, v in composites.items()}
+        self.stats: Dict[str, RunningStats] = {c: RunningStats() for c in self.items + list(self.composites)}
+        self.pair = PairStats()
+        self.n_rows = 0
+        self.batches: List[dict] = []
+        # the CSV bytes seen so far as consecutive pieces (length, hash, missing final newline),
+        # in upload order, and the header line; None once an upload cannot be placed in them
+        self._segments: Optional[List[dict]] = None
+        self._header = b""
+
+    @property
+    def columns(self) -> List[str]:
+        """Upload columns the state reads (items and composite items)."""
+        return list(dict.fromkeys(self.items + [c for cols in self.composites.values() for c in cols]))
+
+    def matches(self, items: List[str], composites: Dict[str, List[str]]) -> bool:
+        return self.items == list(items) and self.composites == {k: list(v) for k, v in composites.items()}
+
+    def has_batch(self, key: str) -> bool:
+        return any(b["hash"] == key for b in self.batches)
+
+    def add_frame(self, df: pd.DataFrame) -> int:
+        """Fold the rows of `df` in (one pass; composites summed with skipna=False)."""
+        num = {c: pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan) for c in self.columns}
+        for c in self.items:
+            self.stats[c].update(num[c])
+        totals = {}
+        for name, cols in self.composites.items():
+            totals[name] = np.sum([num[c] for c in cols], axis=0) if cols else np.full(len(df), np.nan)
+            self.stats[name].update(totals[name])
+        if "X_total" in totals and "Y_total" in totals:
+            self.pair.update(totals["X_total"], totals["Y_total"])
+        self.n_rows += len(df)
+        return len(df)
+
+    def _match_seen(self, data: bytes) -> Optional[int]:
+        """End offset of everything seen so far when `data` starts with it (a whole-file
+        re-upload), else None. Pieces are compared in upload order; a piece that had no
+        final newline must be followed by one in the grown file."""
+        if not self._segments:
+            return None
+        pos = 0
+        for seg in self._segments:
+            end = pos + seg["nbytes"]
+            if len(data) < end or _digest(data[pos:end]) != seg["hash"]:
+                return None
+            pos = end
+            if seg["open"]:
+                eol = _EOL.match(data, pos)
+                if eol is None:
+                    return None if pos < len(data) else pos
+                pos = eol.end()
+        return pos
+
+    def _repeats_rows(self, lead: List[int]) -> bool:
+        """Whether an upload whose first rows hash to `lead` starts with the first rows of an
+        earlier upload (all of them, up to LEAD_ROWS)."""
+        for b in self.batches:
+            seen = b.get("lead")
+            if seen and len(lead) >= len(seen) and lead[:len(seen)] == seen:
+                return True
+        return False
+
+    def add_upload(self, data: bytes, name: str, sheet_name: Optional[str] = None) -> dict:
+        """Fold one upload in: new rows only, a whole-file re-upload (only its tail is parsed),
+        or an upload already seen (skipped). An upload that starts with rows seen before but
+        is not the seen file plus new rows is refused ("overlap"), never merged. For a
+        workbook, `sheet_name` picks the sheet (default: the first). Returns what happened."""
+        t0 = time.perf_counter()
+        key = content_hash(data) if sheet_name is None else content_hash(data, sheet_name=sheet_name)
+        if self.has_batch(key):
+            return {"status": "duplicate", "rows": 0, "seconds": time.perf_counter() - t0}
+        kind = file_kind(name)
+        seen_end = self._match_seen(data) if kind == "csv" else None
+        if seen_end is not None:
+            # the whole file again: parse the header plus the rows after what was seen
+            status = "tail"
+            tail = data[seen_end:]
+            df = pd.read_csv(io.BytesIO(self._header + tail)) if tail.strip() else pd.DataFrame(columns=self.columns)
+        else:
+            status = "added"
+            df = read_frame(data, kind) if sheet_name is None or kind == "csv" else read_frame(data, kind, sheet_name=sheet_name)
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"columns missing from this upload: {', '.join(missing)}")
+        lead = _row_hashes(df.head(LEAD_ROWS))
+        if status == "added" and lead and self._repeats_rows(lead):
+            return {"status": "overlap", "rows": 0, "seconds": time.perf_counter() - t0}
+        rows = self.add_frame(df)
+        if kind == "csv":
+            self._remember_csv(data, status, seen_end)
+        else:
+            # a workbook's bytes cannot be matched against later CSV re-uploads
+            self._segments = None
+        self.batches.append({"hash": key, "name": name, "rows": rows, "status": status, "lead": lead,
+                             "added_at": time.time()})
+        return {"status": status, "rows": rows, "seconds": time.perf_counter() - t0}
+
+    def _remember_csv(self, data: bytes, status: str, seen_end: Optional[int]) -> None:
+        """Extend the seen bytes with this CSV upload: the whole file when it is the first,
+        the tail after a whole-file re-upload, or the rows under the header of a new-rows file."""
+        header_end = data.find(b"\n") + 1 or len(data)
+        header = data[:header_end]
+        if status == "tail":
+            piece = data[seen_end:]
+        elif not self.batches:
+            self._segments, self._header = [], header
+            piece = data
+        elif self._segments is not None and header == self._header:
+            piece = data[header_end:]
+        else:
+            # rows from a file with another header: a later whole file cannot be told apart
+            self._segments = None
+            return
+        if piece:
+            self._segments.append({"nbytes": len(piece), "hash": _digest(piece), "open": not piece.endswith(b"\n")})
+
+    def needs_recompute(self) -> List[str]:
+        """Columns whose median/frequency table is approximate (too many distinct values)."""
+        return [c for c, a in self.stats.items() if a.count and not a.exact]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def _row_hashes(df: pd.DataFrame) -> List[int]:
+    # rows as text, so the same answers hash alike whichever file type they came from
+    return pd.util.hash_pandas_object(df.astype(str), index=False).tolist()
+
+
+# ---------- Persistence ----------
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def state_path(state_dir: str, survey: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", survey.strip()) or "survey"
+    return os.path.join(state_dir, f"{slug}.state.pkl")
+
+
+def state_lock(path: str) -> threading.Lock:
+    """One lock per state file: sessions appending to the same survey take turns."""
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def load_state(path: str) -> Optional[AppendState]:
+    # state files are written by this app only (server-side directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if getattr(state, "version", None) != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(state: AppendState, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def append_upload(path: str, data: bytes, name: str, items: List[str],
+                  composites: Dict[str, List[str]], reset: bool = False,
+                  sheet_name: Optional[str] = None) -> dict:
+    """Load the survey's state (or start one), fold the upload in and save it.
+
+    Returns {"state", "status", "rows", "seconds"}; status "mismatch" means the saved
+    state was built for another item selection and "overlap" that the upload repeats
+    rows already included; in both cases the state was left untouched.
+    """
+    with state_lock(path):
+        state = None if reset else load_state(path)
+        if state is None:
+            state = AppendState(items, composites)
+        elif not state.matches(items, composites):
+            return {"state": state, "status": "mismatch", "rows": 0, "seconds": 0.0}
+        out = state.add_upload(data, name, sheet_name)
+        if out["status"] not in ("duplicate", "overlap"):
+            save_state(state, path)
+        return {"state": state, **out}
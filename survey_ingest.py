@@ -0,0 +1,94 @@
+# survey_ingest.py
+# Ingestion layer: parse an uploaded CSV/XLSX once and reuse the parsed frame.
+# Frames are keyed by a hash of the raw bytes plus the read options, kept in a
+# byte-bounded LRU cache and (optionally) persisted as Parquet on local disk so
+# later reruns and sessions skip parsing entirely. Parsed frames are stored with
+# compact dtypes (survey_dtypes), so the cache budget holds several times more rows.
+
+import hashlib
+import io
+import os
+import tempfile
+from typing import Optional
+
+import pandas as pd
+
+from survey_cache import LRUCache
+from survey_dtypes import compact_frame
+
+
+def file_kind(name: str) -> str:
+    return "csv" if str(name).lower().endswith(".csv") else "xlsx"
+
+
+def content_hash(data: bytes, **read_opts) -> str:
+    """Stable key for `data` parsed with `read_opts` (option order does not matter)."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(data)
+    for k in sorted(read_opts):
+        h.update(f"|{k}={read_opts[k]!r}".encode())
+    return h.hexdigest()
+
+
+def read_frame(data: bytes, kind: str, **read_opts) -> pd.DataFrame:
+    """Parse raw upload bytes without any caching."""
+    if kind == "csv":
+        return pd.read_csv(io.BytesIO(data), **read_opts)
+    return pd.read_excel(io.BytesIO(data), engine="openpyxl", **read_opts)
+
+
+def _parquet_path(parquet_dir: str, key: str) -> str:
+    return os.path.join(parquet_dir, f"{key}.parquet")
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> bool:
+    # Write to a temp file first so a concurrent reader never sees a half-written file.
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".parquet.tmp", dir=os.path.dirname(path))
+        os.close(fd)
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return True
+    except Exception:
+        # mixed-type object columns, non-string headers or no pyarrow: keep it in memory only
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def load_frame(data: bytes, name: str, cache: Optional[LRUCache] = None,
+               parquet_dir: Optional[str] = None, compact: bool = True, **read_opts) -> pd.DataFrame:
+    """Return the parsed frame for an upload, hitting memory, then disk, then the parser.
+
+    The returned frame may be shared with other reruns/sessions through the cache,
+    so callers must treat it as read-only and copy before mutating. With `compact`,
+    df.attrs["memory"] holds the parsed and compact sizes in bytes.
+    """
+    kind = file_kind(name)
+    key = content_hash(data, kind=kind, compact=compact, **read_opts)
+
+    if cache is not None:
+        df = cache.get(key)
+        if df is not None:
+            return df
+
+    df = None
+    if parquet_dir:
+        path = _parquet_path(parquet_dir, key)
+        if os.path.exists(path):
+            try:
+                df = pd.read_parquet(path)
+            except Exception:
+                df = None
+    if df is None:
+        df = read_frame(data, kind, **read_opts)
+        if compact:
+            df = compact_frame(df)
+        if parquet_dir:
+            write_parquet(df, _parquet_path(parquet_dir, key))
+
+    if cache is not None:
+        cache.put(key, df)
+    return df
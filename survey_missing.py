@@ -0,0 +1,91 @@
+# survey_missing.py
+# Missing-value handling over one float matrix of the analysed columns (NaN = missing).
+# The matrix is built once and never filled in place: each column's validity mask is
+# kept, fill values are computed lazily per column on first use, and every statistic
+# reads the handling it needs as a view of the same data:
+#   pairwise  each statistic uses the rows where its own columns are present
+#             (a composite is present when all of its items are)
+#   listwise  only rows complete on every analysed column
+#   zero / mean / median   missing cells replaced by the column's fill value
+# Columns without gaps are never copied for a fill; switching the handling never
+# rebuilds the matrix or the masks.
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from survey_stats import numeric_matrix
+
+HANDLINGS = ("pairwise", "listwise", "zero", "mean", "median")
+
+
+class MaskedColumns:
+    """Analysed columns as one matrix plus a validity mask per column.
+
+    `matrix(handling, cols)` returns the values a statistic should use; NaN still marks
+    the cells it must skip (pairwise, listwise). Fill values are cached per column.
+    """
+
+    def __init__(self, M: np.ndarray, names: List[str], index: Optional[pd.Index] = None):
+        self.M = M
+        self.names = list(names)
+        self.index = index if index is not None else pd.RangeIndex(M.shape[0])
+        self._pos = {c: j for j, c in enumerate(self.names)}
+        self.valid = ~np.isnan(M)
+        self.n_missing = M.shape[0] - self.valid.sum(axis=0)
+        self._fills: Dict[Tuple[str, str], float] = {}
+        self._complete = None
+
+    def __contains__(self, col: str) -> bool:
+        return col in self._pos
+
+    def fill_value(self, col: str, fill: str) -> float:
+        """0, mean or median of the column's present values (NaN if it has none)."""
+        key = (col, fill)
+        if key not in self._fills:
+            j = self._pos[col]
+            v = self.M[self.valid[:, j], j]
+            if fill == "zero":
+                value = 0.0
+            elif v.size == 0:
+                value = np.nan
+            elif fill == "mean":
+                value = float(v.mean())
+            else:
+                value = float(np.median(v))
+            self._fills[key] = value
+        return self._fills[key]
+
+    def complete_rows(self) -> np.ndarray:
+        """Rows with every analysed column present (the listwise sample)."""
+        if self._complete is None:
+            self._complete = self.valid.all(axis=1)
+        return self._complete
+
+    def matrix(self, handling: str = "pairwise", cols: Optional[List[str]] = None) -> np.ndarray:
+        if handling not in HANDLINGS:
+            raise ValueError(f"unknown missing-value handling: {handling}")
+        idx = None if cols is None else [self._pos[c] for c in cols]
+        M = self.M if idx is None else self.M[:, idx]
+        names = self.names if cols is None else cols
+        missing = self.n_missing if idx is None else self.n_missing[idx]
+        if handling == "pairwise":
+            return M
+        if handling == "listwise":
+            complete = self.complete_rows()
+            return M if complete.all() else np.where(complete[:, None], M, np.nan)
+        if not missing.any():
+            return M
+        out = np.array(M, order="F")
+        for j in np.flatnonzero(missing):
+            out[~self.valid[:, self._pos[names[j]]], j] = self.fill_value(names[j], handling)
+        return out
+
+    def frame(self, cols: List[str], handling: str = "pairwise") -> pd.DataFrame:
+        return pd.DataFrame(self.matrix(handling, cols), columns=cols, index=self.index)
+
+
+def masked_frame(df: pd.DataFrame, cols: List[str]) -> MaskedColumns:
+    cols = list(dict.fromkeys(cols))
+    return MaskedColumns(numeric_matrix(df, cols), cols, df.index)
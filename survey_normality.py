@@ -0,0 +1,104 @@
+# survey_normality.py
+# Normality assessment for the automatic Pearson / Spearman choice, picked by sample size.
+# Shapiro-Wilk's p-value is only reliable up to 5,000 values and at hundreds of thousands
+# of rows every test rejects, so:
+#   n <= 5,000          Shapiro-Wilk on all values (what the app always did)
+#   n <= 100,000        Shapiro-Wilk on a seeded 5,000-value subsample
+#   larger              skew / excess-kurtosis rule, with the D'Agostino-Pearson K^2
+#                       p-value reported alongside (both from one moment pass)
+# Every result says which test ran, on how many values and how long it took.
+
+import time
+from typing import Optional
+
+import numpy as np
+from scipy import stats
+
+SHAPIRO_MAX_N = 5_000
+SUBSAMPLE_MAX_N = 100_000
+# "close enough to normal for Pearson" on large samples
+SKEW_MAX = 1.0
+EXCESS_KURTOSIS_MAX = 1.0
+ALPHA = 0.05
+
+TEST_LABELS = {
+    "shapiro": "Shapiro-Wilk",
+    "shapiro_subsample": "Shapiro-Wilk (subsample)",
+    "moments": "Skew/kurtosis rule (D'Agostino-Pearson p)",
+}
+
+
+def moments(v: np.ndarray):
+    """n, skewness g1 and excess kurtosis g2 (population moments, as scipy's defaults)."""
+    n = v.size
+    d = v - v.mean()
+    d2 = d * d
+    m2 = d2.mean()
+    m3 = (d2 * d).mean()
+    m4 = (d2 * d2).mean()
+    if m2 == 0:
+        return n, np.nan, np.nan
+    return n, m3 / m2 ** 1.5, m4 / (m2 * m2) - 3.0
+
+
+def dagostino_pearson(n: int, skew: float, excess_kurtosis: float) -> float:
+    """K^2 omnibus p-value from the moments alone (same formulas as scipy.stats.normaltest)."""
+    if n < 20 or np.isnan(skew):
+        return np.nan
+    # skewness z (D'Agostino 1970)
+    y = skew * np.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+    beta2 = 3.0 * (n * n + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = 1.0 if y == 0 else y
+    z_skew = delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+    # kurtosis z (Anscombe & Glynn 1983)
+    b2 = excess_kurtosis + 3.0
+    e = 3.0 * (n - 1) / (n + 1)
+    var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1.0) ** 2 * (n + 3) * (n + 5))
+    x = (b2 - e) / np.sqrt(var_b2)
+    sqrt_beta1 = (6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9))
+                  * np.sqrt(6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3))))
+    a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / sqrt_beta1 ** 2))
+    denom = 1 + x * np.sqrt(2 / (a - 4.0))
+    term2 = np.sign(denom) * np.cbrt((1 - 2.0 / a) / abs(denom)) if denom != 0 else np.nan
+    z_kurt = (1 - 2.0 / (9 * a) - term2) / np.sqrt(2 / (9 * a))
+    return float(stats.chi2.sf(z_skew ** 2 + z_kurt ** 2, 2))
+
+
+def moment_verdict(n: int, skew: float, excess_kurtosis: float) -> dict:
+    """test, p, normal and n_used of the skew/kurtosis rule (samples above SUBSAMPLE_MAX_N)."""
+    p = dagostino_pearson(n, skew, excess_kurtosis)
+    normal = bool(abs(skew) <= SKEW_MAX and abs(excess_kurtosis) <= EXCESS_KURTOSIS_MAX)
+    return {"test": "moments", "p": p, "normal": normal, "n_used": n}
+
+
+def assess(values, seed: int = 0) -> Optional[dict]:
+    """Normality verdict for one column; None when there are fewer than 3 values.
+
+    Keys: test, label, p, normal, n, n_used, skew, excess_kurtosis, seconds.
+    """
+    t0 = time.perf_counter()
+    v = np.asarray(values, dtype=float)
+    v = v[~np.isnan(v)]
+    n = v.size
+    if n < 3:
+        return None
+    _, skew, kurt = moments(v)
+    out = {"n": n, "skew": float(skew), "excess_kurtosis": float(kurt)}
+    if n <= SUBSAMPLE_MAX_N:
+        test = "shapiro"
+        if n > SHAPIRO_MAX_N:
+            test = "shapiro_subsample"
+            v = v[np.random.default_rng(seed).choice(n, SHAPIRO_MAX_N, replace=False)]
+        try:
+            p = float(stats.shapiro(v)[1])
+        except Exception:
+            return None
+        out.update(test=test, p=p, normal=p > ALPHA, n_used=v.size)
+    else:
+        out.update(moment_verdict(n, skew, kurt))
+    out["label"] = TEST_LABELS[out["test"]]
+    out["seconds"] = time.perf_counter() - t0
+    return out
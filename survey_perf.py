@@ -0,0 +1,187 @@
+# survey_perf.py
+# Per-run stage instrumentation. A Profiler records, for each named stage of one run
+# (an app rerun), its start offset and wall time, the change in process RSS and, with
+# allocation tracing on, the peak memory allocated inside it (tracemalloc; NumPy buffers
+# included; one run at a time, switched off when the run finishes). Stages may nest.
+# A finished run becomes one JSON record that is written as a single line to the
+# "survey.perf" logger, for aggregation across sessions.
+# Disabled instrumentation is NULL_PROFILER: stage() hands back one shared no-op
+# context manager, so an instrumented call site costs under a microsecond.
+
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 ** 2
+
+logger = logging.getLogger("survey.perf")
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# a run still holding allocation tracing after this long was abandoned (its session ended mid-run)
+TRACE_STALE_S = 600.0
+_trace_lock = threading.Lock()
+_trace_owner: Optional[str] = None
+_trace_since = 0.0
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # ru_maxrss: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def configure_log(path: Optional[str] = None) -> logging.Logger:
+    """Send perf records to `path` (JSON lines, appended) or stderr; idempotent."""
+    if not logger.handlers:
+        handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def log_event(event: str, **fields) -> None:
+    """One JSON line on the perf logger (no-op unless a handler is configured)."""
+    if logger.handlers:
+        logger.info(json.dumps({"event": event, "time": time.time(), **fields}, default=str))
+
+
+def claim_tracing(run_id: str) -> bool:
+    """Start tracemalloc for one run. tracemalloc and its peak counter are process-wide and
+    slow every allocation, so one run at a time traces and only while it runs; False while
+    another run holds it (unless that run was abandoned TRACE_STALE_S ago)."""
+    global _trace_owner, _trace_since
+    with _trace_lock:
+        if _trace_owner is not None and time.time() - _trace_since < TRACE_STALE_S:
+            return False
+        _trace_owner, _trace_since = run_id, time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return True
+
+
+def release_tracing(run_id: str) -> None:
+    """Stop tracemalloc if `run_id` holds it."""
+    global _trace_owner
+    with _trace_lock:
+        if _trace_owner == run_id:
+            _trace_owner = None
+            tracemalloc.stop()
+
+
+class _NullStage:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullProfiler:
+    """Stand-in when instrumentation is off."""
+
+    finished = True
+    _stage = _NullStage()
+
+    def stage(self, name: str, **info):
+        return self._stage
+
+    def mark(self, **info) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """Stage timings of one run; see the module comment."""
+
+    def __init__(self, session: Optional[str] = None, trace_memory: bool = False, **info):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session = session
+        self.info = info
+        self.trace_memory = trace_memory and claim_tracing(self.run_id)
+        if trace_memory and not self.trace_memory:
+            # another session's run is tracing: this one is timed without allocation peaks
+            self.info["trace_busy"] = True
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages: List[dict] = []
+        self._open: List[dict] = []
+        self.finished = False
+        self.record: Optional[dict] = None
+
+    @contextmanager
+    def stage(self, name: str, **info):
+        rec = {"stage": name, "depth": len(self._open), "start_s": time.perf_counter() - self._t0, **info}
+        rss0 = rss_bytes()
+        if self.trace_memory:
+            if self._open:
+                # keep the enclosing stage's peak before this one resets the counter
+                parent = self._open[-1]
+                parent["_peak"] = max(parent["_peak"], tracemalloc.get_traced_memory()[1])
+            rec["_base"] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            rec["_peak"] = 0
+        self.stages.append(rec)
+        self._open.append(rec)
+        try:
+            yield rec
+        finally:
+            self._open.pop()
+            rec["seconds"] = time.perf_counter() - self._t0 - rec["start_s"]
+            rss1 = rss_bytes()
+            rec["rss_delta_mb"] = (rss1 - rss0) / MB if rss0 is not None and rss1 is not None else None
+            if self.trace_memory:
+                peak = max(rec.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                rec["alloc_peak_mb"] = max(0, peak - rec.pop("_base")) / MB
+                if self._open:
+                    self._open[-1]["_peak"] = max(self._open[-1]["_peak"], peak)
+
+    def mark(self, **info) -> None:
+        """Add fields to the innermost open stage (e.g. where its result came from)."""
+        if self._open:
+            self._open[-1].update(info)
+
+    def finish(self, **info) -> dict:
+        """Close the run, log it and return its record (later calls return the same record)."""
+        if self.finished:
+            return self.record
+        self.finished = True
+        # stages left open by an exception or st.stop() are closed at the end of the run
+        total = time.perf_counter() - self._t0
+        for rec in self._open:
+            rec.setdefault("seconds", total - rec["start_s"])
+            rec.pop("_peak", None)
+            rec.pop("_base", None)
+        self._open = []
+        if self.trace_memory:
+            release_tracing(self.run_id)
+        rss = rss_bytes()
+        self.record = {"event": "run", "run": self.run_id, "session": self.session, "time": self.started,
+                       "total_s": total, "rss_mb": rss / MB if rss is not None else None,
+                       **self.info, **info, "stages": self.stages}
+        if logger.handlers:
+            logger.info(json.dumps(self.record, default=str))
+        return self.record
@@ -0,0 +1,446 @@
+# survey_pipeline.py
+# The analysis behind survey_app.py as plain functions (no Streamlit), so it can be
+# driven headless: load -> coerce -> composites -> masked columns -> descriptives ->
+# normality -> association -> report. Missing values are handled by the views of
+# survey_missing.MaskedColumns; the working frame itself is never filled. survey_app.py and survey_batch.py both use it.
+
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from scipy import stats
+
+from survey_assoc import AssocMatrix, association_matrix, resample_association
+from survey_charts import DENSITY_MIN_ROWS, density_grid, draw_density
+from survey_columnar import MappedPair
+from survey_contingency import (MIN_EXPECTED, ChiSquareBatch, bin_codes, chi_square_batch, chi_square_tables,
+                                 crosstabs, test_table)
+from survey_drivers import OVERALL, CrossProducts, DriverTable
+from survey_dtypes import compact_frame, compact_series
+from survey_ingest import file_kind, load_frame, read_frame
+from survey_missing import MaskedColumns, masked_frame
+from survey_scales import ReliabilityTable, Scale, reliability_table, scale_items, scale_scores
+from survey_normality import assess
+from survey_segments import SegmentTable, segment_matrix
+from survey_stats import DescriptiveTable, numeric_matrix
+
+MISSING_METHODS = ["Drop rows (default)", "Drop incomplete rows (listwise)",
+                   "Fill with 0", "Fill with mean", "Fill with median"]
+# survey_missing handling behind each option; "Drop rows" drops per statistic (pairwise)
+HANDLING = dict(zip(MISSING_METHODS, ["pairwise", "listwise", "zero", "mean", "median"]))
+COMPOSITES = ["X_total", "Y_total"]
+
+
+# ---------- Load ----------
+def load(path: str, cache=None, parquet_dir: Optional[str] = None) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        data = f.read()
+    if cache is None and parquet_dir is None:
+        return compact_frame(read_frame(data, file_kind(path)))
+    return load_frame(data, path, cache=cache, parquet_dir=parquet_dir)
+
+
+def default_items(df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+    """The app's default X/Y selection: first four numeric columns, then the next four."""
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    return numeric_cols[:4], numeric_cols[4:8]
+
+
+# ---------- Clean ----------
+def coerce(df: pd.DataFrame, items: List[str]) -> pd.DataFrame:
+    """Work frame holding only `items`, each numeric (text coerced to NaN) in a compact dtype."""
+    cols = {}
+    for c in dict.fromkeys(items):
+        s = df[c]
+        if not pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+            s = compact_series(pd.to_numeric(s, errors="coerce"))
+        cols[c] = s.copy()
+    return pd.DataFrame(cols, index=df.index)
+
+
+def all_scales(x_items: List[str], y_items: List[str], scales: Optional[List[Scale]] = None) -> List[Scale]:
+    """X_total / Y_total (when they have items) followed by the user-defined scales."""
+    out = [Scale(name, items) for name, items in zip(COMPOSITES, (x_items, y_items)) if len(items) >= 1]
+    out += list(scales or [])
+    names = [sc.name for sc in out]
+    clash = sorted({n for n in names if names.count(n) > 1} | set(names) & set(scale_items(out)))
+    if clash:
+        raise ValueError(f"scale names must differ from each other and from the items: {', '.join(clash)}")
+    return out
+
+
+def add_composites(df_work: pd.DataFrame, x_items: List[str], y_items: List[str],
+                   item_mean: bool = False, scales: Optional[List[Scale]] = None) -> pd.DataFrame:
+    """X_total / Y_total and every scale of `scales` as item sums (reversed items recoded),
+    missing when any item is (or, with `item_mean`, missing items count as that item's
+    mean and only unanswered rows stay missing); all of them from one matrix product."""
+    scales = all_scales(x_items, y_items, scales)
+    if not scales:
+        return df_work
+    items = scale_items(scales)
+    S = scale_scores(numeric_matrix(df_work, items), items, scales, item_mean)
+    for j, sc in enumerate(scales):
+        df_work[sc.name] = compact_series(pd.Series(S[:, j], index=df_work.index))
+    return df_work
+
+
+def prepare(df: pd.DataFrame, x_items: List[str], y_items: List[str],
+            compute_composites: bool = True, extra_cols: Optional[List[str]] = None,
+            item_mean: bool = False, scales: Optional[List[Scale]] = None) -> pd.DataFrame:
+    """Items (plus `extra_cols` and the items of `scales`) as numbers, and composites;
+    missing values left in place.
+
+    Only the analysed columns are copied, in compact dtypes; demographics stay in `df`.
+    """
+    df_work = coerce(df, x_items + y_items + list(extra_cols or []) + scale_items(scales or []))
+    if compute_composites:
+        add_composites(df_work, x_items, y_items, item_mean, scales)
+    return df_work
+
+
+def masked(df_work: pd.DataFrame, cols: List[str]) -> MaskedColumns:
+    """The analysed columns with their validity masks, shared by every missing-value option."""
+    return masked_frame(df_work, cols)
+
+
+# ---------- Describe ----------
+def descriptives(data: MaskedColumns, missing: str = MISSING_METHODS[0]) -> DescriptiveTable:
+    """Descriptives of every masked column; the item matrix and segments reuse its matrix,
+    so they see the same missing-value handling."""
+    return DescriptiveTable(data.matrix(HANDLING[missing]), data.names)
+
+
+# ---------- Associate ----------
+def reliability(data: MaskedColumns, scales: List[Scale], missing: str = MISSING_METHODS[0]) -> ReliabilityTable:
+    """Cronbach's alpha and item statistics of every scale (see survey_scales), on the item
+    values under the missing-value handling; each scale uses its complete rows."""
+    items = scale_items(scales)
+    return reliability_table(data.matrix(HANDLING[missing], items), items, scales)
+
+
+def association_pair(data: MaskedColumns, missing: str) -> pd.DataFrame:
+    """X_total / Y_total under the missing-value handling; rows still missing either are dropped."""
+    return data.frame(COMPOSITES, HANDLING[missing]).dropna()
+
+
+def normality(pair: pd.DataFrame, seed: int = 0) -> Tuple[Optional[dict], Optional[dict]]:
+    """Normality assessments for X_total and Y_total (see survey_normality.assess).
+
+    Here and below, `pair` may also be a survey_columnar.MappedPair (out-of-core mode),
+    whose statistics are summed over the batches of the mapped file."""
+    if isinstance(pair, MappedPair):
+        return pair.normality(seed)
+    if len(pair) < 3:
+        return None, None
+    return assess(pair["X_total"], seed), assess(pair["Y_total"], seed)
+
+
+def auto_method(norm_x: Optional[dict], norm_y: Optional[dict]) -> str:
+    return "pearson" if (norm_x is not None and norm_y is not None and norm_x["normal"] and norm_y["normal"]) else "spearman"
+
+
+def resolve_method(choice: str, auto: str) -> str:
+    """Map the UI choice (Auto / Pearson / Spearman / Chi-square) to pearson/spearman/chi2."""
+    if choice == "Auto":
+        return auto
+    if choice == "Chi-square":
+        return "chi2"
+    return choice.lower()
+
+
+STRENGTH_LABELS = {
+    "en": ["negligible", "weak", "moderate", "strong", "very strong"],
+    "id": ["sangat lemah", "lemah", "sedang", "kuat", "sangat kuat"],
+}
+
+
+def interpret(r: float, lang: str = "en") -> Tuple[str, str]:
+    """(direction, strength) wording for a correlation coefficient."""
+    labels = STRENGTH_LABELS["en" if lang == "en" else "id"]
+    abs_r = abs(r) if not np.isnan(r) else 0
+    idx = int(np.searchsorted([0.1, 0.3, 0.5, 0.7], abs_r, side="right"))
+    direction = ("positive" if r > 0 else "negative") if not np.isnan(r) else ""
+    return direction, labels[idx]
+
+
+def correlate(pair: pd.DataFrame, method: str) -> dict:
+    out = {"method_used": method}
+    try:
+        if isinstance(pair, MappedPair):
+            r, pval = pair.correlation(method)
+        elif method == "pearson":
+            r, pval = stats.pearsonr(pair["X_total"], pair["Y_total"])
+        else:
+            r, pval = stats.spearmanr(pair["X_total"], pair["Y_total"])
+        out["label"] = "Pearson r" if method == "pearson" else "Spearman rho"
+        out["r"], out["pval"] = float(r), float(pval)
+    except Exception as e:
+        out.update(r=np.nan, pval=np.nan, label="Error", error=str(e))
+    if isinstance(pair, MappedPair):
+        slope, intercept, xs = pair.line()
+        if not np.isnan(slope):
+            out.update(slope=float(slope), intercept=float(intercept), xs=xs)
+        return out
+    try:
+        slope, intercept, _, _, _ = stats.linregress(pair["X_total"], pair["Y_total"])
+        out.update(slope=float(slope), intercept=float(intercept),
+                   xs=np.array([pair["X_total"].min(), pair["X_total"].max()]))
+    except Exception:
+        pass
+    return out
+
+
+def resample(pair: pd.DataFrame, method: str, n_resamples: int = 2000, seed: int = 0,
+             workers: Optional[int] = None) -> dict:
+    """Bootstrap CI and permutation p-value for the X_total / Y_total coefficient."""
+    if isinstance(pair, MappedPair):
+        raise ValueError("resampling draws rows at random and needs the pair in memory")
+    return resample_association(pair["X_total"].to_numpy(dtype=float), pair["Y_total"].to_numpy(dtype=float),
+                                method, n_resamples, seed=seed, workers=workers)
+
+
+def resample_lines(assoc: dict, lang: str = "en") -> List[str]:
+    """Report lines for the resampling results of a correlation (empty if none were run)."""
+    if "ci_low" not in assoc:
+        return []
+    ci = f"[{assoc['ci_low']:.4f}, {assoc['ci_high']:.4f}]"
+    if lang == "en":
+        return [f"{assoc['confidence']:.0%} bootstrap CI: {ci} ({assoc['n_resamples']} resamples)",
+                f"Permutation p = {assoc['perm_p']:.4f}"]
+    return [f"CI bootstrap {assoc['confidence']:.0%}: {ci} ({assoc['n_resamples']} resampel)",
+            f"p permutasi = {assoc['perm_p']:.4f}"]
+
+
+def chi_square(pair: pd.DataFrame, nbins: int = 3, binning: str = "Quantiles", seed: int = 0) -> dict:
+    """Chi-square test of binned X_total against binned Y_total (see survey_contingency)."""
+    if isinstance(pair, MappedPair):
+        counts, x_labels, y_labels = pair.crosstab(nbins, binning)
+    else:
+        x_codes, x_labels = bin_codes(pair["X_total"], nbins, binning)
+        y_codes, y_labels = bin_codes(pair["Y_total"], nbins, binning)
+        counts = crosstabs(x_codes, len(x_labels), [(y_codes, len(y_labels))])[0]
+    ct = pd.DataFrame(counts, index=pd.Index(x_labels, name="X_cat"), columns=pd.Index(y_labels, name="Y_cat"))
+    out = {"method_used": "chi2", "table": ct}
+    try:
+        res = test_table(counts, seed=seed)
+        res.pop("shape")
+        out.update(res)
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
+def demographic_chi_square(pair: pd.DataFrame, df: pd.DataFrame, columns: List[str], nbins: int = 3,
+                           binning: str = "Quantiles", keep_missing: bool = False, seed: int = 0) -> ChiSquareBatch:
+    """Every demographic column of `df` against binned X_total and binned Y_total, on the
+    rows of `pair` (for a MappedPair, `df` is the survey_columnar.MappedTable it came from)."""
+    if isinstance(pair, MappedPair):
+        return chi_square_tables(pair.demographic_tables(df, columns, nbins, binning, keep_missing), seed=seed)
+    bins = {c: bin_codes(pair[c], nbins, binning) for c in COMPOSITES}
+    rows = {c: df[c].reindex(pair.index) for c in columns}
+    return chi_square_batch(rows, bins, keep_missing=keep_missing, seed=seed)
+
+
+def chi_square_lines(assoc: dict) -> List[str]:
+    """Report lines for a chi-square result (empty if the test could not run)."""
+    if "chi2" not in assoc:
+        return []
+    lines = [f"Chi2 = {assoc['chi2']:.4f}, p = {assoc['p_val']:.4f}"]
+    if assoc.get("p_method", "asymptotic") != "asymptotic":
+        lines[0] += f" ({assoc['p_method']}; expected counts below {MIN_EXPECTED:g})"
+    if "cramers_v" in assoc:
+        lines.append(f"Cramér's V = {assoc['cramers_v']:.4f}")
+    return lines
+
+
+def matrix_axes(x_items: List[str], y_items: List[str], available) -> Tuple[List[str], List[str]]:
+    """Rows/columns of the item matrix: X items then Y items, each followed by the composites."""
+    comps = [c for c in COMPOSITES if c in available]
+    return ([c for c in x_items if c in available] + comps,
+            [c for c in y_items if c in available] + comps)
+
+
+def item_matrix(desc: DescriptiveTable, x_items: List[str], y_items: List[str],
+                method: str = "pearson") -> AssocMatrix:
+    """Every X item (and composite) against every Y item (and composite), pairwise complete.
+
+    Reuses the numeric matrix already built for the descriptives, so no second copy
+    of the data is made.
+    """
+    rows, cols = matrix_axes(x_items, y_items, desc)
+    return association_matrix(desc.M, desc.names, rows, cols, method)
+
+
+def segments(desc: DescriptiveTable, df: pd.DataFrame, column: str, method: str = "pearson",
+             keep_missing: bool = False) -> SegmentTable:
+    """Per-level statistics of the described columns by one demographic column of `df`
+    (same rows as the frame the descriptives were computed from)."""
+    return segment_matrix(desc.M, desc.names, column, df[column], method=method, keep_missing=keep_missing)
+
+
+def driver_columns(x_items: List[str], y_items: List[str], available) -> Tuple[List[str], List[str]]:
+    """Predictors (X items) and targets (Y_total, then each Y item) of the driver models."""
+    return ([c for c in x_items if c in available],
+            [c for c in ["Y_total"] + y_items if c in available])
+
+
+def driver_products(desc: DescriptiveTable, x_items: List[str], y_items: List[str],
+                    df: Optional[pd.DataFrame] = None, column: Optional[str] = None,
+                    keep_missing: bool = False) -> CrossProducts:
+    """Cross-products of the driver columns from the descriptives' numeric matrix, per level of
+    `column` of `df` when given. Every driver model of this data is a slice of them."""
+    predictors, targets = driver_columns(x_items, y_items, desc)
+    cols = list(dict.fromkeys(predictors + targets))
+    M = desc.M[:, [desc.names.index(c) for c in cols]]
+    products = CrossProducts(cols, column)
+    return products.update(M, None if column is None else df[column], keep_missing)
+
+
+def drivers(products: CrossProducts, predictors: List[str], targets: List[str]) -> DriverTable:
+    """OLS of every target on the predictors, overall and per level, in one batched solve."""
+    return products.fit(predictors, targets)
+
+
+def scatter_grid(pair: pd.DataFrame) -> dict:
+    """The density grid of X_total vs Y_total (survey_charts.density_grid)."""
+    if isinstance(pair, MappedPair):
+        return pair.density_grid()
+    return density_grid(pair["X_total"], pair["Y_total"])
+
+
+def scatter_png(pair: pd.DataFrame, assoc: dict, title: str = "Scatter X_total vs Y_total",
+                grid: Optional[dict] = None) -> bytes:
+    """X_total vs Y_total with the regression line. Above DENSITY_MIN_ROWS pairs (or when a
+    precomputed `grid` is passed) the points are drawn as a density heatmap instead."""
+    fig = Figure(figsize=(6, 4), dpi=120)
+    ax = fig.subplots()
+    if grid is None and len(pair) > DENSITY_MIN_ROWS:
+        grid = scatter_grid(pair)
+    elif grid is None and isinstance(pair, MappedPair):
+        pair = pair.frame()
+    if grid is not None:
+        draw_density(ax, grid)
+        title = f"{title} (density, n = {grid['n']:,})"
+    else:
+        ax.scatter(pair["X_total"], pair["Y_total"], alpha=0.75)
+    if "slope" in assoc:
+        xs = assoc["xs"]
+        ax.plot(xs, assoc["slope"] * xs + assoc["intercept"], color="red", linestyle="--")
+    ax.set_xlabel("X_total", fontname="Times New Roman")
+    ax.set_ylabel("Y_total", fontname="Times New Roman")
+    ax.set_title(title, fontname="Times New Roman")
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+# ---------- Whole run ----------
+def analyze(df: pd.DataFrame, x_items: Optional[List[str]] = None, y_items: Optional[List[str]] = None,
+            missing: str = MISSING_METHODS[0], method: str = "Auto",
+            nbins: int = 3, binning: str = "Quantiles", matrix_method: str = "pearson",
+            resamples: int = 0, seed: int = 0, workers: Optional[int] = None,
+            segment_cols: Optional[List[str]] = None, item_mean: bool = False,
+            scales: Optional[List[Scale]] = None) -> dict:
+    """Everything the app shows for one file, with the app's defaults.
+
+    `resamples` > 0 adds a bootstrap CI and permutation p-value to a Pearson/Spearman result;
+    `segment_cols` adds a SegmentTable per demographic column under "segments" and their
+    chi-square tests against the binned composites under "demographic_chi2";
+    `item_mean` fills missing items with the item mean inside the composites;
+    `scales` adds more composites (described, and with X_total / Y_total under "reliability").
+    "drivers" holds a DriverTable (Y_total and each Y item on the X items) per segment column,
+    or one under OVERALL without segment columns.
+    """
+    if x_items is None or y_items is None:
+        dx, dy = default_items(df)
+        x_items = dx if x_items is None else x_items
+        y_items = dy if y_items is None else y_items
+    constructs = all_scales(x_items, y_items, scales)
+    items = list(dict.fromkeys(x_items + y_items + scale_items(constructs)))
+    df_work = prepare(df, x_items, y_items, compute_composites=True, item_mean=item_mean, scales=scales)
+    data = masked(df_work, items + [sc.name for sc in constructs])
+    result = {"n_rows": len(df), "x_items": x_items, "y_items": y_items, "missing": missing,
+              "item_mean": item_mean, "descriptives": descriptives(data, missing), "df_work": df_work,
+              "reliability": reliability(data, constructs, missing)}
+    result["matrix"] = item_matrix(result["descriptives"], x_items, y_items, matrix_method)
+    result["segments"] = {c: segments(result["descriptives"], df, c, matrix_method) for c in segment_cols or []}
+    predictors, targets = driver_columns(x_items, y_items, result["descriptives"])
+    if predictors and targets:
+        result["drivers"] = {c or OVERALL: drivers(driver_products(result["descriptives"], x_items, y_items, df, c),
+                                                   predictors, targets)
+                             for c in segment_cols or [None]}
+    if not all(c in df_work.columns for c in COMPOSITES):
+        return result
+    pair = association_pair(data, missing)
+    norm_x, norm_y = normality(pair, seed)
+    result.update(pair=pair, n_pairs=len(pair), normality={"X_total": norm_x, "Y_total": norm_y},
+                  auto_method=auto_method(norm_x, norm_y))
+    if len(pair) < 3:
+        return result
+    if segment_cols:
+        result["demographic_chi2"] = demographic_chi_square(pair, df, segment_cols, nbins, binning, seed=seed)
+    used = resolve_method(method, result["auto_method"])
+    if used == "chi2":
+        result["association"] = chi_square(pair, nbins, binning, seed)
+    else:
+        assoc = correlate(pair, used)
+        assoc["direction"], assoc["strength"] = interpret(assoc["r"])
+        if resamples > 0 and not np.isnan(assoc["r"]):
+            assoc.update(resample(pair, used, resamples, seed=seed, workers=workers))
+        result["association"] = assoc
+    return result
+
+
+def result_json(result: dict) -> dict:
+    """JSON-safe view of `analyze` output (tables and arrays dropped or converted)."""
+    def clean(v):
+        if isinstance(v, (np.floating, float)):
+            return None if np.isnan(v) else float(v)
+        if isinstance(v, np.integer):
+            return int(v)
+        if isinstance(v, np.ndarray):
+            return [clean(x) for x in v.tolist()]
+        if isinstance(v, pd.DataFrame):
+            return {str(k): {str(i): clean(x) for i, x in col.items()} for k, col in v.to_dict().items()}
+        if isinstance(v, dict):
+            return {str(k): clean(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple)):
+            return [clean(x) for x in v]
+        return v
+    skip = {"descriptives", "df_work", "pair", "matrix", "segments", "demographic_chi2", "reliability", "drivers"}
+    out = {k: clean(v) for k, v in result.items() if k not in skip}
+    out["descriptives"] = clean(result["descriptives"].table.reset_index().to_dict(orient="records"))
+    if "reliability" in result:
+        out["reliability"] = clean(result["reliability"].summary.reset_index().to_dict(orient="records"))
+    if "drivers" in result:
+        out["drivers"] = {c: clean(t.models.to_dict(orient="records")) for c, t in result["drivers"].items()}
+    return out
+
+
+def report_snapshot(result: dict, chart_pngs: Dict[str, bytes], title: str = "Survey Analyzer",
+                    subtitle: str = "") -> dict:
+    """Report input for survey_report.write_report built from an `analyze` result."""
+    table = result["descriptives"].table
+    lines = []
+    for col, row in table.iterrows():
+        try:
+            lines.append(f"{col} — mean: {row['mean']:.3f}, median: {row['median']:.3f}, std: {row['std']:.3f}, n: {int(row['count'])}")
+        except Exception:
+            lines.append(f"{col} — (could not compute numeric summary)")
+    report = {"title": title, "subtitle": subtitle, "members": "",
+              "summary_heading": "Descriptive statistics summary:", "summary_lines": lines,
+              "charts": [(c, chart_pngs[c]) for c in table.index if c in chart_pngs]}
+    assoc = result.get("association")
+    if assoc:
+        if assoc["method_used"] == "chi2":
+            a_lines = ["Chi-square test performed on categorized totals."] + chi_square_lines(assoc)
+            png = None
+        else:
+            a_lines = [f"{assoc['label']} = {assoc['r']:.4f}, p = {assoc['pval']:.4f}",
+                       f"Interpretation: {assoc.get('direction', '')}, {assoc.get('strength', '')}"]
+            a_lines += resample_lines(assoc)
+            png = scatter_png(result["pair"], assoc)
+        report["assoc"] = {"heading": "Association Analysis", "lines": a_lines, "scatter_png": png}
+    return report
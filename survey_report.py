@@ -0,0 +1,195 @@
+# survey_report.py
+# PDF report writer that runs in a background thread and streams pages to a file.
+# The app takes a plain-data snapshot of what is on screen (summary lines, the cached
+# card PNGs, association results and scatter PNG) and hands it to `start_report`;
+# pages are written to disk one at a time with PdfPages, so memory stays at about
+# one page regardless of report size, and the Streamlit session is never blocked.
+# A report file lives as long as its job: it is deleted when the job is discarded or
+# garbage-collected (the session that made it has ended), and files left behind by a
+# process that did not exit cleanly are swept once they are SURVEY_REPORT_TTL_H old.
+
+import glob
+import io
+import os
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import matplotlib.image as mpimg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+A4 = (8.27, 11.69)
+CHARTS_PER_PAGE = 6
+REPORT_DIR = os.environ.get("SURVEY_REPORT_DIR") or None
+REPORT_TTL_S = float(os.environ.get("SURVEY_REPORT_TTL_H", "24")) * 3600
+PREFIX = "survey_report_"
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="survey-report")
+# files of the jobs still alive in this process (never swept)
+_live_paths = set()
+
+
+def _page() -> Figure:
+    return Figure(figsize=A4)
+
+
+def _text_pages(heading: str, lines, per_page: int = 30):
+    # the same 0.03 line spacing as the original single-page summary, continued on new pages
+    for start in range(0, max(1, len(lines)), per_page):
+        fig = _page()
+        y_pos = 0.95
+        if start == 0:
+            fig.text(0.01, y_pos, heading, fontsize=12, fontname="Times New Roman", weight="bold")
+            y_pos -= 0.03
+        for line in lines[start:start + per_page]:
+            fig.text(0.01, y_pos, line, fontsize=10, fontname="Times New Roman")
+            y_pos -= 0.03
+        yield fig
+
+
+def _image_page(images, title: Optional[str] = None) -> Figure:
+    """A page of PNGs (name, bytes) stacked vertically, each drawn without axes."""
+    fig = _page()
+    n = len(images)
+    top = 0.95 if title else 0.99
+    if title:
+        fig.text(0.01, 0.97, title, fontsize=12, fontname="Times New Roman", weight="bold")
+    height = top / max(n, 1)
+    for i, (name, png) in enumerate(images):
+        ax = fig.add_axes([0.03, top - (i + 1) * height, 0.94, height * 0.92])
+        ax.imshow(mpimg.imread(io.BytesIO(png), format="png"))
+        ax.set_title(name, fontsize=9, fontname="Times New Roman")
+        ax.axis("off")
+    return fig
+
+
+def count_pages(report: dict) -> int:
+    n_lines = len(report.get("summary_lines", []))
+    n_charts = len(report.get("charts", []))
+    assoc = report.get("assoc") or {}
+    return (1 + max(1, -(-n_lines // 30)) + -(-n_charts // CHARTS_PER_PAGE)
+            + (1 if assoc else 0) + (1 if assoc.get("scatter_png") else 0))
+
+
+def write_report(path: str, report: dict, progress: Optional[Callable[[float], None]] = None) -> str:
+    """Write the report snapshot to `path`, page by page.
+
+    report keys: title, subtitle, members, summary_heading, summary_lines,
+    charts [(name, png)], assoc {heading, lines, scatter_png} (optional).
+    """
+    total = count_pages(report)
+    done = 0
+
+    def emit(pdf, fig):
+        nonlocal done
+        pdf.savefig(fig)
+        done += 1
+        if progress:
+            progress(min(done / total, 1.0))
+
+    with PdfPages(path) as pdf:
+        # Title page
+        fig = _page()
+        fig.text(0.5, 0.85, report.get("title", ""), ha="center", va="center", fontsize=18, fontname="Times New Roman", weight="bold")
+        fig.text(0.5, 0.80, report.get("subtitle", ""), ha="center", va="center", fontsize=10, fontname="Times New Roman")
+        fig.text(0.1, 0.75, report.get("members", ""), fontsize=9, fontname="Times New Roman")
+        emit(pdf, fig)
+
+        # Descriptive summary
+        for fig in _text_pages(report.get("summary_heading", ""), report.get("summary_lines", [])):
+            emit(pdf, fig)
+
+        # Item distributions: the PNGs already rendered for the cards
+        charts = report.get("charts", [])
+        for start in range(0, len(charts), CHARTS_PER_PAGE):
+            emit(pdf, _image_page(charts[start:start + CHARTS_PER_PAGE]))
+
+        # Association summary + scatter image
+        assoc = report.get("assoc") or {}
+        if assoc:
+            fig = _page()
+            fig.text(0.01, 0.95, assoc.get("heading", ""), fontsize=12, fontname="Times New Roman", weight="bold")
+            y_pos = 0.9
+            for line in assoc.get("lines", []):
+                fig.text(0.01, y_pos, line, fontsize=10, fontname="Times New Roman")
+                y_pos -= 0.03
+            emit(pdf, fig)
+            if assoc.get("scatter_png"):
+                emit(pdf, _image_page([("X_total vs Y_total", assoc["scatter_png"])]))
+    if progress:
+        progress(1.0)
+    return path
+
+
+class ReportJob:
+    """Handle for a report being written in the background."""
+
+    def __init__(self, report: dict, path: str):
+        self.path = path
+        self.progress = 0.0
+        self._lock = threading.Lock()
+        self.pages = count_pages(report)
+        # seconds from submission until the file is written (None while running)
+        self.seconds: Optional[float] = None
+        # set once the finished export has been written to the perf log
+        self.logged = False
+        self._t0 = time.perf_counter()
+        self.future = _executor.submit(write_report, path, report, self._set_progress)
+        self.future.add_done_callback(self._set_seconds)
+        _live_paths.add(path)
+        # the writer holds the job while it runs, so this fires only once the file is closed
+        weakref.finalize(self, _remove_file, path)
+
+    def _set_seconds(self, _future) -> None:
+        self.seconds = time.perf_counter() - self._t0
+
+    def _set_progress(self, value: float) -> None:
+        with self._lock:
+            self.progress = value
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    def discard(self) -> None:
+        """Cancel if still queued; the file is deleted as soon as the writer lets go of it."""
+        self.future.cancel()
+        self.future.add_done_callback(lambda _future: _remove_file(self.path))
+
+
+def _remove_file(path: str) -> None:
+    _live_paths.discard(path)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def sweep_reports(directory: Optional[str] = REPORT_DIR, ttl: float = REPORT_TTL_S) -> int:
+    """Delete report files older than `ttl` seconds that no live job owns; returns how many."""
+    cutoff = time.time() - ttl
+    removed = 0
+    for path in glob.glob(os.path.join(directory or tempfile.gettempdir(), PREFIX + "*.pdf")):
+        try:
+            if path not in _live_paths and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def start_report(report: dict, directory: Optional[str] = REPORT_DIR) -> ReportJob:
+    sweep_reports(directory)
+    fd, path = tempfile.mkstemp(prefix=PREFIX, suffix=".pdf", dir=directory)
+    os.close(fd)
+    return ReportJob(report, path)
@@ -0,0 +1,195 @@
+# survey_scales.py
+# Named scales (constructs) and their reliability. A scale is a list of items, some of
+# them reverse-coded (answer -> low + high - answer on the scale's response range).
+# Every composite comes from one matrix product: the item matrix (missing answers
+# zeroed, or set to the item mean) times an items x scales weight matrix of +1 / -1,
+# plus the constant the reversed items add; a second product of the missing-answer
+# indicators with |weights| counts the missing items per row and scale.
+# Reliability per scale comes from the covariance matrix of its (reverse-coded) items on
+# the rows that answered all of them, computed once: Cronbach's alpha, standardized
+# alpha, and for every item alpha-if-deleted and the corrected item-total correlation
+# follow from that matrix's row sums and diagonal, without refitting per item.
+#
+# Text form (the app's sidebar), one scale per line, "-" marks a reversed item and an
+# optional "(low-high)" fixes the response range (default: the range the items use):
+#     Trust (1-5): T1, T2, -T3, T4
+
+import re
+import warnings
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+_LINE = re.compile(r"^\s*(?P<name>[^:(]+?)\s*(\(\s*(?P<lo>-?\d+(\.\d+)?)\s*-\s*(?P<hi>-?\d+(\.\d+)?)\s*\))?\s*:(?P<items>.*)$")
+
+
+class Scale:
+    """One construct: its items, which of them are reverse-coded and the response range."""
+
+    def __init__(self, name: str, items: Sequence[str], reverse: Sequence[str] = (),
+                 bounds: Optional[Tuple[float, float]] = None):
+        self.name = name
+        self.items = list(dict.fromkeys(items))
+        self.reverse = [c for c in self.items if c in set(reverse)]
+        self.bounds = bounds
+
+    def spec(self) -> str:
+        rng = f" ({self.bounds[0]:g}-{self.bounds[1]:g})" if self.bounds else ""
+        items = ", ".join(("-" + c) if c in self.reverse else c for c in self.items)
+        return f"{self.name}{rng}: {items}"
+
+    def __repr__(self) -> str:
+        return f"Scale({self.spec()!r})"
+
+
+def parse_scales(text: str) -> List[Scale]:
+    """Scales from the text form above (blank lines and lines starting with # skipped).
+    Raises ValueError naming the first line that does not parse."""
+    scales, seen = [], set()
+    for n, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        m = _LINE.match(line)
+        items = [t.strip() for t in m.group("items").split(",") if t.strip()] if m else []
+        if not m or not items:
+            raise ValueError(f"line {n}: expected 'Name: item, item, -reversed item', got {line.strip()!r}")
+        name = m.group("name")
+        if name in seen:
+            raise ValueError(f"line {n}: scale {name!r} is defined twice")
+        seen.add(name)
+        bounds = (float(m.group("lo")), float(m.group("hi"))) if m.group("lo") is not None else None
+        if bounds and bounds[0] >= bounds[1]:
+            raise ValueError(f"line {n}: response range {bounds[0]:g}-{bounds[1]:g} is empty")
+        reverse = [t[1:].strip() for t in items if t.startswith("-")]
+        scales.append(Scale(name, [t[1:].strip() if t.startswith("-") else t for t in items], reverse, bounds))
+    return scales
+
+
+def scale_items(scales: Sequence[Scale]) -> List[str]:
+    """Every item used by `scales`, once, in order of first use."""
+    return list(dict.fromkeys(c for s in scales for c in s.items))
+
+
+def weight_matrix(scales: Sequence[Scale], items: Sequence[str]) -> np.ndarray:
+    """items x scales matrix: +1 for an item of the scale, -1 when reverse-coded, else 0."""
+    pos = {c: i for i, c in enumerate(items)}
+    W = np.zeros((len(items), len(scales)))
+    for j, s in enumerate(scales):
+        for c in s.items:
+            W[pos[c], j] = -1.0 if c in s.reverse else 1.0
+    return W
+
+
+def scale_bounds(M: np.ndarray, items: Sequence[str], scales: Sequence[Scale]) -> List[Tuple[float, float]]:
+    """Response range of each scale: its own bounds, else the lowest and highest answer
+    given to any of its items (columns of M named by `items`)."""
+    pos = {c: i for i, c in enumerate(items)}
+    need = scale_items([s for s in scales if not s.bounds])
+    out = []
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if need:
+            # nanmin/nanmax have no identity for zero rows (a header-only file)
+            sub = M[:, [pos[c] for c in need]]
+            lo = dict(zip(need, np.nanmin(sub, axis=0) if len(sub) else np.full(len(need), np.nan)))
+            hi = dict(zip(need, np.nanmax(sub, axis=0) if len(sub) else np.full(len(need), np.nan)))
+        for s in scales:
+            out.append(s.bounds or (float(np.nanmin([lo[c] for c in s.items])),
+                                    float(np.nanmax([hi[c] for c in s.items]))))
+    return out
+
+
+def scale_scores(M: np.ndarray, items: Sequence[str], scales: Sequence[Scale],
+                 item_mean: bool = False) -> np.ndarray:
+    """rows x scales composite sums of the item matrix M (columns named by `items`).
+
+    A score is missing when any of its items is missing, or with `item_mean` (missing
+    answers count as the item's mean) only when none of them was answered.
+    """
+    W = weight_matrix(scales, items)
+    # reversed items contribute low + high - answer: the -answer is in W, the rest here
+    offset = np.zeros(len(scales))
+    reversing = [j for j, s in enumerate(scales) if s.reverse]
+    for j, (lo, hi) in zip(reversing, scale_bounds(M, items, [scales[j] for j in reversing])):
+        offset[j] = (lo + hi) * len(scales[j].reverse)
+    miss = np.isnan(M)
+    fill = np.zeros(M.shape[1])
+    if item_mean:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fill = np.nan_to_num(np.nansum(M, axis=0) / (~miss).sum(axis=0), nan=0.0)
+    scores = np.where(miss, fill, M) @ W + offset
+    # counts are exact in float32 (below 2**24 items) at half the memory traffic
+    n_missing = miss.astype(np.float32) @ np.abs(W).astype(np.float32)
+    if item_mean:
+        scores[n_missing == np.abs(W).sum(axis=0)] = np.nan
+    else:
+        scores[n_missing > 0] = np.nan
+    return scores
+
+
+def _alpha(k: float, trace, total):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return k / (k - 1) * (1 - trace / total)
+
+
+def reliability(M: np.ndarray, items: Sequence[str], scale: Scale) -> Tuple[dict, pd.DataFrame]:
+    """(summary, per-item table) of one scale on the rows of M answering all its items."""
+    pos = {c: i for i, c in enumerate(items)}
+    sign = np.array([-1.0 if c in scale.reverse else 1.0 for c in scale.items])
+    X = M[:, [pos[c] for c in scale.items]]
+    X = X[~np.isnan(X).any(axis=1)] * sign
+    n, k = X.shape
+    summary = {"scale": scale.name, "items": k, "reversed": len(scale.reverse), "n": n,
+               "alpha": np.nan, "std_alpha": np.nan, "mean_inter_item_r": np.nan}
+    table = pd.DataFrame(index=pd.Index(scale.items, name="item"),
+                         data={"reversed": [c in scale.reverse for c in scale.items]})
+    if n < 2 or k < 2:
+        return summary, table.assign(mean=np.nan, sd=np.nan, item_total_r=np.nan, alpha_if_deleted=np.nan)
+    Xc = X - X.mean(axis=0)
+    C = Xc.T @ Xc / (n - 1)
+    var = np.diag(C).copy()
+    total = C.sum()
+    row = C.sum(axis=1)
+    # the scale without item i: its variance, and the item's covariance with that rest score
+    rest_var = total - 2 * row + var
+    rest_cov = row - var
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(var)
+        R = C / np.outer(sd, sd)
+        item_total_r = rest_cov / np.sqrt(var * rest_var)
+        mean_r = (R.sum() - np.trace(R)) / (k * (k - 1))
+    summary.update(alpha=float(_alpha(k, var.sum(), total)), mean_inter_item_r=float(mean_r),
+                   std_alpha=float(k * mean_r / (1 + (k - 1) * mean_r)))
+    if k > 2:
+        alpha_if_deleted = _alpha(k - 1, var.sum() - var, rest_var)
+    else:
+        alpha_if_deleted = np.full(k, np.nan)
+    # reversed items are reported on their original coding
+    table["mean"] = X.mean(axis=0) * sign
+    table["sd"] = sd
+    table["item_total_r"] = item_total_r
+    table["alpha_if_deleted"] = alpha_if_deleted
+    return summary, table
+
+
+class ReliabilityTable:
+    """Reliability of several scales.
+
+    summary: one row per scale — items, reversed items, complete rows (n), Cronbach's
+             alpha, standardized alpha and the mean inter-item correlation
+    items:   per scale, one row per item — reversed, mean, SD, corrected item-total r
+             and alpha if the item were deleted
+    """
+
+    def __init__(self, summary: pd.DataFrame, items: Dict[str, pd.DataFrame]):
+        self.summary = summary
+        self.items = items
+
+
+def reliability_table(M: np.ndarray, items: Sequence[str], scales: Sequence[Scale]) -> ReliabilityTable:
+    rows, tables = [], {}
+    for s in scales:
+        summary, tables[s.name] = reliability(M, items, s)
+        rows.append(summary)
+    return ReliabilityTable(pd.DataFrame(rows).set_index("scale") if rows else pd.DataFrame(), tables)
@@ -0,0 +1,202 @@
+# survey_segments.py
+# Segment comparison by a demographic column (age group, gender, major, ...).
+# The column is factorized once into integer level codes; every per-level number —
+# counts, means and SDs of the items and composites, the X_total/Y_total correlation,
+# Kruskal-Wallis and one-way ANOVA across levels — then comes from np.bincount over
+# those codes (weighted by values, squares, cross products or ranks), so the frame is
+# never filtered per level and the cost does not grow with the number of levels.
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from survey_assoc import corr_pvalues, rank_columns
+from survey_stats import MAX_BINCOUNT_SPAN, numeric_matrix
+
+# levels with fewer rows than this get no correlation (NaN) in the comparison table
+MIN_SEGMENT_PAIRS = 3
+MISSING_LEVEL = "(missing)"
+
+
+def level_codes(s: pd.Series, keep_missing: bool = False) -> Tuple[np.ndarray, List[str]]:
+    """Integer code per row (-1 = no level) and the level labels, sorted where possible."""
+    try:
+        codes, uniques = pd.factorize(s, sort=True)
+    except TypeError:
+        # mixed types (e.g. numbers and text in one column) cannot be sorted
+        codes, uniques = pd.factorize(s)
+    levels = [str(u) for u in uniques]
+    if keep_missing and (codes < 0).any():
+        codes = np.where(codes < 0, len(levels), codes)
+        levels.append(MISSING_LEVEL)
+    return codes.astype(np.intp), levels
+
+
+def _valid(v: np.ndarray, codes: np.ndarray):
+    ok = ~np.isnan(v) & (codes >= 0)
+    return ok, codes[ok], v[ok]
+
+
+def grouped_moments(g: np.ndarray, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-level count, mean and sample SD from level codes g and values x (no NaN)."""
+    center = x.mean() if x.size else 0.0
+    d = x - center
+    n = np.bincount(g, minlength=k).astype(float)
+    s = np.bincount(g, weights=d, minlength=k)
+    ss = np.bincount(g, weights=d * d, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s / n
+        var = (ss - s * mean) / (n - 1)
+    sd = np.where(n > 1, np.sqrt(np.maximum(var, 0)), np.nan)
+    return n, mean + center, sd
+
+
+def _tie_counts(x: np.ndarray) -> np.ndarray:
+    lo, hi = x.min(), x.max()
+    if hi - lo < MAX_BINCOUNT_SPAN and np.all(x == np.floor(x)):
+        return np.bincount((x - lo).astype(np.int64)).astype(float)
+    return np.unique(x, return_counts=True)[1].astype(float)
+
+
+def group_tests(g: np.ndarray, x: np.ndarray, r: np.ndarray, n: np.ndarray) -> dict:
+    """Kruskal-Wallis H and one-way ANOVA F across levels, from grouped sums.
+
+    g, x, r: level code, value and rank (1..N over these rows) of each valid row;
+    n: rows per level. The per-level rank sums are one weighted bincount and the
+    tie correction uses the counts of tied values.
+    """
+    N = x.size
+    k = n.size
+    present = n > 0
+    n_groups = int(present.sum())
+    out = {"groups": n_groups, "n": int(N), "H": np.nan, "p_kruskal": np.nan, "F": np.nan, "p_anova": np.nan}
+    if n_groups < 2 or N <= n_groups:
+        return out
+    rank_sum = np.bincount(g, weights=r, minlength=k)[present]
+    h = 12.0 / (N * (N + 1)) * np.sum(rank_sum ** 2 / n[present]) - 3.0 * (N + 1)
+    ties = _tie_counts(x)
+    correction = 1.0 - np.sum(ties ** 3 - ties) / (float(N) ** 3 - N)
+    if correction > 0:
+        out["H"] = h / correction
+        out["p_kruskal"] = float(stats.chi2.sf(out["H"], n_groups - 1))
+    d = x - x.mean()
+    s = np.bincount(g, weights=d, minlength=k)[present]
+    ss_total = float(np.sum(d * d))
+    ss_between = float(np.sum(s * s / n[present]))
+    ss_within = ss_total - ss_between
+    if ss_within > 0:
+        out["F"] = (ss_between / (n_groups - 1)) / (ss_within / (N - n_groups))
+        out["p_anova"] = float(stats.f.sf(out["F"], n_groups - 1, N - n_groups))
+    return out
+
+
+def group_ranks(v: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Average ranks of v within each level (one lexsort over (level, value)); NaN stays NaN."""
+    out = np.full(v.shape, np.nan)
+    ok = np.flatnonzero(~np.isnan(v) & (codes >= 0))
+    if ok.size == 0:
+        return out
+    g, x = codes[ok], v[ok]
+    order = np.lexsort((x, g))
+    gs, xs = g[order], x[order]
+    pos = np.arange(order.size, dtype=float)
+    new_group = np.r_[True, gs[1:] != gs[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_group, pos, 0))
+    new_run = new_group | np.r_[True, xs[1:] != xs[:-1]]
+    run_id = np.cumsum(new_run) - 1
+    run_first = pos[new_run]
+    run_last = np.r_[run_first[1:], order.size] - 1
+    avg = (run_first + run_last) / 2.0 - group_start[new_run] + 1.0
+    out[ok[order]] = avg[run_id]
+    return out
+
+
+def grouped_corr(x: np.ndarray, y: np.ndarray, codes: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-level Pearson r and pair count of x and y (pairs with both values)."""
+    ok = ~np.isnan(x) & ~np.isnan(y) & (codes >= 0)
+    g = codes[ok]
+    a, b = x[ok], y[ok]
+    a = a - a.mean() if a.size else a
+    b = b - b.mean() if b.size else b
+    n = np.bincount(g, minlength=k).astype(float)
+    sa, sb = np.bincount(g, weights=a, minlength=k), np.bincount(g, weights=b, minlength=k)
+    saa, sbb = np.bincount(g, weights=a * a, minlength=k), np.bincount(g, weights=b * b, minlength=k)
+    sab = np.bincount(g, weights=a * b, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = (sab - sa * sb / n) / np.sqrt((saa - sa * sa / n) * (sbb - sb * sb / n))
+    r[n < MIN_SEGMENT_PAIRS] = np.nan
+    return np.clip(r, -1.0, 1.0), n.astype(np.int64)
+
+
+class SegmentTable:
+    """Per-level statistics of one demographic column.
+
+    summary: one row per level — rows, n / mean / SD of each composite, and the
+             composite correlation (r, p, pairs) inside the level
+    means:   mean of every item and composite per level (levels x columns)
+    tests:   Kruskal-Wallis and ANOVA across levels, one row per item/composite
+    """
+
+    def __init__(self, column: str, levels: List[str], summary: pd.DataFrame,
+                 means: pd.DataFrame, tests: pd.DataFrame, method: str):
+        self.column = column
+        self.levels = levels
+        self.summary = summary
+        self.means = means
+        self.tests = tests
+        self.method = method
+
+    def export_table(self) -> pd.DataFrame:
+        """Summary and item means side by side, one row per level (the CSV export)."""
+        return self.summary.join(self.means.add_prefix("mean "))
+
+
+def segment_matrix(M: np.ndarray, names: List[str], column: str, levels_of: pd.Series,
+                   x_col: Optional[str] = "X_total", y_col: Optional[str] = "Y_total",
+                   method: str = "pearson", keep_missing: bool = False) -> SegmentTable:
+    """Segment statistics for the columns of M (named `names`) by the levels of `levels_of`."""
+    codes, levels = level_codes(levels_of, keep_missing)
+    k = len(levels)
+    rows = np.bincount(codes[codes >= 0], minlength=k)
+    # rows without a level take no part in the tests, so rank only the rows that have one
+    has_level = codes >= 0
+    ranks = rank_columns(M) if has_level.all() else rank_columns(M[has_level])
+
+    means, tests = {}, {}
+    summary = pd.DataFrame({"rows": rows}, index=pd.Index(levels, name=column))
+    for j, c in enumerate(names):
+        ok, g, x = _valid(M[:, j], codes)
+        n, mean, sd = grouped_moments(g, x, k)
+        means[c] = mean
+        tests[c] = group_tests(g, x, ranks[ok[has_level], j], n)
+        if c in (x_col, y_col):
+            summary[f"{c} n"] = n.astype(np.int64)
+            summary[f"{c} mean"] = mean
+            summary[f"{c} sd"] = sd
+
+    pos = {c: j for j, c in enumerate(names)}
+    if x_col in pos and y_col in pos:
+        x, y = M[:, pos[x_col]], M[:, pos[y_col]]
+        if method == "spearman":
+            # ranks within each level, on the rows where both composites are present
+            both = np.isnan(x) | np.isnan(y)
+            x = group_ranks(np.where(both, np.nan, x), codes)
+            y = group_ranks(np.where(both, np.nan, y), codes)
+        r, n_pairs = grouped_corr(x, y, codes, k)
+        summary["r"] = r
+        summary["p"] = corr_pvalues(r, n_pairs)
+        summary["pairs"] = n_pairs
+
+    means = pd.DataFrame(means, index=pd.Index(levels, name=column))
+    tests = pd.DataFrame.from_dict(tests, orient="index")
+    tests.index.name = "item"
+    return SegmentTable(column, levels, summary, means, tests, method)
+
+
+def segment_frame(df: pd.DataFrame, column: str, cols: List[str], method: str = "pearson",
+                  keep_missing: bool = False) -> SegmentTable:
+    cols = list(dict.fromkeys(cols))
+    return segment_matrix(numeric_matrix(df, cols), cols, column, df[column], method=method,
+                          keep_missing=keep_missing)
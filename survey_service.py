@@ -0,0 +1,515 @@
+# survey_service.py
+# Local HTTP analysis service (standard library only: http.server + multiprocessing).
+# Other tools POST a survey file and get back what survey_batch writes for it: the
+# statistics as JSON, the tables as CSV (or JSON records), chart PNGs and the PDF report.
+#   POST   /jobs?name=survey.csv[&x=X1,X2&y=Y1,Y2&missing=...&method=Spearman&matrix=spearman
+#                                &segments=gender,age&resamples=2000&item_mean=1&scales=...&pdf=1]
+#          body = the file's bytes -> 202 {"job": id, "status": "queued", ...}
+#   GET    /jobs                              every known job's status
+#   GET    /jobs/<id>[?wait=SECONDS]          status; waits up to SECONDS for the job to end
+#   GET    /jobs/<id>/events                  one JSON line per status change until it ends
+#   GET    /jobs/<id>/results[?wait=SECONDS]  results.json once done
+#   GET    /jobs/<id>/files/<path>            any output file, streamed in chunks;
+#                                             ?format=json turns a CSV / Parquet table into records
+#   DELETE /jobs/<id>                         forget a finished job and remove its files
+#   GET    /health                            workers, queue and job counts
+# Jobs wait in a bounded queue (when it is full, POST answers 503 with Retry-After) and
+# run one at a time on each of a fixed number of worker processes; a job past its time
+# limit has its worker process killed and replaced. A submission identical to a queued,
+# running or finished job (same file bytes and options, by content hash) gets that job
+# back instead of running again. Finished jobs are removed after SURVEY_SERVICE_TTL_S
+# (checked every SWEEP_S seconds), and so are job folders left by an earlier run of the
+# service once they are that old.
+# Run: python survey_service.py [--host 127.0.0.1] [--port 8765] [--workers 2] [--queue 16]
+#      [--timeout 300] [--dir DIR]
+
+import argparse
+import json
+import mimetypes
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import survey_pipeline as pipeline
+from survey_batch import analyze_file, out_dir_for
+from survey_ingest import content_hash, file_kind
+from survey_scales import parse_scales
+
+SERVICE_DIR = os.environ.get("SURVEY_SERVICE_DIR") or os.path.join(tempfile.gettempdir(), "survey_service")
+WORKERS = int(os.environ.get("SURVEY_SERVICE_WORKERS", str(min(4, os.cpu_count() or 1))))
+QUEUE_SIZE = int(os.environ.get("SURVEY_SERVICE_QUEUE", "16"))
+TIMEOUT_S = float(os.environ.get("SURVEY_SERVICE_TIMEOUT_S", "300"))
+TTL_S = float(os.environ.get("SURVEY_SERVICE_TTL_S", "3600"))
+# how often ended jobs are checked against the TTL (at most; shorter TTLs check more often)
+SWEEP_S = 60.0
+MAX_UPLOAD_MB = int(os.environ.get("SURVEY_SERVICE_MAX_MB", "200"))
+CHUNK = 64 * 1024
+
+QUEUED, RUNNING, DONE, FAILED, TIMEOUT = "queued", "running", "done", "failed", "timeout"
+ENDED = (DONE, FAILED, TIMEOUT)
+METHODS = ["Auto", "Pearson", "Spearman", "Chi-square"]
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+# ---------- Worker side ----------
+def _warm() -> bool:
+    # runs once in each fresh worker process, so the first job does not pay the imports
+    return True
+
+
+def _run_job(path: str, output_dir: str, options: dict) -> dict:
+    scales = parse_scales(options["scales"]) if options.get("scales") else None
+    return analyze_file(path, output_dir, options.get("x"), options.get("y"), options["missing"],
+                        options["method"], options["pdf"], options["matrix"], options["resamples"],
+                        options.get("segments"), options["item_mean"], scales, charts=True)
+
+
+# ---------- Options ----------
+def _flag(v: str) -> bool:
+    return v.lower() in ("1", "true", "yes", "on")
+
+
+def parse_options(query: Dict[str, List[str]]) -> dict:
+    """Analysis options from the POST query string (the survey_batch command-line options).
+    Raises BadRequest for a value the analysis would reject."""
+    q = {k: v[-1] for k, v in query.items()}
+    items = lambda k: [c for c in q[k].split(",") if c] if q.get(k) else None
+    opts = {"x": items("x"), "y": items("y"), "segments": items("segments"),
+            "missing": q.get("missing", pipeline.MISSING_METHODS[0]), "method": q.get("method", "Auto"),
+            "matrix": q.get("matrix", "pearson"), "item_mean": _flag(q.get("item_mean", "0")),
+            "pdf": _flag(q.get("pdf", "0")), "scales": q.get("scales") or None}
+    if opts["missing"] not in pipeline.MISSING_METHODS:
+        raise BadRequest(f"missing must be one of {pipeline.MISSING_METHODS}")
+    if opts["method"] not in METHODS:
+        raise BadRequest(f"method must be one of {METHODS}")
+    if opts["matrix"] not in ("pearson", "spearman"):
+        raise BadRequest("matrix must be pearson or spearman")
+    try:
+        opts["resamples"] = int(q.get("resamples", "0"))
+        opts["timeout"] = float(q["timeout"]) if "timeout" in q else None
+    except ValueError as e:
+        raise BadRequest(str(e))
+    if opts["resamples"] < 0:
+        raise BadRequest("resamples must be 0 or more")
+    # `not timeout > 0` also catches NaN
+    if opts["timeout"] is not None and not opts["timeout"] > 0:
+        raise BadRequest("timeout must be a positive number of seconds")
+    if opts["scales"]:
+        try:
+            parse_scales(opts["scales"])
+        except ValueError as e:
+            raise BadRequest(f"scales: {e}")
+    return opts
+
+
+# ---------- Jobs ----------
+class Job:
+    def __init__(self, job_id: str, name: str, options: dict, directory: str, timeout: float):
+        self.id = job_id
+        self.name = name
+        self.options = options
+        self.dir = directory
+        self.input_path = os.path.join(directory, "upload", name)
+        # survey_batch writes the outputs of a file to <output dir>/<file name>/
+        self.out_dir = out_dir_for(directory, self.input_path)
+        self.timeout = timeout
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def files(self) -> List[str]:
+        if self.status != DONE:
+            return []
+        out = []
+        for root, _, names in os.walk(self.out_dir):
+            out += sorted(os.path.relpath(os.path.join(root, n), self.out_dir).replace(os.sep, "/") for n in names)
+        return out
+
+    def info(self) -> dict:
+        out = {"job": self.id, "name": self.name, "status": self.status, "submitted": self.submitted,
+               "started": self.started, "finished": self.finished,
+               "queue_s": (self.started or time.time()) - self.submitted if self.status != QUEUED else None,
+               "run_s": (self.finished or time.time()) - self.started if self.started else None}
+        if self.error:
+            out["error"] = self.error
+        if self.status == DONE:
+            out["results"] = f"/jobs/{self.id}/results"
+            out["files"] = {f: f"/jobs/{self.id}/files/{f}" for f in self.files()}
+        return out
+
+
+class _Slot(threading.Thread):
+    """One worker process (a single-process Pool) fed from the shared queue. A job past
+    its time limit gets the process terminated; the next job starts a fresh one."""
+
+    def __init__(self, service: "AnalysisService", n: int):
+        super().__init__(name=f"survey-service-{n}", daemon=True)
+        self.service = service
+        self.pool = None
+
+    def _pool(self):
+        if self.pool is None:
+            # spawn: the server is multi-threaded, forking it is not safe
+            self.pool = multiprocessing.get_context("spawn").Pool(1)
+            self.pool.apply_async(_warm)
+        return self.pool
+
+    def _kill(self) -> None:
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def run(self) -> None:
+        self._pool()
+        while True:
+            job = self.service.queue.get()
+            if job is None:
+                self._kill()
+                return
+            self.service.update(job, RUNNING, started=time.time())
+            pending = self._pool().apply_async(_run_job, (job.input_path, job.dir, job.options))
+            try:
+                status = pending.get(job.timeout)
+            except multiprocessing.TimeoutError:
+                self._kill()
+                self.service.update(job, TIMEOUT, error=f"no result after {job.timeout:g} s", finished=time.time())
+                continue
+            except Exception as e:  # the worker process died or the result could not be sent back
+                self._kill()
+                self.service.update(job, FAILED, error=repr(e), finished=time.time())
+                continue
+            self.service.update(job, DONE if status["ok"] else FAILED, error=status.get("error"), finished=time.time())
+
+
+class AnalysisService:
+    """Job registry, bounded queue and worker slots (usable without the HTTP layer)."""
+
+    def __init__(self, directory: str = SERVICE_DIR, workers: int = WORKERS, queue_size: int = QUEUE_SIZE,
+                 timeout: float = TIMEOUT_S, ttl: float = TTL_S):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closed = threading.Event()
+        self._sweep_dirs()
+        self.slots = [_Slot(self, n) for n in range(max(1, workers))]
+        for slot in self.slots:
+            slot.start()
+        # an idle service still expires its finished jobs
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="survey-service-sweep", daemon=True)
+        self._sweeper.start()
+
+    def submit(self, data: bytes, name: str, options: dict) -> Tuple[Job, bool]:
+        """(job, deduplicated): the job for this file and options, new or already known.
+        Raises QueueFull when no more jobs can wait."""
+        name = os.path.basename(name) or "survey.csv"
+        key = {k: v for k, v in options.items() if k != "timeout"}
+        job_id = content_hash(data, kind=file_kind(name), name=name, **key)[:20]
+        self.sweep()
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in (FAILED, TIMEOUT):
+                return job, True
+            job = Job(job_id, name, options, os.path.join(self.directory, job_id),
+                      min(options.get("timeout") or self.timeout, self.timeout))
+            if os.path.exists(os.path.join(job.out_dir, "results.json")):
+                # finished by an earlier run of the service
+                job.status, job.finished = DONE, os.path.getmtime(os.path.join(job.out_dir, "results.json"))
+                self.jobs[job_id] = job
+                return job, True
+            if self.queue.full():
+                raise QueueFull(f"{self.queue.maxsize} jobs already waiting")
+            # registered before the upload is written, so an identical submission meanwhile gets this job
+            self.jobs[job_id] = job
+        # the write happens outside the lock: a large upload must not hold up other requests
+        try:
+            shutil.rmtree(job.dir, ignore_errors=True)
+            os.makedirs(os.path.dirname(job.input_path))
+            with open(job.input_path, "wb") as f:
+                f.write(data)
+            self.queue.put_nowait(job)
+        except BaseException as e:
+            with self._lock:
+                if self.jobs.get(job_id) is job:
+                    del self.jobs[job_id]
+            shutil.rmtree(job.dir, ignore_errors=True)
+            if isinstance(e, queue.Full):
+                raise QueueFull(f"{self.queue.maxsize} jobs already waiting")
+            raise
+        return job, False
+
+    def update(self, job: Job, status: str, **fields) -> None:
+        with self._changed:
+            job.status = status
+            for k, v in fields.items():
+                setattr(job, k, v)
+            self._changed.notify_all()
+
+    def wait(self, job: Job, timeout: float, seen: Optional[str] = None) -> str:
+        """Block until the job's status differs from `seen` (default: until it ends) or
+        `timeout` seconds pass; returns the status."""
+        done = (lambda: job.status != seen) if seen is not None else (lambda: job.status in ENDED)
+        with self._changed:
+            self._changed.wait_for(done, timeout)
+            return job.status
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda job: job.submitted)
+
+    def remove(self, job_id: str) -> bool:
+        """Forget a job and delete its files; False if it is still queued or running."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ENDED:
+                return False
+            del self.jobs[job_id]
+        shutil.rmtree(job.dir, ignore_errors=True)
+        return True
+
+    def sweep(self) -> int:
+        """Forget the jobs that ended more than ttl seconds ago and delete their files."""
+        now = time.time()
+        removed = 0
+        # files go under the lock: a new submission of the same job must not lose its upload
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.status in ENDED and job.finished and now - job.finished > self.ttl:
+                    del self.jobs[job_id]
+                    shutil.rmtree(job.dir, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def _sweep_loop(self) -> None:
+        while not self._closed.wait(max(1.0, min(SWEEP_S, self.ttl / 2))):
+            self.sweep()
+
+    def _sweep_dirs(self) -> None:
+        # at start-up: job folders of an earlier run, by the time their results (or upload) were written
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            stamps = [entry.stat().st_mtime]
+            for sub in os.scandir(entry.path):
+                stamps.append(sub.stat().st_mtime)
+            if now - max(stamps) > self.ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def health(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": len(self.slots), "queued": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                "timeout_s": self.timeout, "jobs": counts}
+
+    def close(self) -> None:
+        """Stop the worker processes (running jobs are abandoned) and the sweeper."""
+        self._closed.set()
+        # the slot threads are daemons: killing their pools is enough to stop the work
+        for slot in self.slots:
+            slot._kill()
+
+
+# ---------- HTTP ----------
+class Handler(BaseHTTPRequestHandler):
+    server_version = "SurveyService/1.0"
+    service: AnalysisService = None
+
+    def _json(self, obj, status: int = HTTPStatus.OK, headers: Optional[dict] = None) -> None:
+        body = json.dumps(obj, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, **fields) -> None:
+        self._json({"error": message, **fields}, status)
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        return parts, parse_qs(url.query)
+
+    def _job(self, parts) -> Optional[Job]:
+        job = self.service.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            self._error(HTTPStatus.NOT_FOUND, "no such job")
+        return job
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._error(HTTPStatus.NOT_FOUND, "POST /jobs?name=<file name> with the file as the body")
+        length = self.headers.get("Content-Length")
+        if length is None:
+            return self._error(HTTPStatus.LENGTH_REQUIRED, "Content-Length required")
+        try:
+            length = int(length)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, "Content-Length must be a whole number")
+        if length > MAX_UPLOAD_MB * 1024 ** 2:
+            return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"uploads are limited to {MAX_UPLOAD_MB} MB")
+        name = query.get("name", [self.headers.get("X-Filename", "")])[-1]
+        if not name.lower().endswith((".csv", ".xlsx")):
+            return self._error(HTTPStatus.BAD_REQUEST, "name must end in .csv or .xlsx")
+        data = self.rfile.read(length)
+        try:
+            options = parse_options(query)
+            job, dedup = self.service.submit(data, name, options)
+        except BadRequest as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        except QueueFull as e:
+            return self._json({"error": f"busy: {e}"}, HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": "5"})
+        self._json({**job.info(), "deduplicated": dedup}, HTTPStatus.OK if dedup else HTTPStatus.ACCEPTED,
+                   {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._json(self.service.health())
+        if parts == ["jobs"]:
+            return self._json([job.info() for job in self.service.list()])
+        job = self._job(parts)
+        if job is None:
+            return
+        try:
+            wait = min(float(query.get("wait", ["0"])[-1] or 0), self.service.timeout)
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, "wait must be a number of seconds")
+        if len(parts) == 2:
+            if wait > 0:
+                self.service.wait(job, wait)
+            return self._json(job.info())
+        if parts[2] == "events":
+            return self._events(job)
+        if parts[2] == "results":
+            if wait > 0:
+                self.service.wait(job, wait)
+            if job.status != DONE:
+                return self._json(job.info(), HTTPStatus.ACCEPTED if job.status not in ENDED else HTTPStatus.CONFLICT)
+            return self._file(job, "results.json", query)
+        if parts[2] == "files" and len(parts) > 3:
+            if job.status != DONE:
+                return self._json(job.info(), HTTPStatus.CONFLICT)
+            return self._file(job, "/".join(parts[3:]), query)
+        self._error(HTTPStatus.NOT_FOUND, "unknown path")
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        job = self._job(parts)
+        if job is None:
+            return
+        if not self.service.remove(job.id):
+            return self._error(HTTPStatus.CONFLICT, "job is still queued or running")
+        self._json({"job": job.id, "deleted": True})
+
+    def _events(self, job: Job) -> None:
+        # HTTP/1.0 without a length: the stream ends when the connection closes
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        seen = None
+        while True:
+            status = self.service.wait(job, self.service.timeout, seen) if seen is not None else job.status
+            if status != seen:
+                self.wfile.write((json.dumps(job.info(), default=str) + "\n").encode())
+                self.wfile.flush()
+                seen = status
+            if status in ENDED:
+                return
+
+    def _file(self, job: Job, rel: str, query) -> None:
+        path = os.path.realpath(os.path.join(job.out_dir, rel))
+        if not path.startswith(os.path.realpath(job.out_dir) + os.sep) or not os.path.isfile(path):
+            return self._error(HTTPStatus.NOT_FOUND, "no such file", files=job.files())
+        if query.get("format", [""])[-1] == "json" and path.endswith((".csv", ".parquet")):
+            import pandas as pd
+            table = pd.read_csv(path) if path.endswith(".csv") else pd.read_parquet(path).reset_index()
+            body = table.to_json(orient="records").encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        ctype = "application/vnd.apache.parquet" if path.endswith(".parquet") else \
+            (mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK)
+
+
+def make_server(service: AnalysisService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("SurveyHandler", (Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Serve survey analyses over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=WORKERS, help="worker processes (jobs run at once)")
+    ap.add_argument("--queue", type=int, default=QUEUE_SIZE, help="jobs that may wait before POST answers 503")
+    ap.add_argument("--timeout", type=float, default=TIMEOUT_S, help="seconds a job may run")
+    ap.add_argument("--dir", default=SERVICE_DIR, help="where uploads and results are kept")
+    args = ap.parse_args(argv)
+    service = AnalysisService(args.dir, args.workers, args.queue, args.timeout)
+    server = make_server(service, args.host, args.port)
+    print(f"survey service on http://{args.host}:{server.server_port} ({len(service.slots)} workers, "
+          f"queue {args.queue}, timeout {args.timeout:g} s, files in {args.dir})")
+    # SIGTERM shuts down like Ctrl+C, so the worker processes are not left running
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
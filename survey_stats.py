@@ -0,0 +1,172 @@
+# survey_stats.py
+# Descriptive statistics for the analyzer.
+# `descriptive_series` is the original one-column helper; `describe_frame` computes the
+# same numbers for many columns at once from a single numeric matrix (column-wise NumPy
+# reductions, one bincount pass for the Likert frequency tables).
+
+import warnings
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# integer-valued columns whose values span at most this many points get bincount
+# frequency tables (Likert items, sums of a few items); others fall back to value_counts
+MAX_BINCOUNT_SPAN = 64
+
+
+def descriptive_series(s: pd.Series):
+    s_num = pd.to_numeric(s, errors='coerce')
+    out = {}
+    out['count'] = int(s_num.count())
+    if out['count'] == 0:
+        return out
+    out['mean'] = s_num.mean()
+    out['median'] = s_num.median()
+    out['mode'] = s_num.mode().tolist()
+    out['min'] = s_num.min()
+    out['max'] = s_num.max()
+    out['std'] = s_num.std(ddof=1)
+    freq = s.value_counts(dropna=False).sort_index()
+    pct = (freq / freq.sum() * 100).round(2)
+    out['freq_table'] = pd.DataFrame({'count': freq, 'percent': pct})
+    return out
+
+
+def numeric_matrix(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    """Selected columns as one float64 matrix (rows x cols, column-major), coercing text to NaN."""
+    M = np.empty((len(df), len(cols)), dtype=float, order="F")
+    for j, c in enumerate(cols):
+        s = df[c]
+        if not pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+            s = pd.to_numeric(s, errors="coerce")
+        M[:, j] = s.to_numpy(dtype=float, na_value=np.nan)
+    return M
+
+
+class DescriptiveTable:
+    """Statistics for many columns computed in one vectorized pass.
+
+    `table` holds one row per column (count, mean, median, mode, min, max, std,
+    n_missing); frequency tables are only materialized when `summary`/`freq_table`
+    asks for them, from the shared bincount matrix.
+    """
+
+    def __init__(self, M: np.ndarray, names: List[str]):
+        self.M = M
+        self.names = list(names)
+        self._pos = {c: j for j, c in enumerate(self.names)}
+        n, k = M.shape
+        missing = np.isnan(M)
+        count = n - missing.sum(axis=0)
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            # nanmin/nanmax have no identity for zero rows (a header-only file)
+            vmin = np.nanmin(M, axis=0) if n else np.full(k, np.nan)
+            vmax = np.nanmax(M, axis=0) if n else np.full(k, np.nan)
+        mean = np.full(k, np.nan)
+        median = np.full(k, np.nan)
+        var = np.full(k, np.nan)
+
+        # one bincount over (column, value) codes for every small-range integer column;
+        # mean/variance/median/mode of those columns then come from the counts alone
+        is_int = ((M == np.floor(M)) | missing).all(axis=0)
+        binned = is_int & (count > 0) & (vmax - vmin < MAX_BINCOUNT_SPAN)
+        self._bin_cols = np.flatnonzero(binned)
+        self._bin_row = {int(j): r for r, j in enumerate(self._bin_cols)}
+        self._lo = np.where(binned, vmin, 0).astype(np.int64)
+        self._counts = None
+        if self._bin_cols.size:
+            b = self._bin_cols
+            lo = self._lo[b]
+            width = int((vmax - vmin)[b].max()) + 2  # last slot counts NaN
+            base = np.arange(b.size, dtype=np.int64) * width
+            sub, sub_missing = (M, missing) if b.size == k else (M[:, b], missing[:, b])
+            codes = np.where(sub_missing, base + width - 1, sub - (lo - base)).astype(np.int64)
+            self._counts = np.bincount(codes.ravel(order="K"), minlength=b.size * width).reshape(b.size, width)
+            cnt = self._counts[:, :-1]
+            vals = lo[:, None] + np.arange(width - 1)
+            nb = count[b]
+            mean[b] = (cnt * vals).sum(axis=1) / nb
+            with np.errstate(invalid="ignore", divide="ignore"):
+                var[b] = (cnt * (vals - mean[b][:, None]) ** 2).sum(axis=1) / (nb - 1)
+            # linear-interpolated median (as pandas) from cumulative counts
+            cum = np.cumsum(cnt, axis=1)
+            h = (nb - 1) * 0.5
+            v_lo = lo + (cum <= np.floor(h)[:, None]).sum(axis=1)
+            v_hi = lo + (cum <= np.ceil(h)[:, None]).sum(axis=1)
+            median[b] = v_lo + (v_hi - v_lo) * (h - np.floor(h))
+
+        rest = np.flatnonzero(~binned & (count > 0))
+        if rest.size:
+            sub = M[:, rest]
+            with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+                warnings.simplefilter("ignore", RuntimeWarning)
+                mean[rest] = np.nanmean(sub, axis=0)
+                median[rest] = np.nanmedian(sub, axis=0)
+                var[rest] = np.nanvar(sub, axis=0, ddof=1)
+        std = np.where(count > 1, np.sqrt(np.maximum(var, 0)), np.nan)
+
+        modes = [self._modes(j) if count[j] else [] for j in range(k)]
+        self.table = pd.DataFrame({
+            "count": count.astype(int),
+            "n_missing": (n - count).astype(int),
+            "mean": mean,
+            "median": median,
+            "mode": [m[0] if m else np.nan for m in modes],
+            "min": vmin,
+            "max": vmax,
+            "std": std,
+        }, index=pd.Index(self.names, name="item"))
+        self._mode_lists = dict(zip(self.names, modes))
+        self._cols = {c: self.table[c].to_numpy() for c in self.table.columns}
+
+    def _modes(self, j: int) -> list:
+        if j in self._bin_row:
+            row = self._counts[self._bin_row[j], :-1]
+            top = row.max()
+            return (np.flatnonzero(row == top) + self._lo[j]).astype(float).tolist()
+        return pd.Series(self.M[:, j]).mode().tolist()
+
+    def __contains__(self, col: str) -> bool:
+        return col in self._pos
+
+    def values(self, col: str) -> np.ndarray:
+        """Non-missing values of one column (a view into the shared matrix, then filtered)."""
+        v = self.M[:, self._pos[col]]
+        return v[~np.isnan(v)]
+
+    def freq_table(self, col: str) -> pd.DataFrame:
+        j = self._pos[col]
+        if j in self._bin_row:
+            row = self._counts[self._bin_row[j]]
+            nz = np.flatnonzero(row[:-1])
+            idx = (nz + self._lo[j]).astype(float)
+            cnt = row[nz]
+            if row[-1]:
+                idx = np.append(idx, np.nan)
+                cnt = np.append(cnt, row[-1])
+        else:
+            freq = pd.Series(self.M[:, j]).value_counts(dropna=False).sort_index()
+            idx, cnt = freq.index.to_numpy(dtype=float), freq.to_numpy()
+        pct = np.round(cnt / cnt.sum() * 100, 2)
+        return pd.DataFrame({"count": cnt.astype(np.int64), "percent": pct}, index=pd.Index(idx))
+
+    def summary(self, col: str) -> dict:
+        """Same keys as descriptive_series, read from the batch result."""
+        j = self._pos[col]
+        out = {"count": int(self._cols["count"][j])}
+        if out["count"] == 0:
+            return out
+        for key in ("mean", "median"):
+            out[key] = self._cols[key][j]
+        out["mode"] = self._mode_lists[col]
+        for key in ("min", "max", "std"):
+            out[key] = self._cols[key][j]
+        out["freq_table"] = self.freq_table(col)
+        return out
+
+
+def describe_frame(df: pd.DataFrame, cols: List[str]) -> DescriptiveTable:
+    cols = list(dict.fromkeys(cols))
+    return DescriptiveTable(numeric_matrix(df, cols), cols)
@@ -0,0 +1,261 @@
+# survey_streaming.py
+# Chunked, one-pass statistics for CSV exports too large to load whole.
+# Each item (and each composite) gets a mergeable RunningStats accumulator that is
+# updated chunk by chunk, so only one chunk of the file is in memory at a time.
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 200_000
+# Items with at most this many distinct values (Likert scales, sums of a few
+# Likert items) keep exact value counts; beyond it we fall back to a sample.
+MAX_EXACT_DISTINCT = 64
+RESERVOIR_SIZE = 20_000
+
+
+class RunningStats:
+    """Mergeable accumulator: count, Welford/Chan mean and variance, min/max,
+    exact value counts for Likert-range columns and a bottom-k uniform sample
+    (random priority keys) for approximate quantiles of everything else."""
+
+    def __init__(self, max_distinct: int = MAX_EXACT_DISTINCT,
+                 reservoir_size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.max_distinct = max_distinct
+        self.reservoir_size = reservoir_size
+        self._rng = np.random.default_rng(seed)
+        self.count = 0
+        self.n_missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.counts: Optional[Dict[float, int]] = {}
+        self._sample = np.empty(0)
+        self._keys = np.empty(0)
+        # quantiles known exactly from elsewhere (survey_columnar selects them from the mapped
+        # column), used instead of the sample; set on a copy, never merged
+        self.pinned: Dict[float, float] = {}
+
+    # ----- updates -----
+    def update(self, values) -> "RunningStats":
+        v = np.asarray(values, dtype=float)
+        valid = v[~np.isnan(v)]
+        self.n_missing += int(v.size - valid.size)
+        if valid.size == 0:
+            return self
+        nb = valid.size
+        mean_b = float(valid.mean())
+        m2_b = float(((valid - mean_b) ** 2).sum())
+        self._combine_moments(nb, mean_b, m2_b)
+        self.min = min(self.min, float(valid.min()))
+        self.max = max(self.max, float(valid.max()))
+        if self.counts is not None:
+            uniq, cnt = np.unique(valid, return_counts=True)
+            self._add_counts(zip(uniq.tolist(), cnt.tolist()))
+        self._add_sample(valid, self._rng.random(nb))
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Fold another accumulator (e.g. from a different chunk or worker) into this one."""
+        self.n_missing += other.n_missing
+        if other.count == 0:
+            return self
+        self._combine_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.counts is not None and other.counts is not None:
+            self._add_counts(other.counts.items())
+        else:
+            self.counts = None
+        self._add_sample(other._sample, other._keys)
+        return self
+
+    def with_fill(self, value: float) -> "RunningStats":
+        """Copy of this accumulator as if every missing value had been replaced by `value`.
+
+        Accumulators are shared between sessions, so the copy draws from its own generator
+        (seeded from the count) and this one is left untouched.
+        """
+        out = RunningStats(self.max_distinct, self.reservoir_size, seed=self.count)
+        out.merge(self)
+        n = out.n_missing
+        out.n_missing = 0
+        if n == 0 or value is None or np.isnan(value):
+            return out
+        out._combine_moments(n, float(value), 0.0)
+        out.min = min(out.min, float(value))
+        out.max = max(out.max, float(value))
+        if out.counts is not None:
+            out._add_counts([(float(value), n)])
+        # keys for the k smallest of n uniforms, without drawing all n of them
+        k = min(n, self.reservoir_size)
+        keys = out._rng.random(k) if n <= self.reservoir_size else np.cumsum(out._rng.exponential(size=k)) / n
+        out._add_sample(np.full(k, float(value)), keys)
+        return out
+
+    def _combine_moments(self, nb: int, mean_b: float, m2_b: float) -> None:
+        na = self.count
+        n = na + nb
+        delta = mean_b - self.mean
+        self.mean += delta * nb / n
+        self.m2 += m2_b + delta * delta * na * nb / n
+        self.count = n
+
+    def _add_counts(self, pairs) -> None:
+        for val, c in pairs:
+            self.counts[val] = self.counts.get(val, 0) + int(c)
+        if len(self.counts) > self.max_distinct:
+            self.counts = None
+
+    def _add_sample(self, values: np.ndarray, keys: np.ndarray) -> None:
+        sample = np.concatenate([self._sample, values])
+        allkeys = np.concatenate([self._keys, keys])
+        if sample.size > self.reservoir_size:
+            keep = np.argpartition(allkeys, self.reservoir_size)[: self.reservoir_size]
+            sample, allkeys = sample[keep], allkeys[keep]
+        self._sample, self._keys = sample, allkeys
+
+    # ----- results -----
+    @property
+    def exact(self) -> bool:
+        return self.counts is not None
+
+    @property
+    def var(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.var))
+
+    def sorted_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.counts:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        vals = np.array(sorted(self.counts))
+        cnts = np.array([self.counts[v] for v in vals], dtype=np.int64)
+        return vals, cnts
+
+    def quantile(self, q: float) -> float:
+        """Exact (linear interpolation, as pandas) when value counts are exact, else from the sample."""
+        if self.count == 0:
+            return np.nan
+        if q in self.pinned:
+            return self.pinned[q]
+        if self.exact:
+            vals, cnts = self.sorted_counts()
+            cum = np.cumsum(cnts)
+            h = (self.count - 1) * q
+            lo = vals[np.searchsorted(cum, int(np.floor(h)), side="right")]
+            hi = vals[np.searchsorted(cum, int(np.ceil(h)), side="right")]
+            return float(lo + (hi - lo) * (h - np.floor(h)))
+        return float(np.quantile(self._sample, q))
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def mode(self) -> List[float]:
+        if not self.exact or not self.counts:
+            return []
+        top = max(self.counts.values())
+        return sorted(v for v, c in self.counts.items() if c == top)
+
+    def freq_table(self) -> Optional[pd.DataFrame]:
+        if not self.exact:
+            return None
+        vals, cnts = self.sorted_counts()
+        idx = list(vals)
+        cnt = list(cnts)
+        if self.n_missing:
+            idx.append(np.nan)
+            cnt.append(self.n_missing)
+        freq = pd.Series(cnt, index=idx, dtype="int64")
+        pct = (freq / freq.sum() * 100).round(2)
+        return pd.DataFrame({"count": freq, "percent": pct})
+
+    def box_stats(self) -> dict:
+        """Input for matplotlib's Axes.bxp (whiskers at 1.5 IQR, clipped to min/max)."""
+        q1, med, q3 = self.quantile(0.25), self.median, self.quantile(0.75)
+        iqr = q3 - q1
+        return {"med": med, "q1": q1, "q3": q3,
+                "whislo": max(self.min, q1 - 1.5 * iqr), "whishi": min(self.max, q3 + 1.5 * iqr),
+                "fliers": []}
+
+    def hist_source(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(values, weights) to feed Axes.hist: exact counts when available, else the sample."""
+        if self.exact:
+            return self.sorted_counts()
+        return self._sample, None
+
+    def summary(self) -> dict:
+        """Same keys as survey_stats.descriptive_series, so the cards can render either."""
+        out = {"count": int(self.count)}
+        if self.count == 0:
+            return out
+        out["mean"] = self.mean
+        out["median"] = self.median
+        out["mode"] = self.mode()
+        out["min"] = self.min
+        out["max"] = self.max
+        out["std"] = self.std
+        out["freq_table"] = self.freq_table()
+        return out
+
+
+def peek_csv(source, nrows: int = 1000) -> pd.DataFrame:
+    """Header plus the first `nrows` rows, for column pickers and dtype sniffing."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pd.read_csv(source, nrows=nrows)
+
+
+def stream_csv(source, items: List[str], composites: Optional[Dict[str, List[str]]] = None,
+               chunksize: int = DEFAULT_CHUNKSIZE, keep_composites: bool = True,
+               listwise: bool = False) -> Tuple[Dict[str, RunningStats], Optional[pd.DataFrame]]:
+    """One pass over a CSV computing RunningStats for `items` and summed `composites`.
+
+    Composites use skipna=False like the in-memory path (a row missing any item has no
+    total). When `keep_composites` is set the composite columns themselves are returned
+    (one float column per composite), since the association step needs the pairs.
+    With `listwise`, rows missing any of the read columns are skipped entirely.
+    """
+    composites = composites or {}
+    needed = list(dict.fromkeys(list(items) + [c for cols in composites.values() for c in cols]))
+    acc = {c: RunningStats() for c in list(items) + list(composites)}
+    kept = {name: [] for name in composites} if keep_composites else None
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    for chunk in pd.read_csv(source, usecols=needed, chunksize=chunksize):
+        num = chunk.apply(pd.to_numeric, errors="coerce")
+        if listwise:
+            num = num.dropna()
+        for c in items:
+            acc[c].update(num[c].to_numpy(dtype=float))
+        for name, cols in composites.items():
+            total = num[cols].sum(axis=1, skipna=False).to_numpy(dtype=float)
+            acc[name].update(total)
+            if kept is not None:
+                kept[name].append(total)
+
+    comp_frame = None
+    if kept is not None and composites:
+        comp_frame = pd.DataFrame({name: np.concatenate(parts) if parts else np.empty(0)
+                                   for name, parts in kept.items()})
+    return acc, comp_frame
+
+
+def apply_missing(acc: Dict[str, RunningStats], method: str) -> Dict[str, RunningStats]:
+    """Mirror the sidebar missing-value options on accumulators (no rows are needed).
+
+    Listwise dropping cannot be undone on accumulators; it is done by stream_csv(listwise=True).
+    """
+    if method == "Fill with 0":
+        return {c: a.with_fill(0.0) for c, a in acc.items()}
+    if method == "Fill with mean":
+        return {c: a.with_fill(a.mean if a.count else np.nan) for c, a in acc.items()}
+    if method == "Fill with median":
+        return {c: a.with_fill(a.median) for c, a in acc.items()}
+    return acc
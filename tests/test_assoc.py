@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_descriptives import likert_frame
+from survey_assoc import frame_matrix
+
+
+@pytest.mark.parametrize("missing", [0.0, 0.05, 0.2, 0.6])
+def test_spearman_matches_pandas_pairwise_complete(missing):
+    df = likert_frame(2000, 8, missing=missing)
+    # a Likert sum (joint-table path) and a continuous column (re-ranked per pair)
+    df["S"] = df.iloc[:, 4:].sum(axis=1, min_count=4)
+    df["tot"] = df.iloc[:, :4].sum(axis=1, min_count=1) + np.random.default_rng(1).normal(0, 0.3, len(df))
+    rows, cols = list(df.columns[:4]) + ["tot"], list(df.columns[4:8]) + ["S", "tot"]
+    m = frame_matrix(df, rows, cols, "spearman")
+    ref = df.corr("spearman").loc[rows, cols]
+    np.testing.assert_allclose(m.r.to_numpy(), ref.to_numpy(), atol=1e-12)
+    assert (m.n.to_numpy() == df[rows].notna().T.astype(int).to_numpy() @ df[cols].notna().astype(int).to_numpy()).all()
@@ -0,0 +1,118 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey_incremental import AppendState, append_upload
+
+ITEMS = ["X1", "Y1"]
+COMPOSITES = {"X_total": ["X1"], "Y_total": ["Y1"]}
+
+
+def csv_bytes(rows, newline="\n", final=True) -> bytes:
+    lines = ["id,X1,Y1"] + [f"{i},{x},{y}" for i, x, y in rows]
+    return (newline.join(lines) + (newline if final else "")).encode()
+
+
+ROWS = [(i, i % 5 + 1, (i * 3) % 5 + 1) for i in range(1, 11)]
+
+
+@pytest.fixture
+def state():
+    return AppendState(ITEMS, COMPOSITES)
+
+
+def check_stats(state, rows):
+    assert state.n_rows == len(rows)
+    assert state.stats["X1"].count == len(rows)
+    assert state.stats["X1"].mean == pytest.approx(np.mean([r[1] for r in rows]))
+    assert state.pair.n == len(rows)
+
+
+def test_delta_uploads_add_their_rows(state):
+    assert state.add_upload(csv_bytes(ROWS[:3]), "a.csv")["status"] == "added"
+    out = state.add_upload(csv_bytes(ROWS[3:5]), "b.csv")
+    assert (out["status"], out["rows"]) == ("added", 2)
+    check_stats(state, ROWS[:5])
+
+
+def test_whole_file_reupload_adds_only_its_tail(state):
+    state.add_upload(csv_bytes(ROWS[:3]), "s.csv")
+    out = state.add_upload(csv_bytes(ROWS[:4]), "s.csv")
+    assert (out["status"], out["rows"]) == ("tail", 1)
+    out = state.add_upload(csv_bytes(ROWS[:7]), "s.csv")
+    assert (out["status"], out["rows"]) == ("tail", 3)
+    check_stats(state, ROWS[:7])
+
+
+def test_duplicate_upload_is_skipped(state):
+    state.add_upload(csv_bytes(ROWS[:3]), "s.csv")
+    out = state.add_upload(csv_bytes(ROWS[:3]), "copy.csv")
+    assert (out["status"], out["rows"]) == ("duplicate", 0)
+    check_stats(state, ROWS[:3])
+
+
+def test_first_upload_without_final_newline(state):
+    state.add_upload(csv_bytes(ROWS[:3], final=False), "s.csv")
+    out = state.add_upload(csv_bytes(ROWS[:4]), "s.csv")
+    assert (out["status"], out["rows"]) == ("tail", 1)
+    # and again without a final newline, then grown once more
+    state.add_upload(csv_bytes(ROWS[:5], final=False), "s.csv")
+    state.add_upload(csv_bytes(ROWS[:6], final=False), "s.csv")
+    check_stats(state, ROWS[:6])
+
+
+def test_whole_file_after_delta_upload(state):
+    state.add_upload(csv_bytes(ROWS[:3]), "s.csv")
+    state.add_upload(csv_bytes(ROWS[3:5]), "new_rows.csv")
+    out = state.add_upload(csv_bytes(ROWS[:6]), "s.csv")
+    assert (out["status"], out["rows"]) == ("tail", 1)
+    check_stats(state, ROWS[:6])
+
+
+def test_crlf_file_grown_without_final_newline(state):
+    state.add_upload(csv_bytes(ROWS[:3], newline="\r\n", final=False), "s.csv")
+    out = state.add_upload(csv_bytes(ROWS[:5], newline="\r\n"), "s.csv")
+    assert (out["status"], out["rows"]) == ("tail", 2)
+    check_stats(state, ROWS[:5])
+
+
+def test_repeated_rows_are_refused(state):
+    state.add_upload(csv_bytes(ROWS[:3]), "s.csv")
+    # the same rows written differently (another line ending) plus a new one
+    out = state.add_upload(csv_bytes(ROWS[:4], newline="\r\n"), "s_windows.csv")
+    assert (out["status"], out["rows"]) == ("overlap", 0)
+    check_stats(state, ROWS[:3])
+
+
+def test_append_upload_persists_the_state(tmp_path):
+    path = str(tmp_path / "survey.state.pkl")
+    append_upload(path, csv_bytes(ROWS[:3], final=False), "s.csv", ITEMS, COMPOSITES)
+    out = append_upload(path, csv_bytes(ROWS[:5]), "s.csv", ITEMS, COMPOSITES)
+    assert out["status"] == "tail"
+    out = append_upload(path, csv_bytes(ROWS[:5], newline="\r\n"), "other.csv", ITEMS, COMPOSITES)
+    assert out["status"] == "overlap"
+    check_stats(append_upload(path, csv_bytes(ROWS[:5]), "s.csv", ITEMS, COMPOSITES)["state"], ROWS[:5])
+
+
+def test_workbook_upload_then_whole_csv_is_refused(state, tmp_path):
+    xlsx = tmp_path / "s.xlsx"
+    pd.read_csv(io.BytesIO(csv_bytes(ROWS[:3]))).to_excel(xlsx, index=False)
+    state.add_upload(xlsx.read_bytes(), "s.xlsx")
+    out = state.add_upload(csv_bytes(ROWS[:4]), "s.csv")
+    assert out["status"] == "overlap"
+    check_stats(state, ROWS[:3])
+
+
+def test_workbook_sheet_is_the_selected_one(state, tmp_path):
+    xlsx = tmp_path / "s.xlsx"
+    rows = pd.read_csv(io.BytesIO(csv_bytes(ROWS[:4])))
+    with pd.ExcelWriter(xlsx) as writer:
+        pd.DataFrame({"other": [1, 2]}).to_excel(writer, sheet_name="A", index=False)
+        rows.to_excel(writer, sheet_name="B", index=False)
+    out = state.add_upload(xlsx.read_bytes(), "s.xlsx", sheet_name="B")
+    assert (out["status"], out["rows"]) == ("added", 4)
+    check_stats(state, ROWS[:4])
+    with pytest.raises(ValueError, match="columns missing"):
+        AppendState(ITEMS, COMPOSITES).add_upload(xlsx.read_bytes(), "s.xlsx", sheet_name="A")
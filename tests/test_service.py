@@ -0,0 +1,124 @@
+import http.client
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks.synthetic import synthetic_survey
+from survey_service import DONE, AnalysisService, Job, make_server
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    service = AnalysisService(str(tmp_path_factory.mktemp("service")), workers=1, queue_size=4, timeout=120)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+@pytest.fixture(scope="module")
+def survey_csv():
+    return synthetic_survey(300, 8).to_csv(index=False).encode()
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=180)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+def test_submit_poll_and_fetch_results(server, survey_csv):
+    status, body = request(server, "POST", "/jobs?name=s.csv&segments=gender", survey_csv)
+    assert status == 202
+    job = json.loads(body)
+    assert job["status"] == "queued"
+
+    status, body = request(server, "GET", f"/jobs/{job['job']}?wait=120")
+    info = json.loads(body)
+    assert (status, info["status"]) == (200, "done"), info
+    assert "drivers.csv" in info["files"]
+
+    status, body = request(server, "GET", f"/jobs/{job['job']}/results")
+    results = json.loads(body)
+    assert status == 200
+    assert results["n_rows"] == 300
+    assert results["x_items"] == ["X1", "X2", "X3", "X4"]
+
+    status, body = request(server, "GET", f"/jobs/{job['job']}/files/descriptives.parquet?format=json")
+    assert status == 200
+    assert len(json.loads(body)) == len(results["descriptives"])
+
+    # the same file and options again: the finished job comes back
+    status, body = request(server, "POST", "/jobs?name=s.csv&segments=gender", survey_csv)
+    assert status == 200
+    assert json.loads(body)["job"] == job["job"]
+
+    status, body = request(server, "DELETE", f"/jobs/{job['job']}")
+    assert status == 200
+    assert request(server, "GET", f"/jobs/{job['job']}")[0] == 404
+
+
+def test_non_numeric_wait_is_a_bad_request(server, survey_csv):
+    _, body = request(server, "POST", "/jobs?name=w.csv&method=Spearman", survey_csv)
+    job = json.loads(body)["job"]
+    status, body = request(server, "GET", f"/jobs/{job}?wait=soon")
+    assert status == 400
+    assert "wait" in json.loads(body)["error"]
+    assert request(server, "GET", f"/jobs/{job}/results?wait=120")[0] == 200
+
+
+def test_non_numeric_content_length_is_a_bad_request(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server, timeout=30)
+    try:
+        conn.putrequest("POST", "/jobs?name=s.csv")
+        conn.putheader("Content-Length", "lots")
+        conn.endheaders()
+        resp = conn.getresponse()
+        assert resp.status == 400
+        assert "Content-Length" in json.loads(resp.read())["error"]
+    finally:
+        conn.close()
+
+
+def test_bad_options_are_rejected(server, survey_csv):
+    assert request(server, "POST", "/jobs?name=s.txt", survey_csv)[0] == 400
+    assert request(server, "POST", "/jobs?name=s.csv&missing=nope", survey_csv)[0] == 400
+    for bad in ("timeout=-1", "timeout=0", "timeout=nan", "resamples=-5"):
+        assert request(server, "POST", f"/jobs?name=s.csv&{bad}", survey_csv)[0] == 400, bad
+    assert request(server, "GET", "/jobs/unknown")[0] == 404
+
+
+def test_idle_service_sweeps_ended_jobs_and_old_folders(tmp_path):
+    old = tmp_path / "left-by-an-earlier-run"
+    (old / "upload").mkdir(parents=True)
+    past = time.time() - 120
+    os.utime(old / "upload", (past, past))
+    os.utime(old, (past, past))
+    fresh = tmp_path / "recent"
+    fresh.mkdir()
+    service = AnalysisService(str(tmp_path), workers=1, ttl=2)
+    try:
+        assert not old.exists() and fresh.exists()
+        job = Job("ended", "s.csv", {}, str(tmp_path / "ended"), 60)
+        os.makedirs(job.dir)
+        job.status, job.finished = DONE, time.time() - 3
+        with service._lock:
+            service.jobs[job.id] = job
+        # no request comes in: the sweeper thread removes it on its own
+        deadline = time.time() + 10
+        while service.get(job.id) is not None and time.time() < deadline:
+            time.sleep(0.2)
+        assert service.get(job.id) is None
+        assert not os.path.exists(job.dir)
+    finally:
+        service.close()